@@ -1,20 +1,45 @@
+import click
 from flask import Flask
+from flask.cli import ScriptInfo
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
-from flask_mail import Mail
-from flask_migrate import Migrate
 from dotenv import load_dotenv
 
 load_dotenv()
 from config import Config
 
-db = SQLAlchemy()
+from app.replica import RoutingSession, replica
+
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 login_manager = LoginManager()
-mail = Mail()
-migrate = Migrate()
+
+
+class LazyMigrateGroup(click.Group):
+    """
+    `flask db` placeholder that imports Flask-Migrate (and with it Alembic and Mako) only
+    when a `flask db ...` command actually runs; the real group replaces it at that point.
+    """
+
+    def _load(self, ctx: click.Context) -> click.Group:
+        from flask_migrate import Migrate
+        from flask_migrate.cli import db as migrate_group
+
+        app = ctx.ensure_object(ScriptInfo).load_app()
+        if "migrate" not in app.extensions:
+            Migrate(app, db)
+        return migrate_group
+
+    def list_commands(self, ctx: click.Context) -> list[str]:
+        return self._load(ctx).list_commands(ctx)
+
+    def get_command(self, ctx: click.Context, cmd_name: str) -> click.Command | None:
+        return self._load(ctx).get_command(ctx, cmd_name)
 
 
 def create_app(config_class: type[Config] = Config) -> Flask:
+    from app.startup import StartupTimer
+
+    timer = StartupTimer()
     prefix = config_class.APP_URL_PREFIX
     if prefix and not prefix.startswith("/"):
         prefix = f"/{prefix}"
@@ -27,19 +52,57 @@ def create_app(config_class: type[Config] = Config) -> Flask:
         static_url_path=static_path,
     )
     app.config.from_object(config_class)
+    if app.config["PROXY_FIX_X_FOR"]:
+        from werkzeug.middleware.proxy_fix import ProxyFix
+
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config["PROXY_FIX_X_FOR"])
+    timer.mark("flask")
 
     db.init_app(app)
+
+    from app.database import configure_engines
+
+    configure_engines(app)
     login_manager.init_app(app)
-    mail.init_app(app)
-    migrate.init_app(app, db)
+    timer.mark("database")
+
+    from app.assets import assets
+    from app.live import broadcaster
+    from app.metrics import metrics
+    from app.page_cache import page_cache
+    from app.rate_limit import rate_limiter
+    from app.responses import compressor
+    from app.user_cache import user_cache
+    from app.utils import markdown_renderer
+
+    metrics.init_app(app)
+    rate_limiter.init_app(app)
+    markdown_renderer.init_app(app)
+    replica.init_app(app)
+    user_cache.init_app(app)
+    page_cache.init_app(app)
+    assets.init_app(app)
+    compressor.init_app(app)
+    broadcaster.init_app(app)
+    timer.mark("extensions")
 
     login_manager.login_view = "auth.login"
     login_manager.login_message_category = "info"
 
+    from app.api import api_bp
     from app.auth import auth_bp
     from app.routes import main_bp
 
     app.register_blueprint(auth_bp, url_prefix=prefix or None)
     app.register_blueprint(main_bp, url_prefix=prefix or None)
+    app.register_blueprint(api_bp, url_prefix=f"{prefix}/api")
+    timer.mark("blueprints")
+
+    from app.commands import register_commands
+
+    register_commands(app)
+    app.cli.add_command(LazyMigrateGroup("db", help="Perform database migrations."))
+    timer.mark("commands")
 
+    app.extensions["startup_timings"] = timer.phases
     return app
@@ -0,0 +1,132 @@
+"""
+Read-only JSON API and the streamed NDJSON export.
+
+Every content field is returned both as the Markdown source (`content`) and as the
+sanitized HTML the site renders (`content_html`). Lists are keyset-paginated like the HTML
+pages: pass the response's `next` value back as `?before=`. Item endpoints answer
+conditional GETs with the same validators as their HTML counterparts. The export walks the
+whole database, so it is for admins and for clients presenting `EXPORT_TOKEN`.
+"""
+import hmac
+
+from flask import Blueprint, Response, abort, current_app, jsonify, request, stream_with_context
+from flask_login import current_user
+
+from app.export import export_records, to_ndjson
+from app.http_cache import conditional_get
+from app.queries import (
+    argument_freshness,
+    argument_page,
+    index_freshness,
+    index_page,
+    opinion_freshness,
+    opinion_page,
+)
+from app.ranking import DEFAULT_SORT
+from app.replica import replica_reads
+
+api_bp = Blueprint("api", __name__)
+
+
+def _timestamp(value) -> str | None:
+    return value.isoformat() if value is not None else None
+
+
+def opinion_json(opinion) -> dict:
+    return {
+        "id": opinion.id,
+        "title": opinion.title,
+        "content": opinion.content,
+        "content_html": opinion.rendered_html,
+        "author": opinion.author.username,
+        "for_count": opinion.for_count,
+        "against_count": opinion.against_count,
+        "created_at": _timestamp(opinion.created_at),
+        "updated_at": _timestamp(opinion.updated_at),
+    }
+
+
+def argument_json(argument) -> dict:
+    return {
+        "id": argument.id,
+        "opinion_id": argument.opinion_id,
+        "stance": argument.stance.value,
+        "content": argument.content,
+        "content_html": argument.rendered_html,
+        "reasoning_count": argument.reasoning_count,
+        "created_at": _timestamp(argument.created_at),
+    }
+
+
+def reasoning_json(entry) -> dict:
+    return {
+        "id": entry.id,
+        "argument_id": entry.argument_id,
+        "content": entry.content,
+        "content_html": entry.rendered_html,
+        "author": entry.author.username,
+        "created_at": _timestamp(entry.created_at),
+    }
+
+
+@api_bp.route("/opinions")
+@replica_reads
+@conditional_get(index_freshness)
+def list_opinions():
+    context = index_page(
+        before=request.args.get("before"),
+        per_page=current_app.config["OPINIONS_PER_PAGE"],
+        sort=request.args.get("sort", DEFAULT_SORT),
+    )
+    return jsonify(
+        items=[opinion_json(opinion) for opinion in context["opinions"]],
+        next=context["page"].next_cursor,
+    )
+
+
+@api_bp.route("/opinions/<int:opinion_id>")
+@replica_reads
+@conditional_get(opinion_freshness)
+def get_opinion(opinion_id):
+    context = opinion_page(opinion_id)
+    arguments = context["arguments_for"] + context["arguments_against"]
+    return jsonify(
+        opinion=opinion_json(context["opinion"]),
+        arguments=[argument_json(argument) for argument in arguments],
+    )
+
+
+@api_bp.route("/arguments/<int:argument_id>")
+@replica_reads
+@conditional_get(argument_freshness)
+def get_argument(argument_id):
+    context = argument_page(
+        argument_id,
+        before=request.args.get("before"),
+        per_page=current_app.config["REASONING_PER_PAGE"],
+    )
+    return jsonify(
+        argument=argument_json(context["argument"]),
+        reasoning=[reasoning_json(entry) for entry in context["reasoning"]],
+        next=context["page"].next_cursor,
+    )
+
+
+def _export_allowed() -> bool:
+    token = current_app.config["EXPORT_TOKEN"]
+    presented = request.headers.get("Authorization", "")
+    if token and hmac.compare_digest(presented.encode(), f"Bearer {token}".encode()):
+        return True
+    return current_user.is_authenticated and getattr(current_user, "is_admin", False)
+
+
+@api_bp.route("/export.ndjson")
+@replica_reads
+def export():
+    """Stream every debate changed after `?since=<watermark>` (all debates without it)."""
+    if not _export_allowed():
+        abort(403 if current_user.is_authenticated else 401)
+    records = export_records(request.args.get("since") or None)
+    response = Response(stream_with_context(to_ndjson(records)), mimetype="application/x-ndjson")
+    response.cache_control.no_store = True
+    return response
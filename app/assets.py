@@ -0,0 +1,171 @@
+"""
+Fingerprinted static assets.
+
+`flask assets-build` copies every file under `app/static` to `app/static/dist/` with a
+content hash in its name (`style.css` -> `dist/style.1a2b3c4d5e6f.css`), writes gzip and
+brotli variants next to text assets (gzip only if the `brotli` package is missing), and
+records the mapping in `dist/manifest.json`.
+
+Once a manifest exists, `url_for("static", filename="style.css")` emits the hashed name,
+so templates need no changes. Hashed files never change, so they are served with a
+one-year immutable Cache-Control; nginx can serve them straight from disk (including the
+`.gz`/`.br` copies via `gzip_static`/`brotli_static`), and when Flask serves them it picks
+a precompressed variant the client accepts. Unbuilt trees keep Flask's default behaviour.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+
+from flask import request, send_from_directory
+
+try:
+    import brotli
+except ImportError:  # `flask assets-build` reports that it wrote gzip variants only
+    brotli = None
+
+DIST_DIR = "dist"
+MANIFEST_NAME = "manifest.json"
+COMPRESSIBLE = frozenset({".css", ".js", ".svg", ".ico", ".json", ".txt", ".map", ".html"})
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+def _fingerprint(path: str) -> str:
+    digest = hashlib.blake2b(digest_size=6)
+    with open(path, "rb") as source:
+        for chunk in iter(lambda: source.read(65536), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _write_compressed(path: str) -> list[str]:
+    """Write `.gz`/`.br` copies when they are smaller than the original; returns their paths."""
+    with open(path, "rb") as source:
+        data = source.read()
+    variants = [(".gz", gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append((".br", brotli.compress(data, quality=11)))
+    written = []
+    for suffix, payload in variants:
+        if len(payload) < len(data):
+            with open(path + suffix, "wb") as target:
+                target.write(payload)
+            written.append(path + suffix)
+    return written
+
+
+def _manifest_files(static_folder: str, manifest_path: str) -> set[str]:
+    """The files an existing manifest points at, with their precompressed variants."""
+    try:
+        with open(manifest_path) as source:
+            hashed = json.load(source).values()
+    except (OSError, ValueError):
+        return set()
+    files = set()
+    for name in hashed:
+        path = os.path.join(static_folder, name)
+        files.update([path, *(path + suffix for _, suffix in ENCODINGS)])
+    return files
+
+
+def build_assets(static_folder: str, clean: bool = True) -> dict[str, str]:
+    """
+    Fingerprint and precompress every static file; returns the new manifest. With `clean`,
+    files from builds before the previous one are deleted.
+    """
+    dist = os.path.join(static_folder, DIST_DIR)
+    os.makedirs(dist, exist_ok=True)
+    manifest: dict[str, str] = {}
+    keep = {os.path.join(dist, MANIFEST_NAME)}
+    # Workers still running the previous manifest, and pages cached by browsers and
+    # proxies, keep requesting the previous build's names until they are replaced.
+    keep.update(_manifest_files(static_folder, os.path.join(dist, MANIFEST_NAME)))
+    for root, dirs, files in os.walk(static_folder):
+        if os.path.abspath(root) == os.path.abspath(static_folder):
+            dirs[:] = [name for name in dirs if name != DIST_DIR]
+        for name in sorted(files):
+            source = os.path.join(root, name)
+            logical = os.path.relpath(source, static_folder).replace(os.sep, "/")
+            stem, ext = os.path.splitext(logical)
+            hashed = f"{DIST_DIR}/{stem}.{_fingerprint(source)}{ext}"
+            target = os.path.join(static_folder, hashed)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            if not os.path.exists(target):
+                shutil.copy2(source, target)
+            keep.add(target)
+            if ext.lower() in COMPRESSIBLE:
+                keep.update(_write_compressed(target))
+            manifest[logical] = hashed
+
+    manifest_path = os.path.join(dist, MANIFEST_NAME)
+    with open(manifest_path + ".tmp", "w") as target:
+        json.dump(manifest, target, indent=2, sort_keys=True)
+    os.replace(manifest_path + ".tmp", manifest_path)
+
+    if clean:
+        for root, _, files in os.walk(dist):
+            for name in files:
+                path = os.path.join(root, name)
+                if path not in keep:
+                    os.remove(path)
+    return manifest
+
+
+class AssetManifest:
+    def __init__(self):
+        self.manifest: dict[str, str] = {}
+        self.hashed: frozenset[str] = frozenset()
+        # Identifies the asset build; part of page ETags, since pages embed the hashed names.
+        self.version = ""
+        self.max_age = 31536000
+
+    def init_app(self, app) -> None:
+        path = app.config.get("ASSET_MANIFEST") or os.path.join(app.static_folder, DIST_DIR, MANIFEST_NAME)
+        self.max_age = app.config["ASSET_MAX_AGE"]
+        self.manifest = {}
+        if os.path.exists(path):
+            with open(path) as source:
+                self.manifest = json.load(source)
+        self.hashed = frozenset(self.manifest.values())
+        self.version = hashlib.blake2b(
+            json.dumps(self.manifest, sort_keys=True).encode(), digest_size=6
+        ).hexdigest() if self.manifest else ""
+        if not self.manifest:
+            return
+
+        @app.url_defaults
+        def fingerprint_static_urls(endpoint, values):
+            if endpoint == "static" and "filename" in values:
+                values["filename"] = self.manifest.get(values["filename"], values["filename"])
+
+        app.view_functions["static"] = self._serve(app)
+
+    def _serve(self, app):
+        default_view = app.view_functions["static"]
+
+        def static(filename):
+            if filename not in self.hashed:
+                return default_view(filename=filename)
+            mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+            accepted = request.accept_encodings
+            response = None
+            for encoding, suffix in ENCODINGS:
+                if accepted[encoding] and os.path.exists(os.path.join(app.static_folder, filename + suffix)):
+                    response = send_from_directory(
+                        app.static_folder, filename + suffix, mimetype=mimetype, max_age=self.max_age
+                    )
+                    response.content_encoding = encoding
+                    break
+            if response is None:
+                response = send_from_directory(app.static_folder, filename, max_age=self.max_age)
+            response.cache_control.public = True
+            response.cache_control.immutable = True
+            response.vary.add("Accept-Encoding")
+            return response
+
+        return static
+
+
+assets = AssetManifest()
@@ -3,8 +3,10 @@ from flask_login import current_user, login_required, login_user, logout_user
 
 from app import db
 from app.email_utils import send_email_confirmation
-from app.forms import LoginForm, RegisterForm
+from app.forms import LoginForm, RegisterForm, ResendConfirmationForm
 from app.models import User
+from app.rate_limit import remember_account
+from app.user_cache import invalidate_user
 
 auth_bp = Blueprint("auth", __name__)
 
@@ -22,10 +24,11 @@ def register():
         )
         user.set_password(form.password.data)
         db.session.add(user)
-        db.session.commit()
 
         token = user.generate_confirmation_token()
         send_email_confirmation(user.email, user.username, token)
+        db.session.commit()
+        remember_account(user.email)
 
         flash("Account created. Please check your email to confirm your address.", "success")
         return redirect(url_for("auth.login"))
@@ -41,6 +44,7 @@ def login():
     if form.validate_on_submit():
         user = User.query.filter_by(email=form.email.data.lower()).first()
         if user and user.check_password(form.password.data):
+            remember_account(user.email)
             if user.is_blocked:
                 flash("This account is blocked. Contact an administrator.", "danger")
                 return redirect(url_for("auth.login"))
@@ -62,6 +66,23 @@ def logout():
     return redirect(url_for("main.index"))
 
 
+@auth_bp.route("/confirm/resend", methods=["GET", "POST"])
+def resend_confirmation():
+    if current_user.is_authenticated:
+        return redirect(url_for("main.index"))
+
+    form = ResendConfirmationForm()
+    if form.validate_on_submit():
+        user = User.query.filter_by(email=form.email.data.lower()).first()
+        if user and not user.confirmed and not user.is_blocked:
+            send_email_confirmation(user.email, user.username, user.generate_confirmation_token())
+            db.session.commit()
+        # Same answer whether or not the address exists, so the form can't probe accounts.
+        flash("If that address needs confirming, a new link is on its way.", "info")
+        return redirect(url_for("auth.login"))
+    return render_template("auth/resend.html", form=form)
+
+
 @auth_bp.route("/confirm/<token>")
 def confirm_email(token):
     from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
@@ -86,6 +107,7 @@ def confirm_email(token):
         return redirect(url_for("main.index"))
 
     user.confirmed = True
+    invalidate_user(user.id)
     db.session.commit()
     flash("Email confirmed. You can now participate.", "success")
     return redirect(url_for("auth.login"))
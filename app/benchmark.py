@@ -0,0 +1,374 @@
+"""
+Seeded synthetic data and a benchmark harness for `flask bench-seed` / `flask bench`.
+
+The generator is deterministic for a given seed and loads its data through the bulk
+importer, so seeding twice is a no-op. The harness drives the app through Flask's test
+client and records, per route, latency percentiles, SQL statements per request and peak
+Python memory (tracemalloc), plus the POST flows and raw Markdown rendering throughput.
+Results are plain JSON; `compare_results` flags regressions against a stored baseline.
+"""
+import platform
+import random
+import time
+import tracemalloc
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from importlib.metadata import version
+
+from flask import current_app, url_for
+from werkzeug.security import generate_password_hash
+
+from app import db
+from app.importer import import_debates, import_users
+from app.models import Argument, Opinion
+from app.page_cache import NullBackend, page_cache
+from app.queries import count_statements
+from app.utils import MarkdownRenderer
+
+BENCH_SOURCE = "bench"
+BENCH_PASSWORD = "bench-password"
+SEED_EPOCH = datetime(2024, 1, 1)
+
+_WORDS = (
+    "argument evidence policy cost benefit risk reason claim budget school city transit "
+    "health housing energy climate data study trade tax vote rights market labour history "
+    "future community safety privacy freedom fairness growth research access quality"
+).split()
+
+READ_ROUTES = (
+    "main.index",
+    "main.view_opinion",
+    "main.view_argument",
+    "main.search_view",
+    "api.list_opinions",
+    "api.get_opinion",
+    "api.get_argument",
+)
+
+
+@dataclass
+class SeedSpec:
+    seed: int = 1
+    users: int = 50
+    opinions: int = 200
+    arguments_per_stance: int = 3
+    reasoning_per_argument: int = 5
+    paragraphs: int = 3
+    complexity: str = "mixed"
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+def _sentence(rng: random.Random, words: int = 12) -> str:
+    text = " ".join(rng.choice(_WORDS) for _ in range(words))
+    return text[0].upper() + text[1:] + "."
+
+
+def generate_markdown(rng: random.Random, paragraphs: int, complexity: str) -> str:
+    """Markdown of `paragraphs` blocks; "mixed" adds inline markup, "rich" block structures."""
+    blocks = []
+    for index in range(max(paragraphs, 1)):
+        sentences = [_sentence(rng) for _ in range(rng.randint(2, 4))]
+        if complexity in ("mixed", "rich"):
+            word = rng.choice(_WORDS)
+            sentences[0] = sentences[0].replace(word, f"**{word}**", 1)
+            sentences[-1] += f" See [{rng.choice(_WORDS)}](https://example.org/{index}) and `{rng.choice(_WORDS)}`."
+        blocks.append(" ".join(sentences))
+        if complexity == "rich":
+            kind = index % 4
+            if kind == 0:
+                blocks.append("\n".join(f"- {_sentence(rng, 6)}" for _ in range(4)))
+            elif kind == 1:
+                blocks.append(f"> {_sentence(rng)}")
+            elif kind == 2:
+                blocks.append("```\n" + "\n".join(_sentence(rng, 5) for _ in range(3)) + "\n```")
+            else:
+                rows = "\n".join(f"| {rng.choice(_WORDS)} | {rng.randint(1, 999)} |" for _ in range(4))
+                blocks.append("| term | value |\n| --- | --- |\n" + rows)
+    return "\n\n".join(blocks)
+
+
+def _user_records(spec: SeedSpec):
+    password_hash = generate_password_hash(BENCH_PASSWORD)
+    for index in range(spec.users):
+        yield index + 1, {
+            "email": f"bench-user-{index}@bench.example.com",
+            "username": f"bench-user-{index}",
+            "password_hash": password_hash,
+            "confirmed": True,
+            "created_at": SEED_EPOCH.isoformat(),
+        }
+
+
+def _debate_records(spec: SeedSpec):
+    rng = random.Random(spec.seed)
+    line = 0
+
+    def record(**fields):
+        nonlocal line
+        line += 1
+        return line, fields
+
+    for opinion in range(spec.opinions):
+        created = SEED_EPOCH + timedelta(minutes=opinion * 7)
+        yield record(
+            type="opinion",
+            id=f"o{opinion}",
+            title=_sentence(rng, rng.randint(4, 9))[:160],
+            content=generate_markdown(rng, spec.paragraphs, spec.complexity),
+            author=f"bench-user-{rng.randrange(spec.users)}",
+            created_at=created.isoformat(),
+        )
+        for stance in ("for", "against"):
+            for number in range(spec.arguments_per_stance):
+                argument_id = f"a{opinion}-{stance}-{number}"
+                yield record(
+                    type="argument",
+                    id=argument_id,
+                    opinion_id=f"o{opinion}",
+                    stance=stance,
+                    content=generate_markdown(rng, max(spec.paragraphs // 2, 1), spec.complexity),
+                    author=f"bench-user-{rng.randrange(spec.users)}",
+                    created_at=(created + timedelta(seconds=number + 1)).isoformat(),
+                )
+                for reason in range(spec.reasoning_per_argument):
+                    yield record(
+                        type="reasoning",
+                        id=f"{argument_id}-{reason}",
+                        argument_id=argument_id,
+                        content=generate_markdown(rng, 1, spec.complexity),
+                        author=f"bench-user-{rng.randrange(spec.users)}",
+                        created_at=(created + timedelta(seconds=60 + reason)).isoformat(),
+                    )
+
+
+def seed(spec: SeedSpec, batch_size: int = 1000):
+    """Load the synthetic data set; returns the user and debate import stats."""
+    users = import_users(_user_records(spec), batch_size, workers=1)
+    debates = import_debates(_debate_records(spec), batch_size, source=f"{BENCH_SOURCE}-{spec.seed}")
+    return users, debates
+
+
+def _timings(latencies: list[float], statements: list[int], peak_bytes: int, errors: int) -> dict:
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0.0,
+        "max_ms": round(max(latencies, default=0) * 1000, 3),
+        "statements_mean": round(sum(statements) / len(statements), 2) if statements else 0.0,
+        "statements_max": max(statements, default=0),
+        "peak_kib": round(peak_bytes / 1024, 1),
+    }
+
+
+def _measure(client, method: str, urls, expected: int, memory_samples: int, data=None) -> dict:
+    latencies, statements, errors = [], [], 0
+    for url in urls:
+        with count_statements() as counter:
+            started = time.perf_counter()
+            response = client.open(url, method=method, data=data(url) if data else None)
+            latencies.append(time.perf_counter() - started)
+        statements.append(counter.count)
+        errors += response.status_code != expected
+    peak = 0
+    tracemalloc.start()
+    try:
+        for url in urls[:memory_samples]:
+            tracemalloc.reset_peak()
+            client.open(url, method=method, data=data(url) if data else None)
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+    finally:
+        tracemalloc.stop()
+    return _timings(latencies, statements, peak, errors)
+
+
+def _read_urls(endpoint: str, rng: random.Random, opinion_ids, argument_ids, count: int) -> list[str]:
+    urls = []
+    for _ in range(count):
+        if endpoint in ("main.view_opinion", "api.get_opinion"):
+            urls.append(url_for(endpoint, opinion_id=rng.choice(opinion_ids)))
+        elif endpoint in ("main.view_argument", "api.get_argument"):
+            urls.append(url_for(endpoint, argument_id=rng.choice(argument_ids)))
+        elif endpoint == "main.search_view":
+            urls.append(url_for(endpoint, q=" ".join(rng.sample(_WORDS, 2))))
+        else:
+            urls.append(url_for(endpoint))
+    return urls
+
+
+def bench_routes(iterations: int, rng: random.Random, memory_samples: int) -> dict:
+    opinion_ids = db.session.execute(db.select(Opinion.id)).scalars().all()
+    argument_ids = db.session.execute(db.select(Argument.id)).scalars().all()
+    if not opinion_ids or not argument_ids:
+        raise LookupError("No data to benchmark; run `flask bench-seed` first.")
+    with current_app.test_request_context():
+        plans = {
+            endpoint: _read_urls(endpoint, rng, opinion_ids, argument_ids, iterations)
+            for endpoint in READ_ROUTES
+        }
+    db.session.remove()
+    client = current_app.test_client()
+    results = {}
+    for endpoint, urls in plans.items():
+        for url in urls[: max(iterations // 10, 1)]:
+            client.get(url)  # warm-up
+        results[endpoint] = _measure(client, "GET", urls, 200, memory_samples)
+    return results
+
+
+def bench_posts(iterations: int, rng: random.Random, memory_samples: int) -> dict:
+    """Time the three write flows as a signed-in seeded user (CSRF and rate limits are off for the run)."""
+    config = current_app.config
+    csrf_enabled = config.get("WTF_CSRF_ENABLED", True)
+    ratelimit_enabled = config["RATELIMIT_ENABLED"]
+    config["WTF_CSRF_ENABLED"] = False
+    config["RATELIMIT_ENABLED"] = False
+    try:
+        opinion_id = db.session.execute(db.select(db.func.max(Opinion.id))).scalar()
+        argument_id = db.session.execute(
+            db.select(db.func.max(Argument.id)).where(Argument.opinion_id == opinion_id)
+        ).scalar()
+        db.session.remove()
+        with current_app.test_request_context():
+            login_url = url_for("auth.login")
+            flows = {
+                "post.opinion": url_for("main.new_opinion"),
+                "post.argument": url_for("main.new_argument", opinion_id=opinion_id),
+                "post.reasoning": url_for("main.new_reasoning", argument_id=argument_id),
+            }
+        client = current_app.test_client()
+        login = client.post(login_url, data={"email": "bench-user-0@bench.example.com", "password": BENCH_PASSWORD})
+        if login.status_code != 302:
+            raise LookupError("Could not sign in as bench-user-0; run `flask bench-seed` first.")
+
+        def form(url):
+            text = generate_markdown(rng, 1, "mixed")
+            return {
+                "title": _sentence(rng, 5),
+                "content": text,
+                "stance": rng.choice(["for", "against"]),
+                "first_argument_stance": "for",
+                "first_argument_content": text,
+                "first_reasoning_content": text,
+            }
+
+        return {
+            name: _measure(client, "POST", [url] * iterations, 302, memory_samples, data=form)
+            for name, url in flows.items()
+        }
+    finally:
+        config["WTF_CSRF_ENABLED"] = csrf_enabled
+        config["RATELIMIT_ENABLED"] = ratelimit_enabled
+
+
+def bench_markdown(documents: int, rng: random.Random, paragraphs: int, complexity: str) -> dict:
+    """Uncached render throughput: a renderer with no memo cache converts every document."""
+    texts = [generate_markdown(rng, paragraphs, complexity) for _ in range(documents)]
+    renderer = MarkdownRenderer(maxsize=0)
+    latencies = []
+    started = time.perf_counter()
+    for text in texts:
+        began = time.perf_counter()
+        renderer.render(text)
+        latencies.append(time.perf_counter() - began)
+    elapsed = time.perf_counter() - started
+    total_kib = sum(len(text.encode()) for text in texts) / 1024
+    return {
+        "documents": documents,
+        "docs_per_s": round(documents / elapsed, 1),
+        "kib_per_s": round(total_kib / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+    }
+
+
+def run_benchmarks(
+    iterations: int = 200,
+    seed_value: int = 1,
+    include_posts: bool = False,
+    page_cache_enabled: bool = True,
+    memory_samples: int = 20,
+) -> dict:
+    rng = random.Random(seed_value)
+    backend = page_cache.backend
+    if not page_cache_enabled:
+        page_cache.backend = NullBackend()
+    try:
+        results = {
+            "meta": {
+                "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+                "seed": seed_value,
+                "iterations": iterations,
+                "page_cache": type(page_cache.backend).__name__,
+                "database": db.engine.dialect.name,
+                "python": platform.python_version(),
+                "flask": version("flask"),
+                "sqlalchemy": version("sqlalchemy"),
+                "opinions": db.session.execute(db.select(db.func.count(Opinion.id))).scalar(),
+            },
+            "routes": bench_routes(iterations, rng, memory_samples),
+            "markdown": bench_markdown(iterations, rng, 3, "rich"),
+        }
+        if include_posts:
+            results["posts"] = bench_posts(max(iterations // 10, 1), rng, min(memory_samples, 5))
+        return results
+    finally:
+        page_cache.backend = backend
+
+
+@dataclass
+class Regression:
+    section: str
+    name: str
+    metric: str
+    baseline: float
+    current: float
+
+    def __str__(self) -> str:
+        return f"{self.section}/{self.name} {self.metric}: {self.baseline} -> {self.current}"
+
+
+COMPARABLE_META = ("iterations", "page_cache", "database", "opinions")
+
+
+def meta_mismatches(current: dict, baseline: dict) -> list[str]:
+    """Run settings that differ between two result files and make them hard to compare."""
+    before, now = baseline.get("meta", {}), current.get("meta", {})
+    return [
+        f"{key}: {before.get(key)} -> {now.get(key)}"
+        for key in COMPARABLE_META
+        if before.get(key) != now.get(key)
+    ]
+
+
+def compare_results(current: dict, baseline: dict, tolerance: float) -> list[Regression]:
+    """
+    Latency and memory may grow by `tolerance` (a fraction) before they count as a
+    regression; any increase in the worst-case statement count is one.
+    """
+    regressions = []
+    for section in ("routes", "posts"):
+        for name, now in current.get(section, {}).items():
+            before = baseline.get(section, {}).get(name)
+            if before is None:
+                continue
+            for metric in ("p95_ms", "peak_kib"):
+                if now[metric] > before[metric] * (1 + tolerance):
+                    regressions.append(Regression(section, name, metric, before[metric], now[metric]))
+            if now["statements_max"] > before["statements_max"]:
+                regressions.append(
+                    Regression(section, name, "statements_max", before["statements_max"], now["statements_max"])
+                )
+    before = baseline.get("markdown")
+    now = current.get("markdown")
+    if before and now and now["docs_per_s"] < before["docs_per_s"] * (1 - tolerance):
+        regressions.append(Regression("markdown", "render", "docs_per_s", before["docs_per_s"], now["docs_per_s"]))
+    return regressions
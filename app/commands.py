@@ -0,0 +1,515 @@
+import json
+import os
+import time
+from contextlib import nullcontext
+from datetime import timedelta
+
+import click
+from flask import Flask, current_app, url_for
+from flask.cli import with_appcontext
+from werkzeug.exceptions import HTTPException
+
+from app import db
+from app.assets import build_assets
+from app.counters import find_counter_drift, repair_counter_drift
+from app.email_utils import process_outbox, requeue_dead_letters
+from app.export import export_records
+from app.live import prune_events
+from app.models import Argument, Opinion, Reasoning, touch_values
+from app.page_cache import page_cache
+from app.queries import QUERY_BUDGETS, count_statements, explain_hot_queries
+from app.ranking import decay_hot_scores, recompute_hot_scores
+from app.search import bulk_load, rebuild_index
+from app.snapshots import find_snapshot_drift, refresh_in_batches, stale_snapshot_ids
+from app.utils import RENDERER_VERSION
+
+
+def _owning_opinion_ids(model, rows) -> set[int]:
+    if model is Opinion:
+        return {row.id for row in rows}
+    if model is Argument:
+        return {row.opinion_id for row in rows}
+    argument_ids = {row.argument_id for row in rows}
+    return set(
+        db.session.execute(
+            db.select(Argument.opinion_id).where(Argument.id.in_(argument_ids)).distinct()
+        ).scalars()
+    )
+
+
+@click.command("render-content")
+@click.option("--batch-size", default=500, show_default=True, help="Rows rendered per commit.")
+@click.option("--all", "render_all", is_flag=True, help="Re-render every row, not only stale ones.")
+@with_appcontext
+def render_content_command(batch_size: int, render_all: bool) -> None:
+    """Backfill or refresh stored HTML for opinions, arguments and reasoning."""
+    for model in (Opinion, Argument, Reasoning):
+        rendered = 0
+        last_id = 0
+        while True:
+            query = model.query.filter(model.id > last_id)
+            if not render_all:
+                query = query.filter(model.stale_filter())
+            rows = query.order_by(model.id).limit(batch_size).all()
+            if not rows:
+                break
+            for row in rows:
+                row.render_content()
+            # New HTML must change the ETags and fragment-cache keys of the pages showing it.
+            db.session.flush()
+            db.session.execute(
+                Opinion.__table__.update()
+                .where(Opinion.__table__.c.id.in_(_owning_opinion_ids(model, rows)))
+                .values(touch_values())
+            )
+            db.session.commit()
+            rendered += len(rows)
+            last_id = rows[-1].id
+        click.echo(f"{model.__tablename__}: rendered {rendered} row(s) at version {RENDERER_VERSION}")
+    # Snapshots embed the rendered HTML; the touched opinions' snapshots are now behind.
+    opinion_ids = stale_snapshot_ids()
+    refresh_in_batches(opinion_ids, batch_size)
+    click.echo(f"opinion_snapshot: rebuilt {len(opinion_ids)} snapshot(s)")
+
+
+@click.command("check-counters")
+@click.option("--repair", is_flag=True, help="Rewrite drifted counters from the live tables.")
+@with_appcontext
+def check_counters_command(repair: bool) -> None:
+    """Verify the for/against and reasoning counters against the live tables."""
+    drift = find_counter_drift()
+    for item in drift:
+        click.echo(f"{item.table} {item.row_id}: {item.column} stored={item.stored} actual={item.actual}")
+    if not drift:
+        click.echo("All counters are consistent.")
+        return
+    if repair:
+        repair_counter_drift(drift)
+        click.echo(f"Repaired {len(drift)} counter(s).")
+    else:
+        raise click.ClickException(f"{len(drift)} counter(s) drifted; rerun with --repair.")
+
+
+@click.command("check-snapshots")
+@click.option("--repair", is_flag=True, help="Rebuild drifted snapshots from the live tables.")
+@with_appcontext
+def check_snapshots_command(repair: bool) -> None:
+    """Verify every opinion snapshot against the live opinion, argument and user tables."""
+    drift = find_snapshot_drift()
+    for item in drift:
+        click.echo(f"opinion {item.opinion_id}: {item.problem}")
+    if not drift:
+        click.echo("All snapshots are consistent.")
+        return
+    if repair:
+        refresh_in_batches([item.opinion_id for item in drift])
+        click.echo(f"Rebuilt {len(drift)} snapshot(s).")
+    else:
+        raise click.ClickException(f"{len(drift)} snapshot(s) drifted; rerun with --repair.")
+
+
+@click.command("rank-decay")
+@click.option("--recompute", is_flag=True, help="First rebuild every hot score from the activity timestamps.")
+@with_appcontext
+def rank_decay_command(recompute: bool) -> None:
+    """Decay hot scores to the current time; run periodically, e.g. hourly."""
+    if recompute:
+        rescored = recompute_hot_scores()
+        db.session.commit()
+        click.echo(f"Recomputed {rescored} hot score(s).")
+    factor = decay_hot_scores()
+    click.echo(f"Scaled hot scores by {factor:.6g}.")
+
+
+@click.command("live-prune")
+@click.option("--hours", type=float, help="Keep events younger than this (LIVE_RETENTION_HOURS).")
+@with_appcontext
+def live_prune_command(hours: float | None) -> None:
+    """Delete live-update events older than the retention window; run periodically."""
+    hours = current_app.config["LIVE_RETENTION_HOURS"] if hours is None else hours
+    deleted = prune_events(timedelta(hours=hours))
+    click.echo(f"Deleted {deleted} live event(s).")
+
+
+@click.command("check-query-budgets")
+@with_appcontext
+def check_query_budgets_command() -> None:
+    """Fetch the read pages anonymously and fail if any exceeds its SQL statement budget."""
+    opinion = Opinion.query.order_by(Opinion.id).first()
+    argument = Argument.query.order_by(Argument.id).first()
+    if opinion is None or argument is None:
+        raise click.ClickException("Need at least one opinion and argument to exercise the pages.")
+
+    with current_app.test_request_context():
+        targets = {
+            "main.index": url_for("main.index"),
+            "main.view_opinion": url_for("main.view_opinion", opinion_id=opinion.id),
+            "main.view_argument": url_for("main.view_argument", argument_id=argument.id),
+            "api.list_opinions": url_for("api.list_opinions"),
+            "api.get_opinion": url_for("api.get_opinion", opinion_id=opinion.id),
+            "api.get_argument": url_for("api.get_argument", argument_id=argument.id),
+        }
+    db.session.remove()
+
+    client = current_app.test_client()
+    failures = 0
+    for endpoint, path in targets.items():
+        with count_statements() as counter:
+            response = client.get(path)
+        budget = QUERY_BUDGETS[endpoint]
+        status = "ok" if counter.count <= budget and response.status_code == 200 else "FAIL"
+        failures += status == "FAIL"
+        click.echo(f"{status:4} {endpoint}: {counter.count}/{budget} statements ({response.status_code})")
+    if failures:
+        raise click.ClickException(f"{failures} endpoint(s) exceeded their statement budget.")
+
+
+@click.command("check-query-plans")
+@click.option("--verbose", is_flag=True, help="Print every plan, not only failing ones.")
+@with_appcontext
+def check_query_plans_command(verbose: bool) -> None:
+    """EXPLAIN the read-page queries and fail if any falls back to a full table scan."""
+    try:
+        plans = explain_hot_queries()
+    except (LookupError, NotImplementedError) as exc:
+        raise click.ClickException(str(exc))
+
+    failures = [plan for plan in plans if plan.full_scans]
+    for plan in plans:
+        if verbose or plan.full_scans:
+            status = "FAIL" if plan.full_scans else "ok"
+            click.echo(f"{status} [{plan.label}] {plan.statement}")
+            for line in plan.plan:
+                click.echo(f"    {line}")
+    if failures:
+        raise click.ClickException(f"{len(failures)} statement(s) use a full table scan.")
+    click.echo(f"All {len(plans)} hot statements use indexes.")
+
+
+@click.command("search-rebuild")
+@with_appcontext
+def search_rebuild_command() -> None:
+    """Create the full-text search index if needed and repopulate it from existing data."""
+    try:
+        indexed = rebuild_index()
+    except RuntimeError as exc:
+        raise click.ClickException(f"{exc} Other databases use a LIKE fallback; nothing to rebuild.")
+    click.echo(f"Indexed {indexed} document(s).")
+
+
+@click.command("mail-worker")
+@click.option("--once", is_flag=True, help="Drain the due messages once and exit.")
+@click.option("--interval", default=5.0, show_default=True, help="Seconds to sleep when idle.")
+@click.option("--batch-size", type=int, help="Messages per SMTP connection (MAIL_OUTBOX_BATCH_SIZE).")
+@click.option("--requeue-dead", is_flag=True, help="Move dead-lettered messages back to pending first.")
+@with_appcontext
+def mail_worker_command(once: bool, interval: float, batch_size: int | None, requeue_dead: bool) -> None:
+    """Send queued outbound email with retries and exponential backoff."""
+    if requeue_dead:
+        click.echo(f"Requeued {requeue_dead_letters()} dead-lettered message(s).")
+    while True:
+        run = process_outbox(batch_size)
+        if run.claimed:
+            click.echo(f"sent={run.sent} retried={run.retried} dead={run.dead}")
+        db.session.remove()
+        if run.claimed and run.sent:
+            continue
+        if once:
+            return
+        time.sleep(interval)
+
+
+@click.command("page-cache-clear")
+@with_appcontext
+def page_cache_clear_command() -> None:
+    """Drop every cached page fragment (only meaningful for the shared sqlite backend)."""
+    page_cache.backend.clear()
+    click.echo(f"Cleared the {type(page_cache.backend).__name__} page cache.")
+
+
+@click.command("db-stress")
+@click.option("--writers", default=4, show_default=True, help="Writer processes.")
+@click.option("--readers", default=8, show_default=True, help="Reader processes.")
+@click.option("--duration", default=10.0, show_default=True, help="Seconds to run.")
+@click.option("--keep", is_flag=True, help="Keep the generated rows instead of deleting them.")
+@click.option("--yes", is_flag=True, help="Do not ask for confirmation.")
+@with_appcontext
+def db_stress_command(writers: int, readers: int, duration: float, keep: bool, yes: bool) -> None:
+    """Run parallel writers and readers against the database and report locks and latency."""
+    from app.stress import cleanup_target, run_stress
+
+    if not yes:
+        click.confirm(
+            f"This writes test rows to {db.engine.url.render_as_string(hide_password=True)}. Continue?",
+            abort=True,
+        )
+    reports = run_stress(writers, readers, duration)
+    failed = False
+    for report in reports.values():
+        click.echo(
+            f"{report.role:<7} ops={report.ops} ({report.ops / duration:.1f}/s) "
+            f"lock_errors={report.lock_errors} other_errors={report.other_errors} "
+            f"p50={report.percentile(0.5) * 1000:.1f}ms p95={report.percentile(0.95) * 1000:.1f}ms "
+            f"max={max(report.latencies, default=0) * 1000:.1f}ms"
+        )
+        failed = failed or bool(report.lock_errors or report.other_errors)
+    if not keep:
+        click.echo(f"Removed {cleanup_target()} stress reasoning row(s).")
+    if failed:
+        raise SystemExit(1)
+
+
+@click.command("export")
+@click.option("--since", help="Watermark from a previous export; only debates changed after it are written.")
+@click.option("--output", "-o", type=click.File("w", encoding="utf-8"), default="-", help="File to write (default stdout).")
+@click.option("--batch-size", type=int, help="Opinions per batch (EXPORT_BATCH_SIZE).")
+@with_appcontext
+def export_command(since: str | None, output, batch_size: int | None) -> None:
+    """Stream debates as NDJSON: opinions, then their arguments and reasoning, batch by batch."""
+    try:
+        records = export_records(since, batch_size)
+    except HTTPException:
+        raise click.BadParameter("not a valid export watermark", param_hint="--since")
+    watermark, exported = since, 0
+    for record in records:
+        output.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+        if record["type"] == "watermark":
+            watermark = record["since"]
+        else:
+            exported += 1
+    click.echo(f"Exported {exported} record(s); resume with --since {watermark or ''}", err=True)
+
+
+def _input_format(path: str, fmt: str | None) -> str:
+    if fmt:
+        return fmt
+    return "csv" if path.lower().endswith(".csv") else "jsonl"
+
+
+def _report_import(stats) -> None:
+    for message in stats.errors:
+        click.echo(f"  {message}", err=True)
+    click.echo(stats.summary())
+    if stats.stale:
+        click.echo(
+            f"{stats.stale} row(s) were stored with plain-text HTML because rendering timed out; "
+            "run `flask render-content` to convert them.",
+            err=True,
+        )
+    if stats.failed:
+        raise click.ClickException(f"{stats.failed} record(s) could not be imported.")
+
+
+@click.command("import-users")
+@click.argument("path", type=click.Path(allow_dash=True))
+@click.option("--format", "fmt", type=click.Choice(["csv", "jsonl"]), help="Input format (default: by extension).")
+@click.option("--batch-size", default=1000, show_default=True, help="Rows per insert and commit.")
+@click.option("--workers", type=int, default=lambda: os.cpu_count() or 1, help="Password hashing processes.")
+@click.option("--dry-run", is_flag=True, help="Validate and count without hashing or writing.")
+@with_appcontext
+def import_users_command(path: str, fmt: str | None, batch_size: int, workers: int, dry_run: bool) -> None:
+    """Bulk-load users (email, username, password or password_hash, is_admin, confirmed, created_at)."""
+    from app.importer import import_users, read_records
+
+    with click.open_file(path, encoding="utf-8") as stream:
+        stats = import_users(
+            read_records(stream, _input_format(path, fmt)),
+            batch_size,
+            workers,
+            dry_run=dry_run,
+            on_batch=lambda stats: click.echo(stats.summary(), err=True),
+        )
+    _report_import(stats)
+
+
+@click.command("import-debates")
+@click.argument("path", type=click.Path(allow_dash=True))
+@click.option("--format", "fmt", type=click.Choice(["csv", "jsonl"]), help="Input format (default: by extension).")
+@click.option("--batch-size", default=1000, show_default=True, help="Records per batch and commit.")
+@click.option("--source", default="default", show_default=True, help="Name of the source system; ids are tracked per source for resuming.")
+@click.option("--dry-run", is_flag=True, help="Validate and resolve references without writing.")
+@click.option("--keep-search-triggers", is_flag=True, help="Index row by row instead of rebuilding the search index at the end.")
+@with_appcontext
+def import_debates_command(
+    path: str, fmt: str | None, batch_size: int, source: str, dry_run: bool, keep_search_triggers: bool
+) -> None:
+    """Bulk-load opinions, arguments and reasoning in the `flask export` record format."""
+    from app.importer import import_debates, read_records
+
+    search_load = nullcontext() if dry_run or keep_search_triggers else bulk_load()
+    with click.open_file(path, encoding="utf-8") as stream, search_load:
+        stats = import_debates(
+            read_records(stream, _input_format(path, fmt)),
+            batch_size,
+            source,
+            dry_run=dry_run,
+            on_batch=lambda stats: click.echo(stats.summary(), err=True),
+        )
+    _report_import(stats)
+
+
+@click.command("bench-seed")
+@click.option("--seed", "seed_value", default=1, show_default=True, help="Random seed; the same seed yields the same data.")
+@click.option("--users", default=50, show_default=True)
+@click.option("--opinions", default=200, show_default=True)
+@click.option("--arguments-per-stance", default=3, show_default=True)
+@click.option("--reasoning-per-argument", default=5, show_default=True)
+@click.option("--paragraphs", default=3, show_default=True, help="Markdown blocks per opinion.")
+@click.option("--complexity", type=click.Choice(["plain", "mixed", "rich"]), default="mixed", show_default=True)
+@with_appcontext
+def bench_seed_command(seed_value: int, **sizes) -> None:
+    """Load a deterministic synthetic data set for benchmarking (idempotent per seed)."""
+    from app.benchmark import SeedSpec, seed
+
+    users, debates = seed(SeedSpec(seed=seed_value, **sizes))
+    click.echo(f"users: {users.summary()}")
+    click.echo(f"debates: {debates.summary()}")
+
+
+@click.command("bench")
+@click.option("--iterations", default=200, show_default=True, help="Requests per route.")
+@click.option("--seed", "seed_value", default=1, show_default=True, help="Seed for the request mix.")
+@click.option("--posts", is_flag=True, help="Also time the POST flows (writes to the database).")
+@click.option("--no-page-cache", is_flag=True, help="Bypass the fragment cache for the run.")
+@click.option("--output", "-o", type=click.File("w"), help="Write the JSON results here.")
+@click.option("--baseline", type=click.File("r"), help="Compare against a stored results file.")
+@click.option("--tolerance", default=0.2, show_default=True, help="Allowed fractional slowdown before a regression.")
+@with_appcontext
+def bench_command(
+    iterations: int, seed_value: int, posts: bool, no_page_cache: bool, output, baseline, tolerance: float
+) -> None:
+    """Benchmark every read route, the POST flows and Markdown rendering; emit JSON."""
+    from app.benchmark import compare_results, meta_mismatches, run_benchmarks
+
+    try:
+        results = run_benchmarks(
+            iterations, seed_value, include_posts=posts, page_cache_enabled=not no_page_cache
+        )
+    except LookupError as exc:
+        raise click.ClickException(str(exc))
+    for section in ("routes", "posts"):
+        for name, timing in results.get(section, {}).items():
+            click.echo(
+                f"{name:<20} p50={timing['p50_ms']:.2f}ms p95={timing['p95_ms']:.2f}ms "
+                f"sql={timing['statements_max']} peak={timing['peak_kib']}KiB errors={timing['errors']}"
+            )
+    markdown = results["markdown"]
+    click.echo(f"{'markdown':<20} {markdown['docs_per_s']} docs/s {markdown['kib_per_s']} KiB/s")
+    if output:
+        json.dump(results, output, indent=2)
+        output.write("\n")
+    if baseline:
+        baseline_results = json.load(baseline)
+        for mismatch in meta_mismatches(results, baseline_results):
+            click.echo(f"warning: baseline was recorded with different settings ({mismatch})", err=True)
+        regressions = compare_results(results, baseline_results, tolerance)
+        for regression in regressions:
+            click.echo(f"REGRESSION {regression}")
+        if regressions:
+            raise click.ClickException(f"{len(regressions)} regression(s) against the baseline.")
+        click.echo("No regressions against the baseline.")
+
+
+@click.command("assets-build")
+@click.option("--no-clean", is_flag=True, help="Keep files of all earlier builds, not only the previous one.")
+@with_appcontext
+def assets_build_command(no_clean: bool) -> None:
+    """Write content-hashed, precompressed copies of the static files and their manifest."""
+    from app.assets import brotli
+
+    manifest = build_assets(current_app.static_folder, clean=not no_clean)
+    for logical, hashed in sorted(manifest.items()):
+        click.echo(f"{logical} -> {hashed}")
+    if brotli is None:
+        click.echo("brotli is not installed: wrote .gz copies only, no .br (pip install Brotli).", err=True)
+    click.echo(f"Wrote {len(manifest)} asset(s); restart the app to pick up the new manifest.")
+
+
+@click.command("startup-profile")
+@click.option("--top", default=15, show_default=True, help="Packages to list by import time.")
+@with_appcontext
+def startup_profile_command(top: int) -> None:
+    """Time importing the app and running create_app in a fresh interpreter."""
+    from app.startup import LAZY_MODULES, profile_startup
+
+    try:
+        profile = profile_startup(os.path.dirname(current_app.root_path))
+    except RuntimeError as exc:
+        raise click.ClickException(f"Profiling failed: {exc}")
+    click.echo(f"import app     {profile.import_s * 1000:8.1f}ms")
+    click.echo(f"create_app()   {profile.factory_s * 1000:8.1f}ms")
+    for phase, seconds in profile.phases.items():
+        click.echo(f"  {phase:<12} {seconds * 1000:8.1f}ms")
+    click.echo(f"Import self time by package (top {top}):")
+    for package, micros in profile.by_package()[:top]:
+        click.echo(f"  {package:<24} {micros / 1000:8.1f}ms")
+    loaded = profile.lazy_loaded()
+    if loaded:
+        click.echo(f"Loaded at startup although deferred: {', '.join(loaded)}")
+    else:
+        click.echo(f"Deferred until first use: {', '.join(LAZY_MODULES)}")
+
+
+@click.command("replica-sync")
+@click.option("--interval", default=0.0, help="Keep copying every N seconds instead of once.")
+@with_appcontext
+def replica_sync_command(interval: float) -> None:
+    """Copy the primary SQLite database onto the SQLite read replica (local testing)."""
+    from app.replica import REPLICA_BIND, sync_sqlite_replica
+
+    replica_engine = db.engines.get(REPLICA_BIND)
+    if replica_engine is None:
+        raise click.ClickException("DATABASE_REPLICA_URL is not set.")
+    while True:
+        started = time.perf_counter()
+        try:
+            sync_sqlite_replica(db.engine.url, replica_engine.url)
+        except ValueError as exc:
+            raise click.ClickException(str(exc))
+        click.echo(f"Copied the primary to the replica in {(time.perf_counter() - started) * 1000:.1f}ms.")
+        if interval <= 0:
+            break
+        time.sleep(interval)
+
+
+@click.command("ratelimit-check")
+@click.option("--processes", default=8, show_default=True, help="Concurrent worker processes.")
+@click.option("--attempts", default=200, show_default=True, help="Takes per process.")
+@click.option("--capacity", default=50, show_default=True, help="Tokens in the shared bucket.")
+@with_appcontext
+def ratelimit_check_command(processes: int, attempts: int, capacity: int) -> None:
+    """Race processes for one rate-limit bucket and check exactly `capacity` takes get through."""
+    from app.rate_limit import check_shared_limit
+
+    try:
+        admitted, elapsed = check_shared_limit(processes, attempts, capacity)
+    except ValueError as exc:
+        raise click.ClickException(str(exc))
+    takes = processes * attempts
+    click.echo(f"{takes} takes from {processes} processes in {elapsed:.2f}s ({takes / elapsed:.0f}/s)")
+    click.echo(f"Admitted {admitted} of {capacity} tokens.")
+    if admitted != capacity:
+        raise click.ClickException("The bucket over- or under-admitted under concurrency.")
+
+
+def register_commands(app: Flask) -> None:
+    app.cli.add_command(render_content_command)
+    app.cli.add_command(check_counters_command)
+    app.cli.add_command(check_snapshots_command)
+    app.cli.add_command(rank_decay_command)
+    app.cli.add_command(live_prune_command)
+    app.cli.add_command(check_query_budgets_command)
+    app.cli.add_command(check_query_plans_command)
+    app.cli.add_command(search_rebuild_command)
+    app.cli.add_command(mail_worker_command)
+    app.cli.add_command(page_cache_clear_command)
+    app.cli.add_command(db_stress_command)
+    app.cli.add_command(export_command)
+    app.cli.add_command(import_users_command)
+    app.cli.add_command(import_debates_command)
+    app.cli.add_command(bench_seed_command)
+    app.cli.add_command(bench_command)
+    app.cli.add_command(assets_build_command)
+    app.cli.add_command(startup_profile_command)
+    app.cli.add_command(replica_sync_command)
+    app.cli.add_command(ratelimit_check_command)
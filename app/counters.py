@@ -0,0 +1,118 @@
+from dataclasses import dataclass
+from typing import Iterable
+
+from sqlalchemy import case, func, select
+
+from app import db
+from app.models import Argument, Opinion, Reasoning, Stance, contested_value
+from app.snapshots import refresh_snapshots
+
+
+@dataclass
+class CounterDrift:
+    table: str
+    row_id: int
+    column: str
+    stored: int
+    actual: int
+
+
+def _stance_total(stance: Stance):
+    return func.coalesce(func.sum(case((Argument.stance == stance, 1), else_=0)), 0)
+
+
+def find_counter_drift() -> list[CounterDrift]:
+    """Compare the stored counters against aggregates over the live tables."""
+    drift: list[CounterDrift] = []
+
+    actual_for = _stance_total(Stance.FOR)
+    actual_against = _stance_total(Stance.AGAINST)
+    opinion_rows = db.session.execute(
+        select(Opinion.id, Opinion.for_count, Opinion.against_count, actual_for, actual_against)
+        .outerjoin(Argument, Argument.opinion_id == Opinion.id)
+        .group_by(Opinion.id)
+        .having((Opinion.for_count != actual_for) | (Opinion.against_count != actual_against))
+    )
+    for row_id, stored_for, stored_against, real_for, real_against in opinion_rows:
+        if stored_for != real_for:
+            drift.append(CounterDrift("opinion", row_id, "for_count", stored_for, real_for))
+        if stored_against != real_against:
+            drift.append(CounterDrift("opinion", row_id, "against_count", stored_against, real_against))
+
+    contested_rows = db.session.execute(
+        select(Opinion.id, Opinion.contested_score, actual_for, actual_against)
+        .outerjoin(Argument, Argument.opinion_id == Opinion.id)
+        .group_by(Opinion.id)
+        .having(Opinion.contested_score != contested_value(actual_for, actual_against))
+    )
+    for row_id, stored, real_for, real_against in contested_rows:
+        actual = 2 * min(real_for, real_against)
+        drift.append(CounterDrift("opinion", row_id, "contested_score", stored, actual))
+
+    actual_reasoning = func.count(Reasoning.id)
+    argument_rows = db.session.execute(
+        select(Argument.id, Argument.reasoning_count, actual_reasoning)
+        .outerjoin(Reasoning, Reasoning.argument_id == Argument.id)
+        .group_by(Argument.id)
+        .having(Argument.reasoning_count != actual_reasoning)
+    )
+    for row_id, stored, actual in argument_rows:
+        drift.append(CounterDrift("argument", row_id, "reasoning_count", stored, actual))
+    return drift
+
+
+def recount_opinions(opinion_ids: Iterable[int] | None = None) -> None:
+    """
+    Recompute for/against counters and the contested score derived from them, for the
+    given opinions or for all of them.
+    """
+
+    def stance_subquery(stance: Stance):
+        return (
+            select(func.count(Argument.id))
+            .where(Argument.opinion_id == Opinion.id, Argument.stance == stance)
+            .scalar_subquery()
+        )
+
+    stmt = db.update(Opinion).values(
+        for_count=stance_subquery(Stance.FOR),
+        against_count=stance_subquery(Stance.AGAINST),
+    )
+    contested = db.update(Opinion).values(
+        contested_score=contested_value(Opinion.for_count, Opinion.against_count)
+    )
+    if opinion_ids is not None:
+        opinion_ids = list(opinion_ids)
+        stmt = stmt.where(Opinion.id.in_(opinion_ids))
+        contested = contested.where(Opinion.id.in_(opinion_ids))
+    db.session.execute(stmt, execution_options={"synchronize_session": False})
+    db.session.execute(contested, execution_options={"synchronize_session": False})
+
+
+def recount_arguments(argument_ids: Iterable[int] | None = None) -> None:
+    """Recompute reasoning counters, for the given arguments or for all of them."""
+    stmt = db.update(Argument).values(
+        reasoning_count=select(func.count(Reasoning.id))
+        .where(Reasoning.argument_id == Argument.id)
+        .scalar_subquery()
+    )
+    if argument_ids is not None:
+        stmt = stmt.where(Argument.id.in_(list(argument_ids)))
+    db.session.execute(stmt, execution_options={"synchronize_session": False})
+
+
+def repair_counter_drift(drift: list[CounterDrift]) -> None:
+    opinion_ids = {item.row_id for item in drift if item.table == "opinion"}
+    argument_ids = {item.row_id for item in drift if item.table == "argument"}
+    if opinion_ids:
+        recount_opinions(opinion_ids)
+    if argument_ids:
+        recount_arguments(argument_ids)
+        opinion_ids.update(
+            db.session.execute(
+                select(Argument.opinion_id).where(Argument.id.in_(argument_ids)).distinct()
+            ).scalars()
+        )
+    # Counters are part of the snapshot documents; rebuild the affected ones.
+    refresh_snapshots(opinion_ids)
+    db.session.commit()
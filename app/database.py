@@ -0,0 +1,114 @@
+"""
+Engine setup beyond what Flask-SQLAlchemy does by default.
+
+For SQLite every new connection gets the configured pragmas (WAL journal, busy timeout,
+synchronous level, foreign keys, mmap and page cache size). The lock mode is chosen when a
+transaction begins: POST, PUT, PATCH and DELETE requests, and code inside `write_scope()`,
+use BEGIN IMMEDIATE, so a writer waits for the lock up front (honouring busy_timeout) and
+its reads and writes form one transaction, instead of failing with "database is locked"
+when it upgrades a read snapshot another writer has moved past. Everything else uses a
+plain deferred BEGIN. The read replica bind (app/replica.py) always begins deferred and
+leaves the journal mode and sync level to the file.
+
+Pools are reset in forked children (gunicorn `--preload`, `flask db-stress`), so a worker
+never reuses a connection the parent opened.
+"""
+import os
+import weakref
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator
+
+from flask import Flask, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app import db
+from app.replica import REPLICA_BIND
+
+_WRITE_METHODS = frozenset({"POST", "PUT", "PATCH", "DELETE"})
+
+_write_scope: ContextVar[bool] = ContextVar("write_scope", default=False)
+
+_JOURNAL_MODES = {"DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"}
+_SYNCHRONOUS_LEVELS = {"OFF", "NORMAL", "FULL", "EXTRA"}
+
+_engines: "weakref.WeakSet[Engine]" = weakref.WeakSet()
+
+
+def _reset_pools_after_fork() -> None:
+    # close=False leaves the parent's sockets and file handles alone; the child simply
+    # forgets them and opens its own connections on first use.
+    for engine in list(_engines):
+        engine.dispose(close=False)
+
+
+os.register_at_fork(after_in_child=_reset_pools_after_fork)
+
+
+@contextmanager
+def write_scope() -> Iterator[None]:
+    """
+    Begin SQLite transactions started inside the block with BEGIN IMMEDIATE, for writers
+    outside a POST request (CLI commands, workers) that read before they write. A
+    transaction the session already has open keeps its mode, so commit before entering.
+    """
+    token = _write_scope.set(True)
+    try:
+        yield
+    finally:
+        _write_scope.reset(token)
+
+
+def _wants_write_lock() -> bool:
+    if _write_scope.get():
+        return True
+    return has_request_context() and request.method in _WRITE_METHODS
+
+
+def sqlite_pragmas(config, read_only: bool = False) -> list[str]:
+    journal_mode = config["SQLITE_JOURNAL_MODE"].upper()
+    synchronous = config["SQLITE_SYNCHRONOUS"].upper()
+    if journal_mode not in _JOURNAL_MODES:
+        raise ValueError(f"Unsupported SQLITE_JOURNAL_MODE {journal_mode!r}")
+    if synchronous not in _SYNCHRONOUS_LEVELS:
+        raise ValueError(f"Unsupported SQLITE_SYNCHRONOUS {synchronous!r}")
+    pragmas = [
+        f"PRAGMA busy_timeout={int(config['SQLITE_BUSY_TIMEOUT_MS'])}",
+        f"PRAGMA foreign_keys={'ON' if config['SQLITE_FOREIGN_KEYS'] else 'OFF'}",
+        f"PRAGMA mmap_size={int(config['SQLITE_MMAP_SIZE'])}",
+        f"PRAGMA cache_size=-{int(config['SQLITE_CACHE_SIZE_KB'])}",
+    ]
+    if read_only:
+        # Changing the journal mode writes the file header, which a read-only replica refuses.
+        return pragmas
+    return [f"PRAGMA journal_mode={journal_mode}", f"PRAGMA synchronous={synchronous}", *pragmas]
+
+
+def configure_sqlite_engine(engine: Engine, config, read_only: bool = False) -> None:
+    pragmas = sqlite_pragmas(config, read_only)
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        # Hand transaction control to SQLAlchemy so the "begin" hook below decides the mode.
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+    @event.listens_for(engine, "begin")
+    def _on_begin(connection):
+        if not read_only and _wants_write_lock():
+            connection.exec_driver_sql("BEGIN IMMEDIATE")
+        else:
+            connection.exec_driver_sql("BEGIN")
+
+
+def configure_engines(app: Flask) -> None:
+    """Attach engine hooks. Engines are created here but no connection is opened."""
+    with app.app_context():
+        for bind_key, engine in db.engines.items():
+            _engines.add(engine)
+            if engine.dialect.name == "sqlite":
+                configure_sqlite_engine(engine, app.config, read_only=bind_key == REPLICA_BIND)
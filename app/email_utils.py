@@ -1,7 +1,41 @@
+import json
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING
+
 from flask import render_template, current_app, url_for
-from flask_mail import Message
 
-from app import mail
+from app import db
+from app.database import write_scope
+from app.metrics import metrics, record_email
+from app.models import OutboundEmail, OutboxStatus
+
+if TYPE_CHECKING:
+    from flask_mail import Message
+
+logger = logging.getLogger(__name__)
+
+
+def _mail():
+    """
+    Flask-Mail state for the current app. The extension is only needed to build and send
+    messages, so it is imported and set up on first use rather than in `create_app`.
+    """
+    state = current_app.extensions.get("mail")
+    if state is None:
+        from flask_mail import Mail
+
+        state = Mail().init_app(current_app._get_current_object())
+    return state
+
+
+def _message(**kwargs) -> "Message":
+    _mail()  # Message takes its default sender from the registered extension.
+    from flask_mail import Message
+
+    return Message(**kwargs)
 
 
 def build_confirm_url(token: str) -> str:
@@ -11,13 +45,148 @@ def build_confirm_url(token: str) -> str:
     return url_for("auth.confirm_email", token=token, _external=True)
 
 
+def enqueue_email(msg: "Message") -> OutboundEmail:
+    """
+    Queue a message in the outbox. The row is added to the current session, so it is
+    committed together with whatever the caller is saving; `flask mail-worker` sends it.
+    """
+    queued = OutboundEmail(
+        subject=msg.subject,
+        sender=msg.sender if isinstance(msg.sender, str) else None,
+        recipients=json.dumps(list(msg.recipients)),
+        body=msg.body,
+        html=msg.html,
+    )
+    db.session.add(queued)
+    return queued
+
+
 def send_email_confirmation(to_email: str, username: str, token: str) -> None:
+    started = time.perf_counter()
     confirm_url = build_confirm_url(token)
 
-    msg = Message(
+    msg = _message(
         subject=f"{current_app.config.get('APP_NAME', 'Debate Hub')} - Confirm your email",
         recipients=[to_email],
     )
     msg.body = render_template("email/confirm.txt", username=username, confirm_url=confirm_url)
     msg.html = render_template("email/confirm.html", username=username, confirm_url=confirm_url)
-    mail.send(msg)
+    enqueue_email(msg)
+    record_email("enqueue", time.perf_counter() - started)
+
+
+@dataclass
+class OutboxRun:
+    sent: int = 0
+    retried: int = 0
+    dead: int = 0
+
+    @property
+    def claimed(self) -> int:
+        return self.sent + self.retried + self.dead
+
+
+def _to_message(queued: OutboundEmail) -> "Message":
+    return _message(
+        subject=queued.subject,
+        recipients=json.loads(queued.recipients),
+        body=queued.body,
+        html=queued.html,
+        sender=queued.sender or current_app.config.get("MAIL_DEFAULT_SENDER"),
+    )
+
+
+def _claim_batch(batch_size: int, lease: timedelta) -> list[OutboundEmail]:
+    """
+    Lease due messages by pushing `next_attempt_at` forward. A conditional UPDATE per row
+    keeps two workers from sending the same message; a crashed worker's lease just expires.
+    """
+    now = datetime.utcnow()
+    # Only the claim runs under the write lock; the messages are loaded and sent after it.
+    with write_scope():
+        candidates = (
+            db.session.query(OutboundEmail.id, OutboundEmail.next_attempt_at)
+            .filter(
+                OutboundEmail.status == OutboxStatus.PENDING,
+                OutboundEmail.next_attempt_at <= now,
+            )
+            .order_by(OutboundEmail.next_attempt_at, OutboundEmail.id)
+            .limit(batch_size)
+            .all()
+        )
+        claimed_ids = []
+        for message_id, due_at in candidates:
+            result = db.session.execute(
+                db.update(OutboundEmail)
+                .where(OutboundEmail.id == message_id, OutboundEmail.next_attempt_at == due_at)
+                .values(next_attempt_at=now + lease)
+            )
+            if result.rowcount:
+                claimed_ids.append(message_id)
+        db.session.commit()
+    if not claimed_ids:
+        return []
+    return OutboundEmail.query.filter(OutboundEmail.id.in_(claimed_ids)).order_by(OutboundEmail.id).all()
+
+
+def _record_failure(queued: OutboundEmail, error: Exception, run: OutboxRun) -> None:
+    config = current_app.config
+    queued.attempts += 1
+    queued.last_error = f"{type(error).__name__}: {error}"
+    if queued.attempts >= config["MAIL_OUTBOX_MAX_ATTEMPTS"]:
+        queued.status = OutboxStatus.DEAD
+        run.dead += 1
+        logger.error("Dead-lettered email %s after %s attempts: %s", queued.id, queued.attempts, error)
+        return
+    delay = min(
+        config["MAIL_OUTBOX_BACKOFF_SECONDS"] * 2 ** (queued.attempts - 1),
+        config["MAIL_OUTBOX_MAX_BACKOFF_SECONDS"],
+    )
+    queued.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+    run.retried += 1
+
+
+def process_outbox(batch_size: int | None = None) -> OutboxRun:
+    """Send one batch of due messages over a single SMTP connection."""
+    config = current_app.config
+    batch_size = batch_size or config["MAIL_OUTBOX_BATCH_SIZE"]
+    lease = timedelta(seconds=config["MAIL_OUTBOX_LEASE_SECONDS"])
+    run = OutboxRun()
+
+    batch = _claim_batch(batch_size, lease)
+    if not batch:
+        return run
+
+    handled: set[int] = set()
+    try:
+        with _mail().connect() as connection:
+            for queued in batch:
+                started = time.perf_counter()
+                try:
+                    connection.send(_to_message(queued))
+                    record_email("smtp", time.perf_counter() - started)
+                except Exception as exc:  # noqa: BLE001 - any SMTP failure is retried
+                    _record_failure(queued, exc, run)
+                else:
+                    queued.status = OutboxStatus.SENT
+                    queued.sent_at = datetime.utcnow()
+                    queued.last_error = None
+                    run.sent += 1
+                handled.add(queued.id)
+    except Exception as exc:  # noqa: BLE001 - connecting to the SMTP server failed
+        for queued in batch:
+            if queued.id not in handled:
+                _record_failure(queued, exc, run)
+    db.session.commit()
+    metrics.maybe_flush()
+    return run
+
+
+def requeue_dead_letters() -> int:
+    result = db.session.execute(
+        db.update(OutboundEmail)
+        .where(OutboundEmail.status == OutboxStatus.DEAD)
+        .values(status=OutboxStatus.PENDING, attempts=0, next_attempt_at=datetime.utcnow())
+    )
+    db.session.commit()
+    return result.rowcount
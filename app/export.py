@@ -0,0 +1,174 @@
+"""
+Streamed NDJSON export of whole debates for the analytics mirror.
+
+Opinions are walked in `(updated_at, id)` order. Because `updated_at` is bumped whenever an
+argument or reasoning is added (see `app/models.py`), exporting from a watermark re-sends
+every debate that changed since, complete with its arguments and reasoning.
+
+Work proceeds in batches of opinions: the batch's opinion rows, then its arguments, then its
+reasoning, each read with `yield_per` so only one batch of ids is held in memory. A
+`watermark` record closes every batch; pass its `since` value back to resume after it.
+Rows newer than `EXPORT_SETTLE_SECONDS` are left for the next run so transactions still in
+flight when the export starts cannot be skipped.
+"""
+import json
+from datetime import datetime, timedelta
+from typing import Iterator
+
+from flask import current_app
+
+from app import db
+from app.models import Argument, Opinion, Reasoning, User
+from app.pagination import decode_cursor, encode_cursor
+from app.utils import render_markdown
+
+
+def _isoformat(value: datetime | None) -> str | None:
+    return value.isoformat() if value is not None else None
+
+
+def _content(row) -> dict:
+    html = row.content_html if row.content_html is not None else render_markdown(row.content)
+    return {"content": row.content, "content_html": html}
+
+
+def _opinion_record(row) -> dict:
+    return {
+        "type": "opinion",
+        "id": row.id,
+        "title": row.title,
+        **_content(row),
+        "author": row.author,
+        "for_count": row.for_count,
+        "against_count": row.against_count,
+        "version": row.version,
+        "created_at": _isoformat(row.created_at),
+        "updated_at": _isoformat(row.updated_at),
+    }
+
+
+def _argument_record(row) -> dict:
+    return {
+        "type": "argument",
+        "id": row.id,
+        "opinion_id": row.opinion_id,
+        "stance": row.stance.value,
+        **_content(row),
+        "author": row.author,
+        "reasoning_count": row.reasoning_count,
+        "created_at": _isoformat(row.created_at),
+    }
+
+
+def _reasoning_record(row) -> dict:
+    return {
+        "type": "reasoning",
+        "id": row.id,
+        "argument_id": row.argument_id,
+        "opinion_id": row.opinion_id,
+        **_content(row),
+        "author": row.author,
+        "created_at": _isoformat(row.created_at),
+    }
+
+
+def _opinion_batches(watermark: tuple[datetime, int] | None, until: datetime, batch_size: int):
+    statement = (
+        db.select(
+            Opinion.id,
+            Opinion.title,
+            Opinion.content,
+            Opinion.content_html,
+            Opinion.for_count,
+            Opinion.against_count,
+            Opinion.version,
+            Opinion.created_at,
+            Opinion.updated_at,
+            User.username.label("author"),
+        )
+        .join(User, User.id == Opinion.user_id)
+        .where(Opinion.updated_at <= until)
+        .order_by(Opinion.updated_at, Opinion.id)
+    )
+    if watermark:
+        updated_at, opinion_id = watermark
+        statement = statement.where(
+            db.or_(
+                Opinion.updated_at > updated_at,
+                db.and_(Opinion.updated_at == updated_at, Opinion.id > opinion_id),
+            )
+        )
+    result = db.session.execute(statement.execution_options(yield_per=batch_size))
+    yield from result.partitions()
+
+
+def _arguments(opinion_ids: list[int], batch_size: int):
+    statement = (
+        db.select(
+            Argument.id,
+            Argument.opinion_id,
+            Argument.stance,
+            Argument.content,
+            Argument.content_html,
+            Argument.reasoning_count,
+            Argument.created_at,
+            User.username.label("author"),
+        )
+        .join(User, User.id == Argument.user_id)
+        .where(Argument.opinion_id.in_(opinion_ids))
+        .order_by(Argument.opinion_id, Argument.id)
+    )
+    return db.session.execute(statement.execution_options(yield_per=batch_size))
+
+
+def _reasoning(opinion_ids: list[int], batch_size: int):
+    statement = (
+        db.select(
+            Reasoning.id,
+            Reasoning.argument_id,
+            Argument.opinion_id,
+            Reasoning.content,
+            Reasoning.content_html,
+            Reasoning.created_at,
+            User.username.label("author"),
+        )
+        .join(Argument, Argument.id == Reasoning.argument_id)
+        .join(User, User.id == Reasoning.user_id)
+        .where(Argument.opinion_id.in_(opinion_ids))
+        .order_by(Argument.opinion_id, Reasoning.argument_id, Reasoning.id)
+    )
+    return db.session.execute(statement.execution_options(yield_per=batch_size))
+
+
+def _records(watermark, until: datetime, batch_size: int) -> Iterator[dict]:
+    for opinions in _opinion_batches(watermark, until, batch_size):
+        opinion_ids = [row.id for row in opinions]
+        last = opinions[-1]
+        for row in opinions:
+            yield _opinion_record(row)
+        for row in _arguments(opinion_ids, batch_size):
+            yield _argument_record(row)
+        for row in _reasoning(opinion_ids, batch_size):
+            yield _reasoning_record(row)
+        yield {
+            "type": "watermark",
+            "since": encode_cursor(last.updated_at, last.id),
+            "updated_at": _isoformat(last.updated_at),
+            "opinion_id": last.id,
+        }
+
+
+def export_records(since: str | None = None, batch_size: int | None = None) -> Iterator[dict]:
+    """
+    Return an iterator of export records; `since` is a watermark from a previous export.
+    The watermark is validated here, before anything is streamed (malformed ones abort 400).
+    """
+    config = current_app.config
+    watermark = decode_cursor(since) if since else None
+    until = datetime.utcnow() - timedelta(seconds=config["EXPORT_SETTLE_SECONDS"])
+    return _records(watermark, until, batch_size or config["EXPORT_BATCH_SIZE"])
+
+
+def to_ndjson(records: Iterator[dict]) -> Iterator[str]:
+    for record in records:
+        yield json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
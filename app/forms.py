@@ -39,6 +39,11 @@ class LoginForm(FlaskForm):
     submit = SubmitField("Log In")
 
 
+class ResendConfirmationForm(FlaskForm):
+    email = StringField("Email", validators=[DataRequired(), Email(), Length(max=255)])
+    submit = SubmitField("Send Confirmation Link")
+
+
 class OpinionForm(FlaskForm):
     title = StringField("Title", validators=[DataRequired(), Length(max=160)])
     content = TextAreaField(
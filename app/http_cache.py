@@ -0,0 +1,88 @@
+"""
+Conditional GET support for the public read pages.
+
+Only anonymous requests without pending flash messages are treated as shared-cacheable:
+they get a weak ETag, Last-Modified and a public Cache-Control, and a matching
+If-None-Match/If-Modified-Since is answered with 304 before the view runs. Everything else
+is marked private so neither browsers' shared caches nor nginx store user-specific pages.
+"""
+import hashlib
+from datetime import datetime
+from functools import wraps
+
+from flask import current_app, g, make_response, request, session
+from flask_login import current_user
+from werkzeug.http import is_resource_modified
+
+from app.assets import assets
+from app.utils import RENDERER_VERSION
+
+
+def shared_cacheable() -> bool:
+    return (
+        request.method in ("GET", "HEAD")
+        and not current_user.is_authenticated
+        and not session.get("_flashes")
+    )
+
+
+def _etag(token: str) -> str:
+    # The full path carries APP_URL_PREFIX and paging cursors, which both change the body;
+    # a new asset build changes the fingerprinted URLs in it.
+    raw = f"{token}|{RENDERER_VERSION}|{assets.version}|{request.full_path}"
+    return hashlib.blake2b(raw.encode(), digest_size=12).hexdigest()
+
+
+def _public_cache_control(response) -> None:
+    max_age = current_app.config["HTTP_CACHE_MAX_AGE"]
+    response.cache_control.public = True
+    if max_age > 0:
+        response.cache_control.max_age = max_age
+    else:
+        response.cache_control.no_cache = True
+    response.vary.add("Cookie")
+
+
+def _private_cache_control(response) -> None:
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    response.vary.add("Cookie")
+
+
+def conditional_get(freshness):
+    """
+    Decorate a read view with validators from `freshness(**view_args)`, which returns a
+    `(token, last_modified)` pair describing everything the page shows (or aborts 404).
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not shared_cacheable():
+                response = make_response(view(*args, **kwargs))
+                _private_cache_control(response)
+                return response
+
+            token, last_modified = freshness(*args, **kwargs)
+            # Lets the fragment cache key shared-cacheable renders by the same token.
+            g.freshness_token = token
+            etag = _etag(token)
+            if isinstance(last_modified, datetime):
+                last_modified = last_modified.replace(microsecond=0)
+            if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+
+            if response.status_code not in (200, 304) or "Set-Cookie" in response.headers:
+                _private_cache_control(response)
+                return response
+            response.set_etag(etag, weak=True)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            _public_cache_control(response)
+            return response
+
+        return wrapper
+
+    return decorator
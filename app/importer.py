@@ -0,0 +1,398 @@
+"""
+Bulk import for `flask import-users` and `flask import-debates`.
+
+Input is CSV (with a header row) or JSONL, read as a stream and inserted in batches with
+Core executemany inserts; each batch commits on its own. Debate records use the same shape
+as the NDJSON export (`type`, `id`, `opinion_id`/`argument_id`, `author`, ...), so one
+instance's export can be loaded into another. Parents must appear before their children.
+
+Rows are matched on natural keys: users by email and username (existing ones are
+skipped), authors by username or email. Source ids of imported debate rows are recorded
+in `import_ref`, so rerunning an interrupted import skips what already went in and still
+resolves parents from earlier runs. Derived data is filled in per batch in bulk: HTML via
+one batched render, counters via `recount_*`, and hot scores and opinion snapshots via
+`recompute_hot_scores` and `refresh_snapshots`; the caller rebuilds the search index once.
+"""
+import csv
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from itertools import islice
+from typing import IO, Callable, Iterable, Iterator
+
+from werkzeug.security import generate_password_hash
+
+from app import db
+from app.counters import recount_arguments, recount_opinions
+from app.database import write_scope
+from app.models import Argument, ImportRef, Opinion, Reasoning, Stance, User, touch_values
+from app.ranking import recompute_hot_scores
+from app.snapshots import refresh_snapshots
+from app.utils import RENDERER_VERSION, markdown_renderer
+
+TRUE_VALUES = frozenset({"1", "true", "t", "yes", "y"})
+MAX_REPORTED_ERRORS = 20
+
+
+@dataclass
+class ImportStats:
+    read: int = 0
+    inserted: dict[str, int] = field(default_factory=dict)
+    skipped: int = 0
+    failed: int = 0
+    # Inserted rows holding the plain-text fallback because rendering timed out under load.
+    stale: int = 0
+    errors: list[str] = field(default_factory=list)
+    started: float = field(default_factory=time.perf_counter)
+
+    def count(self, kind: str, inserted: int) -> None:
+        self.inserted[kind] = self.inserted.get(kind, 0) + inserted
+
+    def error(self, line: int, message: str) -> None:
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(f"line {line}: {message}")
+
+    @property
+    def rate(self) -> float:
+        elapsed = time.perf_counter() - self.started
+        return self.read / elapsed if elapsed else 0.0
+
+    def summary(self) -> str:
+        inserted = ", ".join(f"{kind}={total}" for kind, total in self.inserted.items()) or "none"
+        stale = f" stale={self.stale}" if self.stale else ""
+        return (
+            f"read={self.read} inserted: {inserted}; skipped={self.skipped} "
+            f"failed={self.failed}{stale} ({self.rate:.0f} rows/s)"
+        )
+
+
+def read_records(stream: IO[str], fmt: str) -> Iterator[tuple[int, dict]]:
+    """Yield `(line_number, record)` pairs; blank CSV cells become None."""
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, {key: (value or None) for key, value in record.items()}
+        return
+    for line_number, line in enumerate(stream, start=1):
+        if line.strip():
+            yield line_number, json.loads(line)
+
+
+def _batched(records: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(records)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def _flag(value) -> bool:
+    if isinstance(value, bool):
+        return value
+    return str(value or "").strip().lower() in TRUE_VALUES
+
+
+def _timestamp(value) -> datetime:
+    if not value:
+        return datetime.utcnow()
+    return datetime.fromisoformat(str(value).replace("Z", "+00:00")).replace(tzinfo=None)
+
+
+def _user_row(record: dict) -> dict:
+    email = (record.get("email") or "").strip().lower()
+    username = (record.get("username") or "").strip()
+    if not email or not username:
+        raise ValueError("email and username are required")
+    if not record.get("password_hash") and not record.get("password"):
+        raise ValueError("password or password_hash is required")
+    return {
+        "email": email,
+        "username": username,
+        "password_hash": record.get("password_hash"),
+        "password": record.get("password"),
+        "confirmed": _flag(record.get("confirmed", True)),
+        "is_admin": _flag(record.get("is_admin")),
+        "is_blocked": _flag(record.get("is_blocked")),
+        "created_at": _timestamp(record.get("created_at")),
+    }
+
+
+def _import_user_batch(batch, pool: ProcessPoolExecutor, workers: int, dry_run: bool, stats: ImportStats) -> None:
+    rows = []
+    for line, record in batch:
+        try:
+            rows.append(_user_row(record))
+        except ValueError as exc:
+            stats.error(line, str(exc))
+
+    emails = {row["email"] for row in rows}
+    usernames = {row["username"] for row in rows}
+    existing = db.session.execute(
+        db.select(User.email, User.username).where(
+            db.or_(User.email.in_(emails), User.username.in_(usernames))
+        )
+    ).all()
+    taken_emails = {email for email, _ in existing}
+    taken_usernames = {username for _, username in existing}
+
+    fresh = []
+    for row in rows:
+        if row["email"] in taken_emails or row["username"] in taken_usernames:
+            stats.skipped += 1
+            continue
+        taken_emails.add(row["email"])
+        taken_usernames.add(row["username"])
+        fresh.append(row)
+
+    needs_hash = [row for row in fresh if not row["password_hash"]]
+    if needs_hash and not dry_run:
+        chunksize = max(1, len(needs_hash) // (workers * 4))
+        hashes = pool.map(generate_password_hash, [row["password"] for row in needs_hash], chunksize=chunksize)
+        for row, password_hash in zip(needs_hash, hashes):
+            row["password_hash"] = password_hash
+    for row in fresh:
+        del row["password"]
+
+    if fresh and not dry_run:
+        db.session.execute(db.insert(User.__table__), fresh)
+        db.session.commit()
+    stats.count("user", len(fresh))
+
+
+def import_users(
+    records: Iterable[tuple[int, dict]],
+    batch_size: int,
+    workers: int,
+    dry_run: bool = False,
+    on_batch: Callable[[ImportStats], None] | None = None,
+) -> ImportStats:
+    """Insert users batch by batch; password hashing is spread over `workers` processes."""
+    stats = ImportStats()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for batch in _batched(records, batch_size):
+            stats.read += len(batch)
+            _import_user_batch(batch, pool, workers, dry_run, stats)
+            if on_batch:
+                on_batch(stats)
+    return stats
+
+
+class DebateImporter:
+    """Holds the run's source-id → row-id and author → user-id maps across batches."""
+
+    PARENT_KIND = {"argument": "opinion", "reasoning": "argument"}
+
+    def __init__(self, source: str, dry_run: bool = False):
+        self.source = source
+        self.dry_run = dry_run
+        self.ids: dict[tuple[str, str], int] = {}
+        self.authors: dict[str, int] = {}
+        self.stats = ImportStats()
+        self._fake_id = 0
+
+    def _known_ids(self, kind: str, source_ids: set[str]) -> None:
+        """Pull mappings recorded by earlier runs into `self.ids`."""
+        missing = [source_id for source_id in source_ids if (kind, source_id) not in self.ids]
+        if not missing:
+            return
+        rows = db.session.execute(
+            db.select(ImportRef.source_id, ImportRef.target_id).where(
+                ImportRef.source == self.source,
+                ImportRef.kind == kind,
+                ImportRef.source_id.in_(missing),
+            )
+        )
+        for source_id, target_id in rows:
+            self.ids[(kind, source_id)] = target_id
+
+    def _resolve_authors(self, names: set[str]) -> None:
+        missing = [name for name in names if name not in self.authors]
+        if not missing:
+            return
+        rows = db.session.execute(
+            db.select(User.id, User.username, User.email).where(
+                db.or_(User.username.in_(missing), User.email.in_([name.lower() for name in missing]))
+            )
+        )
+        for user_id, username, email in rows:
+            self.authors[username] = user_id
+            self.authors[email] = user_id
+
+    def _parse(self, line: int, record: dict) -> dict | None:
+        kind = record.get("type")
+        if kind not in ("opinion", "argument", "reasoning"):
+            self.stats.error(line, f"unknown record type {kind!r}")
+            return None
+        if record.get("id") in (None, "") or not record.get("content"):
+            self.stats.error(line, "id and content are required")
+            return None
+        author = str(record.get("author") or record.get("author_email") or "").strip()
+        parsed = {
+            "line": line,
+            "kind": kind,
+            "source_id": str(record["id"]),
+            "author": author.lower() if "@" in author else author,
+            "content": record["content"],
+        }
+        try:
+            parsed["created_at"] = _timestamp(record.get("created_at"))
+            if kind == "opinion":
+                if not record.get("title"):
+                    raise ValueError("opinion title is required")
+                parsed["title"] = record["title"]
+            else:
+                parent_key = f"{self.PARENT_KIND[kind]}_id"
+                if record.get(parent_key) in (None, ""):
+                    raise ValueError(f"{parent_key} is required")
+                parsed["parent"] = str(record[parent_key])
+            if kind == "argument":
+                parsed["stance"] = Stance(str(record.get("stance", "")).lower())
+        except ValueError as exc:
+            self.stats.error(line, str(exc))
+            return None
+        return parsed
+
+    def _insert(self, table, rows: list[dict]) -> list[int]:
+        if self.dry_run:
+            # Stand-in ids keep parent resolution working without touching the database.
+            self._fake_id -= len(rows)
+            return list(range(self._fake_id, self._fake_id + len(rows)))
+        result = db.session.execute(
+            db.insert(table).returning(table.c.id, sort_by_parameter_order=True), rows
+        )
+        return list(result.scalars())
+
+    def _insert_kind(self, kind: str, items: list[dict], table, to_row) -> list[int]:
+        """Insert the batch's ready records of one kind and record their source ids."""
+        if not items:
+            return []
+        results = markdown_renderer.render_results(item["content"] for item in items)
+        rows = []
+        for item, result in zip(items, results):
+            row = to_row(item)
+            row.update(
+                content=item["content"],
+                content_html=result.html,
+                render_version=RENDERER_VERSION if result.final else None,
+                user_id=self.authors[item["author"]],
+                created_at=item["created_at"],
+            )
+            rows.append(row)
+        self.stats.stale += sum(not result.final for result in results)
+        new_ids = self._insert(table, rows)
+        for item, new_id in zip(items, new_ids):
+            self.ids[(kind, item["source_id"])] = new_id
+        if not self.dry_run:
+            db.session.execute(
+                db.insert(ImportRef.__table__),
+                [
+                    {"source": self.source, "kind": kind, "source_id": item["source_id"], "target_id": new_id}
+                    for item, new_id in zip(items, new_ids)
+                ],
+            )
+        self.stats.count(kind, len(items))
+        return new_ids
+
+    def import_batch(self, batch: list[tuple[int, dict]]) -> None:
+        self.stats.read += len(batch)
+        parsed = [
+            item
+            for item in (
+                self._parse(line, record)
+                for line, record in batch
+                if record.get("type") != "watermark"  # export checkpoints carry no data
+            )
+            if item
+        ]
+
+        by_kind: dict[str, list[dict]] = {"opinion": [], "argument": [], "reasoning": []}
+        for item in parsed:
+            by_kind[item["kind"]].append(item)
+        for kind, items in by_kind.items():
+            self._known_ids(kind, {item["source_id"] for item in items})
+            parent_kind = self.PARENT_KIND.get(kind)
+            if parent_kind:
+                self._known_ids(parent_kind, {item["parent"] for item in items})
+        self._resolve_authors({item["author"] for item in parsed})
+
+        # Records are inserted kind by kind, so a parent earlier in the same batch resolves.
+        touched_opinions: set[int] = set()
+        touched_arguments: set[int] = set()
+        for kind, table in (
+            ("opinion", Opinion.__table__),
+            ("argument", Argument.__table__),
+            ("reasoning", Reasoning.__table__),
+        ):
+            ready = []
+            seen: set[str] = set()
+            for item in by_kind[kind]:
+                if (kind, item["source_id"]) in self.ids or item["source_id"] in seen:
+                    self.stats.skipped += 1
+                    continue
+                if item["author"] not in self.authors:
+                    self.stats.error(item["line"], f"unknown author {item['author']!r}")
+                    continue
+                parent_kind = self.PARENT_KIND.get(kind)
+                if parent_kind:
+                    parent_id = self.ids.get((parent_kind, item["parent"]))
+                    if parent_id is None:
+                        self.stats.error(item["line"], f"unknown {parent_kind} {item['parent']!r}")
+                        continue
+                    item["parent_id"] = parent_id
+                seen.add(item["source_id"])
+                ready.append(item)
+
+            if kind == "opinion":
+                touched_opinions.update(
+                    self._insert_kind(kind, ready, table, lambda item: {"title": item["title"]})
+                )
+            elif kind == "argument":
+                self._insert_kind(
+                    kind,
+                    ready,
+                    table,
+                    lambda item: {"opinion_id": item["parent_id"], "stance": item["stance"]},
+                )
+                touched_opinions.update(item["parent_id"] for item in ready)
+            else:
+                self._insert_kind(kind, ready, table, lambda item: {"argument_id": item["parent_id"]})
+                touched_arguments.update(item["parent_id"] for item in ready)
+
+        if self.dry_run:
+            return
+        # Core inserts bypass the mapper events, so counters and versions are set in bulk.
+        if touched_arguments:
+            recount_arguments(touched_arguments)
+            touched_opinions.update(
+                db.session.execute(
+                    db.select(Argument.opinion_id).where(Argument.id.in_(touched_arguments)).distinct()
+                ).scalars()
+            )
+        if touched_opinions:
+            recount_opinions(touched_opinions)
+            db.session.execute(
+                Opinion.__table__.update()
+                .where(Opinion.__table__.c.id.in_(touched_opinions))
+                .values(touch_values())
+            )
+            recompute_hot_scores(touched_opinions)
+            refresh_snapshots(touched_opinions)
+        db.session.commit()
+
+
+def import_debates(
+    records: Iterable[tuple[int, dict]],
+    batch_size: int,
+    source: str,
+    dry_run: bool = False,
+    on_batch: Callable[[ImportStats], None] | None = None,
+) -> ImportStats:
+    importer = DebateImporter(source, dry_run)
+    for batch in _batched(records, batch_size):
+        # The batch's lookups of known ids and its inserts must see the same database.
+        with write_scope():
+            importer.import_batch(batch)
+        if on_batch:
+            on_batch(importer.stats)
+    return importer.stats
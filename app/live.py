@@ -0,0 +1,254 @@
+"""
+Live updates for opinion and argument pages over Server-Sent Events.
+
+Posting an argument or a reasoning adds a `LiveEvent` row in the same transaction, carrying
+the HTML fragment the page would render for it, on the channel "opinion:<id>" or
+"argument:<id>". Each worker runs one `LiveBroadcaster` thread that polls the table every
+`LIVE_POLL_SECONDS` for ids it has not seen and hands the rows to that worker's subscribers,
+so a post in any worker reaches readers connected to every worker without a network
+service. (SQLite serializes writers, so ids become visible in order.)
+
+A stream first replays what the reader missed, after the id in `Last-Event-ID` on reconnect
+or, on the first connect, since shortly before the page was rendered (`?since=`), then
+forwards live events, with a comment line every `LIVE_HEARTBEAT_SECONDS` so proxies keep
+the connection open. Streams end after `LIVE_STREAM_SECONDS` and the browser reconnects
+with the last id. Each worker serves at most `LIVE_MAX_SUBSCRIBERS` streams and answers 503
+beyond that; every open stream holds a server thread, so gunicorn runs `gthread` workers
+with more threads than subscribers (see gunicorn.conf.py). Streams hold no database
+connection while waiting. `flask live-prune` deletes old events.
+"""
+import json
+import os
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Iterator
+
+from flask import Flask, Response, abort, render_template, request, url_for
+from werkzeug.exceptions import ServiceUnavailable
+
+from app import db
+from app.models import Argument, LiveEvent, Reasoning
+
+# Most events replayed on connect; a reader further behind reloads the page.
+REPLAY_LIMIT = 100
+# Pages replay from a little before they were rendered: an event stamped just before the
+# render may have committed just after it. The browser drops cards it already shows.
+SINCE_MARGIN = timedelta(seconds=5)
+
+
+def opinion_channel(opinion_id: int) -> str:
+    return f"opinion:{opinion_id}"
+
+
+def argument_channel(argument_id: int) -> str:
+    return f"argument:{argument_id}"
+
+
+def publish_argument(argument: Argument) -> None:
+    """Queue the new argument for live readers of its opinion; commits with the caller."""
+    side = argument.stance.value
+    html = render_template("opinions/_argument.html", arg=argument, side=side)
+    db.session.add(LiveEvent(
+        channel=opinion_channel(argument.opinion_id),
+        kind="argument",
+        data=json.dumps({"id": argument.id, "side": side, "html": html}),
+    ))
+
+
+def publish_reasoning(entry: Reasoning) -> None:
+    """Queue the new reasoning for live readers of its argument; commits with the caller."""
+    html = render_template("arguments/_reasoning.html", item=entry)
+    db.session.add(LiveEvent(
+        channel=argument_channel(entry.argument_id),
+        kind="reasoning",
+        data=json.dumps({"id": entry.id, "html": html}),
+    ))
+
+
+def format_event(event_id: int, kind: str, data: str) -> str:
+    return f"id: {event_id}\nevent: {kind}\ndata: {data}\n\n"
+
+
+def live_url(endpoint: str, **values) -> str | None:
+    """The page's stream URL, replaying events from shortly before now, or None when off."""
+    if not broadcaster.enabled:
+        return None
+    since = datetime.utcnow() - SINCE_MARGIN
+    return url_for(endpoint, since=since.isoformat(timespec="seconds"), **values)
+
+
+def replay(channel: str, after_id: int | None, since: datetime | None) -> list[tuple[int, str, str]]:
+    """The channel's events after the given id (or time), oldest first."""
+    query = db.select(LiveEvent.id, LiveEvent.kind, LiveEvent.data).where(LiveEvent.channel == channel)
+    if after_id is not None:
+        query = query.where(LiveEvent.id > after_id)
+    elif since is not None:
+        query = query.where(LiveEvent.created_at > since)
+    else:
+        return []
+    rows = db.session.execute(query.order_by(LiveEvent.id.desc()).limit(REPLAY_LIMIT)).all()
+    return [tuple(row) for row in reversed(rows)]
+
+
+def prune_events(older_than: timedelta) -> int:
+    result = db.session.execute(
+        db.delete(LiveEvent).where(LiveEvent.created_at < datetime.utcnow() - older_than)
+    )
+    db.session.commit()
+    return result.rowcount
+
+
+@dataclass(eq=False)
+class Subscription:
+    channel: str
+    events: "queue.Queue[tuple[int, str, str]]" = field(default_factory=lambda: queue.Queue(maxsize=256))
+    # Set when the reader fell too far behind; the stream ends and the browser resumes by id.
+    overflowed: bool = False
+
+
+class LiveBroadcaster:
+    def __init__(self):
+        self.enabled = False
+        self.poll_seconds = 1.0
+        self.heartbeat_seconds = 15.0
+        self.stream_seconds = 300.0
+        self.max_subscribers = 32
+        self._app: Flask | None = None
+        self._subscribers: dict[str, set[Subscription]] = {}
+        self._count = 0
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._pid = os.getpid()
+
+    def init_app(self, app: Flask) -> None:
+        self.enabled = app.config["LIVE_ENABLED"]
+        self.poll_seconds = app.config["LIVE_POLL_SECONDS"]
+        self.heartbeat_seconds = app.config["LIVE_HEARTBEAT_SECONDS"]
+        self.stream_seconds = app.config["LIVE_STREAM_SECONDS"]
+        self.max_subscribers = app.config["LIVE_MAX_SUBSCRIBERS"]
+        self._app = app
+
+    def subscribe(self, channel: str) -> Subscription | None:
+        """Register a stream, or None when this worker already serves its maximum."""
+        with self._lock:
+            if os.getpid() != self._pid:
+                # Forked: the parent's thread and subscribers did not come along.
+                self._pid = os.getpid()
+                self._subscribers, self._count, self._thread = {}, 0, None
+            if self._count >= self.max_subscribers:
+                return None
+            subscription = Subscription(channel)
+            self._subscribers.setdefault(channel, set()).add(subscription)
+            self._count += 1
+            if self._thread is None or not self._thread.is_alive():
+                # Start after the newest event now; the caller's replay covers everything up to
+                # its own query, so nothing committed in between is missed.
+                start_id = db.session.execute(db.select(db.func.max(LiveEvent.id))).scalar() or 0
+                self._thread = threading.Thread(
+                    target=self._run, args=(start_id,), name="live-broadcaster", daemon=True
+                )
+                self._thread.start()
+            return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.channel)
+            if subscribers and subscription in subscribers:
+                subscribers.discard(subscription)
+                self._count -= 1
+                if not subscribers:
+                    del self._subscribers[subscription.channel]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"subscribers": self._count, "channels": len(self._subscribers), "pid": os.getpid()}
+
+    def _poll(self, last_seen: int) -> tuple[int, list]:
+        with self._app.app_context():
+            try:
+                rows = db.session.execute(
+                    db.select(LiveEvent.id, LiveEvent.channel, LiveEvent.kind, LiveEvent.data)
+                    .where(LiveEvent.id > last_seen)
+                    .order_by(LiveEvent.id)
+                ).all()
+            finally:
+                db.session.remove()
+        return (rows[-1].id if rows else last_seen), rows
+
+    def _run(self, last_seen: int) -> None:
+        while True:
+            with self._lock:
+                if self._count == 0:
+                    # Idle: stop; the next subscriber starts a new thread from the current id.
+                    self._thread = None
+                    return
+            try:
+                last_seen, rows = self._poll(last_seen)
+            except Exception:  # noqa: BLE001 - keep polling through transient database errors
+                self._app.logger.exception("Live update poll failed")
+                rows = []
+            for row in rows:
+                with self._lock:
+                    targets = list(self._subscribers.get(row.channel, ()))
+                for subscription in targets:
+                    try:
+                        subscription.events.put_nowait((row.id, row.kind, row.data))
+                    except queue.Full:
+                        subscription.overflowed = True
+            time.sleep(self.poll_seconds)
+
+    def stream(self, subscription: Subscription, backlog: list[tuple[int, str, str]]) -> Iterator[str]:
+        """The SSE body: the backlog, then live events and heartbeats until the time limit."""
+        try:
+            yield f"retry: {int(self.poll_seconds * 2000)}\n\n"
+            sent = 0
+            for event_id, kind, data in backlog:
+                sent = event_id
+                yield format_event(event_id, kind, data)
+            deadline = time.monotonic() + self.stream_seconds
+            while (remaining := deadline - time.monotonic()) > 0 and not subscription.overflowed:
+                try:
+                    item = subscription.events.get(timeout=min(self.heartbeat_seconds, remaining))
+                except queue.Empty:
+                    yield ": heartbeat\n\n"
+                    continue
+                event_id, kind, data = item
+                if event_id > sent:  # replayed already if it committed before the backlog query
+                    sent = event_id
+                    yield format_event(event_id, kind, data)
+        finally:
+            self.unsubscribe(subscription)
+
+
+broadcaster = LiveBroadcaster()
+
+
+def stream_response(channel: str) -> Response:
+    """An event stream for the channel, resuming after `Last-Event-ID` or from `?since=`."""
+    if not broadcaster.enabled:
+        abort(404)
+    last_event_id = request.headers.get("Last-Event-ID")
+    try:
+        after_id = int(last_event_id) if last_event_id else None
+        since = datetime.fromisoformat(request.args["since"]) if "since" in request.args else None
+    except ValueError:
+        abort(400)
+    subscription = broadcaster.subscribe(channel)
+    if subscription is None:
+        raise ServiceUnavailable(retry_after=max(1, int(broadcaster.heartbeat_seconds)))
+    try:
+        backlog = replay(channel, after_id, since)
+    except Exception:
+        broadcaster.unsubscribe(subscription)
+        raise
+    # The request's session is removed before the body is iterated, so waiting streams hold
+    # no database connection.
+    response = Response(broadcaster.stream(subscription, backlog), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-store"
+    response.headers["X-Accel-Buffering"] = "no"
+    # Also when the body is never iterated (HEAD, or the client leaving first).
+    response.call_on_close(lambda: broadcaster.unsubscribe(subscription))
+    return response
@@ -0,0 +1,269 @@
+"""
+Request metrics in Prometheus text format, plus a `Server-Timing` header.
+
+Every request records its endpoint, method and status, its latency in a histogram, and the
+SQL statements it ran and the time they took (SQLAlchemy cursor events on every engine).
+Markdown rendering (`MarkdownRenderer.render_results`) and confirmation emails
+(`send_email_confirmation`, and the SMTP send in `process_outbox`) are timed as well.
+
+Each process keeps its numbers in memory and writes them to `<METRICS_DIR>/<pid>.json` at
+most every `METRICS_FLUSH_SECONDS`. `/admin/metrics` sums the files of all processes, so
+the counters cover every gunicorn worker and the mail worker. Files of exited processes are
+kept until the directory is cleared (gunicorn.conf.py clears it when the server starts), so
+the totals only drop when a pid is reused.
+
+With `SERVER_TIMING` on, responses carry `Server-Timing: db;dur=..;desc="N queries",
+render;dur=.., tpl;dur=.., app;dur=..` in milliseconds. Streamed bodies are timed up to
+the headers.
+"""
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from dataclasses import dataclass
+
+from flask import before_render_template, g, has_request_context, request, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Upper bounds in seconds; the implicit last bucket is +Inf.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_HELP = {
+    "ses_http_requests_total": ("counter", "Requests by endpoint, method and status."),
+    "ses_http_request_duration_seconds": ("histogram", "Time to produce the response headers."),
+    "ses_db_statements_total": ("counter", "SQL statements executed while serving requests."),
+    "ses_db_seconds_total": ("counter", "Time spent executing SQL while serving requests."),
+    "ses_markdown_render_seconds": ("histogram", "Markdown to HTML rendering calls."),
+    "ses_email_seconds": ("histogram", "Confirmation email work by stage (enqueue, smtp)."),
+}
+
+
+@dataclass
+class RequestTimings:
+    started: float
+    statements: int = 0
+    db_seconds: float = 0.0
+    render_seconds: float = 0.0
+    template_seconds: float = 0.0
+    template_started: float | None = None
+
+
+class MetricsRegistry:
+    def __init__(self, directory: str | None = None, flush_seconds: float = 1.0):
+        self.directory = directory
+        self.flush_seconds = flush_seconds
+        self.enabled = False
+        self.server_timing = False
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self._pid = os.getpid()
+        self._counters: dict[tuple, float] = {}
+        # (name, labels) -> [bucket counts..., +Inf count, sum]
+        self._histograms: dict[tuple, list[float]] = {}
+        self._flushed_at = 0.0
+
+    def init_app(self, app) -> None:
+        self.enabled = app.config["METRICS_ENABLED"]
+        self.server_timing = app.config["SERVER_TIMING"]
+        if not self.enabled:
+            return
+        self.directory = app.config["METRICS_DIR"] or os.path.join(app.instance_path, "metrics")
+        self.flush_seconds = app.config["METRICS_FLUSH_SECONDS"]
+        with self._lock:
+            self._reset()
+        if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+            event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+            event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        before_render_template.connect(_before_template, app)
+        template_rendered.connect(_after_template, app)
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+
+    # Recording
+
+    def _check_pid(self) -> None:
+        # Callers hold self._lock. A forked child starts from zero under its own file.
+        if os.getpid() != self._pid:
+            self._reset()
+
+    def inc(self, name: str, labels: tuple = (), amount: float = 1) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._check_pid()
+            key = (name, labels)
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, labels: tuple = ()) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._check_pid()
+            series = self._histograms.get((name, labels))
+            if series is None:
+                series = self._histograms[(name, labels)] = [0] * (len(LATENCY_BUCKETS) + 2)
+            series[bisect_left(LATENCY_BUCKETS, value)] += 1
+            series[-1] += value
+
+    def _start_request(self) -> None:
+        g.metrics_timings = RequestTimings(started=time.perf_counter())
+
+    def _finish_request(self, response):
+        timings = g.get("metrics_timings")
+        if timings is None:
+            return response
+        elapsed = time.perf_counter() - timings.started
+        endpoint = request.endpoint or "unmatched"
+        self.inc(
+            "ses_http_requests_total",
+            (("endpoint", endpoint), ("method", request.method), ("status", str(response.status_code))),
+        )
+        self.observe("ses_http_request_duration_seconds", elapsed, (("endpoint", endpoint),))
+        self.inc("ses_db_statements_total", (("endpoint", endpoint),), timings.statements)
+        self.inc("ses_db_seconds_total", (("endpoint", endpoint),), timings.db_seconds)
+        if self.server_timing:
+            response.headers["Server-Timing"] = ", ".join([
+                f'db;dur={timings.db_seconds * 1000:.1f};desc="{timings.statements} queries"',
+                f"render;dur={timings.render_seconds * 1000:.1f}",
+                f"tpl;dur={timings.template_seconds * 1000:.1f}",
+                f"app;dur={elapsed * 1000:.1f}",
+            ])
+        self.maybe_flush()
+        return response
+
+    # Per-process files
+
+    def _snapshot(self) -> dict:
+        with self._lock:
+            self._check_pid()
+            return {
+                "counters": [[name, list(labels), value] for (name, labels), value in self._counters.items()],
+                "histograms": [[name, list(labels), series] for (name, labels), series in self._histograms.items()],
+            }
+
+    def flush(self) -> None:
+        if not self.enabled or not self.directory:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        snapshot = self._snapshot()
+        path = os.path.join(self.directory, f"{os.getpid()}.json")
+        temporary = f"{path}.{threading.get_ident()}.tmp"
+        with open(temporary, "w") as handle:
+            json.dump(snapshot, handle)
+        os.replace(temporary, path)
+        self._flushed_at = time.monotonic()
+
+    def maybe_flush(self) -> None:
+        if time.monotonic() - self._flushed_at >= self.flush_seconds:
+            self.flush()
+
+    def collect(self) -> tuple[dict, dict]:
+        """Sum the files of every process, after writing this process's own."""
+        self.flush()
+        counters: dict[tuple, float] = {}
+        histograms: dict[tuple, list[float]] = {}
+        names = sorted(os.listdir(self.directory)) if os.path.isdir(self.directory) else []
+        for name in names:
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as handle:
+                    snapshot = json.load(handle)
+            except (OSError, ValueError):
+                continue  # removed or replaced while listing
+            for metric, labels, value in snapshot["counters"]:
+                key = (metric, tuple(tuple(pair) for pair in labels))
+                counters[key] = counters.get(key, 0) + value
+            for metric, labels, series in snapshot["histograms"]:
+                key = (metric, tuple(tuple(pair) for pair in labels))
+                total = histograms.setdefault(key, [0] * len(series))
+                for index, value in enumerate(series):
+                    total[index] += value
+        return counters, histograms
+
+    def render(self) -> str:
+        """All processes' metrics in the Prometheus text exposition format."""
+        counters, histograms = self.collect()
+        lines: list[str] = []
+        for metric, (kind, help_text) in _HELP.items():
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} {kind}")
+            if kind == "counter":
+                for (name, labels), value in sorted(counters.items()):
+                    if name == metric:
+                        lines.append(f"{metric}{_labels(labels)} {_number(value)}")
+                continue
+            for (name, labels), series in sorted(histograms.items()):
+                if name != metric:
+                    continue
+                cumulative = 0
+                for bound, count in zip((*LATENCY_BUCKETS, "+Inf"), series[:-1]):
+                    cumulative += count
+                    le = bound if isinstance(bound, str) else repr(bound)
+                    lines.append(f"{metric}_bucket{_labels(labels + (('le', le),))} {_number(cumulative)}")
+                lines.append(f"{metric}_sum{_labels(labels)} {_number(series[-1])}")
+                lines.append(f"{metric}_count{_labels(labels)} {_number(cumulative)}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+metrics = MetricsRegistry()
+
+
+def _timings() -> RequestTimings | None:
+    return g.get("metrics_timings") if has_request_context() else None
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    timings = _timings()
+    started = getattr(context, "_metrics_started", None)
+    if timings is not None and started is not None:
+        timings.statements += 1
+        timings.db_seconds += time.perf_counter() - started
+
+
+def _before_template(sender, template, context, **extra):
+    timings = _timings()
+    if timings is not None:
+        timings.template_started = time.perf_counter()
+
+
+def _after_template(sender, template, context, **extra):
+    timings = _timings()
+    if timings is not None and timings.template_started is not None:
+        timings.template_seconds += time.perf_counter() - timings.template_started
+        timings.template_started = None
+
+
+def record_render(seconds: float) -> None:
+    """Time spent in one Markdown rendering call."""
+    metrics.observe("ses_markdown_render_seconds", seconds)
+    timings = _timings()
+    if timings is not None:
+        timings.render_seconds += seconds
+
+
+def record_email(stage: str, seconds: float) -> None:
+    metrics.observe("ses_email_seconds", seconds, (("stage", stage),))
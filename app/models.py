@@ -5,8 +5,11 @@ from flask_login import UserMixin
 from werkzeug.security import check_password_hash, generate_password_hash
 from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
 from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm.attributes import set_committed_value
 
 from app import db, login_manager
+from app.utils import RENDERER_VERSION, markdown_renderer, render_markdown
 
 
 class Stance(str, Enum):
@@ -14,6 +17,48 @@ class Stance(str, Enum):
     AGAINST = "against"
 
 
+class OutboxStatus(str, Enum):
+    PENDING = "pending"
+    SENT = "sent"
+    DEAD = "dead"
+
+
+class RenderedContentMixin:
+    """Stores the sanitized HTML for `content` alongside the Markdown source."""
+
+    content_html = db.Column(db.Text)
+    render_version = db.Column(db.Integer)
+
+    def render_content(self) -> None:
+        result = markdown_renderer.render_result(self.content)
+        self.content_html = result.html
+        # A fallback caused by load leaves the row stale for `flask render-content`.
+        self.render_version = RENDERER_VERSION if result.final else None
+
+    @property
+    def rendered_html(self) -> str:
+        if self.content_html is None:
+            return render_markdown(self.content)
+        return self.content_html
+
+    @classmethod
+    def stale_filter(cls):
+        return db.or_(cls.render_version.is_(None), cls.render_version != RENDERER_VERSION)
+
+
+def prime_rendered_html(items) -> None:
+    """
+    Fill in HTML for rows that predate stored rendering with a single batched render,
+    without marking the rows dirty.
+    """
+    pending = [item for item in items if item.content_html is None]
+    if not pending:
+        return
+    htmls = markdown_renderer.render_many(item.content for item in pending)
+    for item, html in zip(pending, htmls):
+        set_committed_value(item, "content_html", html)
+
+
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(255), unique=True, nullable=False, index=True)
@@ -22,7 +67,7 @@ class User(UserMixin, db.Model):
     confirmed = db.Column(db.Boolean, default=False)
     is_admin = db.Column(db.Boolean, default=False)
     is_blocked = db.Column(db.Boolean, default=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
 
     opinions = db.relationship("Opinion", backref="author", lazy=True)
     arguments = db.relationship("Argument", backref="author", lazy=True)
@@ -50,12 +95,21 @@ class User(UserMixin, db.Model):
         return f"<User {self.username}>"
 
 
-class Opinion(db.Model):
+class Opinion(RenderedContentMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(160), nullable=False)
     content = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
-    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False, index=True)
+    for_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    against_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    # Bumped whenever anything shown on the opinion's pages changes; feeds HTTP validators.
+    version = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    # Front-page orderings (app/ranking.py): time-decayed activity relative to the
+    # RankingEpoch, and twice the smaller side's argument count.
+    hot_score = db.Column(db.Float, nullable=False, default=0, server_default="0", index=True)
+    contested_score = db.Column(db.Integer, nullable=False, default=0, server_default="0", index=True)
 
     arguments = db.relationship(
         "Argument", backref="opinion", lazy=True, cascade="all, delete-orphan"
@@ -65,13 +119,18 @@ class Opinion(db.Model):
         return f"<Opinion {self.title}>"
 
 
-class Argument(db.Model):
+class Argument(RenderedContentMixin, db.Model):
+    __table_args__ = (
+        db.Index("ix_argument_opinion_stance_created", "opinion_id", "stance", "created_at"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     content = db.Column(db.Text, nullable=False)
     stance = db.Column(db.Enum(Stance), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
-    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False, index=True)
     opinion_id = db.Column(db.Integer, db.ForeignKey("opinion.id"), nullable=False)
+    reasoning_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
 
     reasoning = db.relationship(
         "Reasoning", backref="argument", lazy=True, cascade="all, delete-orphan"
@@ -81,17 +140,207 @@ class Argument(db.Model):
         return f"<Argument {self.stance.value} on opinion {self.opinion_id}>"
 
 
-class Reasoning(db.Model):
+class Reasoning(RenderedContentMixin, db.Model):
+    __table_args__ = (db.Index("ix_reasoning_argument_created", "argument_id", "created_at"),)
+
     id = db.Column(db.Integer, primary_key=True)
     content = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
-    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False, index=True)
     argument_id = db.Column(db.Integer, db.ForeignKey("argument.id"), nullable=False)
 
     def __repr__(self) -> str:
         return f"<Reasoning by {self.user_id} on argument {self.argument_id}>"
 
 
+class OpinionSnapshot(db.Model):
+    """
+    The opinion detail page as one JSON document (see app/snapshots.py), tagged with the
+    opinion `version` and `RENDERER_VERSION` it was built from.
+    """
+
+    opinion_id = db.Column(db.Integer, db.ForeignKey("opinion.id"), primary_key=True)
+    version = db.Column(db.Integer, nullable=False)
+    render_version = db.Column(db.Integer, nullable=False)
+    document = db.Column(db.Text, nullable=False)
+
+
+class OutboundEmail(db.Model):
+    """A queued message; `next_attempt_at` doubles as the lease while a worker sends it."""
+
+    __table_args__ = (db.Index("ix_outbound_email_status_due", "status", "next_attempt_at"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    subject = db.Column(db.String(255), nullable=False)
+    sender = db.Column(db.String(255))
+    recipients = db.Column(db.Text, nullable=False)
+    body = db.Column(db.Text)
+    html = db.Column(db.Text)
+    status = db.Column(db.Enum(OutboxStatus), nullable=False, default=OutboxStatus.PENDING)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+
+    def __repr__(self) -> str:
+        return f"<OutboundEmail {self.id} {self.status.value}>"
+
+
+class CacheGeneration(db.Model):
+    """Named counters bumped on writes so every worker can tell its cached copies are stale."""
+
+    name = db.Column(db.String(64), primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+
+    @classmethod
+    def bump(cls, name: str) -> None:
+        """Increment within the caller's transaction so the bump commits with the change."""
+        result = db.session.execute(
+            db.update(cls).where(cls.name == name).values(value=cls.value + 1)
+        )
+        if not result.rowcount:
+            db.session.add(cls(name=name, value=1))
+
+    @classmethod
+    def current(cls, name: str) -> int:
+        value = db.session.execute(db.select(cls.value).where(cls.name == name)).scalar()
+        return value or 0
+
+
+class RankingEpoch(db.Model):
+    """The single row holding the time stored hot scores are expressed relative to."""
+
+    id = db.Column(db.Integer, primary_key=True)
+    decayed_at = db.Column(db.DateTime, nullable=False)
+
+
+class LiveEvent(db.Model):
+    """
+    Change log for live page updates: the posting request adds a row in its transaction and
+    every worker's broadcaster (app/live.py) polls for new ids. AUTOINCREMENT keeps ids from
+    being reused after `flask live-prune`, since clients resume by id.
+    """
+
+    __table_args__ = (
+        db.Index("ix_live_event_channel_id", "channel", "id"),
+        {"sqlite_autoincrement": True},
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    channel = db.Column(db.String(64), nullable=False)
+    kind = db.Column(db.String(32), nullable=False)
+    data = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+
+class ImportRef(db.Model):
+    """Maps ids from an imported source to the rows created for them, so imports can resume."""
+
+    source = db.Column(db.String(64), primary_key=True)
+    kind = db.Column(db.String(16), primary_key=True)
+    source_id = db.Column(db.String(64), primary_key=True)
+    target_id = db.Column(db.Integer, nullable=False)
+
+
+def stance_count_column(stance: Stance):
+    table = Opinion.__table__
+    return table.c.for_count if stance == Stance.FOR else table.c.against_count
+
+
+def contested_value(for_count, against_count):
+    """SQL for `Opinion.contested_score`: both sides' counts minus the imbalance, 2 * min."""
+    return db.case((for_count < against_count, 2 * for_count), else_=2 * against_count)
+
+
+# CacheGeneration bumped whenever an opinion is deleted, which changes no remaining row.
+OPINIONS_DELETED = "opinions-deleted"
+
+
+def touch_values() -> dict:
+    """Column values marking an opinion as changed (bumps `version` and `updated_at`)."""
+    table = Opinion.__table__
+    return {table.c.version: table.c.version + 1, table.c.updated_at: datetime.utcnow()}
+
+
+# Counters are adjusted with SQL expressions on the flushing connection so they
+# commit (or roll back) together with the row that changed them.
+def _adjust_stance_count(connection, argument: Argument, delta: int) -> None:
+    table = Opinion.__table__
+    column = stance_count_column(argument.stance)
+    # SET expressions read the old row, so the contested score is computed from the new counts.
+    new_for = table.c.for_count + (delta if argument.stance == Stance.FOR else 0)
+    new_against = table.c.against_count + (delta if argument.stance == Stance.AGAINST else 0)
+    connection.execute(
+        table.update()
+        .where(table.c.id == argument.opinion_id)
+        .values({
+            column: column + delta,
+            table.c.contested_score: contested_value(new_for, new_against),
+            **touch_values(),
+        })
+    )
+
+
+def _adjust_reasoning_count(connection, reasoning: Reasoning, delta: int) -> None:
+    column = Argument.__table__.c.reasoning_count
+    connection.execute(
+        Argument.__table__.update()
+        .where(Argument.__table__.c.id == reasoning.argument_id)
+        .values({column: column + delta})
+    )
+    owning_opinion = (
+        db.select(Argument.__table__.c.opinion_id)
+        .where(Argument.__table__.c.id == reasoning.argument_id)
+        .scalar_subquery()
+    )
+    connection.execute(
+        Opinion.__table__.update()
+        .where(Opinion.__table__.c.id == owning_opinion)
+        .values(touch_values())
+    )
+
+
+@event.listens_for(Opinion, "before_update")
+def _opinion_edited(mapper, connection, target):
+    state = db.inspect(target)
+    if state.attrs.title.history.has_changes() or state.attrs.content.history.has_changes():
+        target.version = Opinion.version + 1
+        target.updated_at = datetime.utcnow()
+
+
+@event.listens_for(Opinion, "after_delete")
+def _opinion_deleted(mapper, connection, target):
+    table = CacheGeneration.__table__
+    result = connection.execute(
+        table.update().where(table.c.name == OPINIONS_DELETED).values(value=table.c.value + 1)
+    )
+    if not result.rowcount:
+        connection.execute(table.insert().values(name=OPINIONS_DELETED, value=1))
+
+
+@event.listens_for(Argument, "after_insert")
+def _argument_inserted(mapper, connection, target):
+    _adjust_stance_count(connection, target, 1)
+
+
+@event.listens_for(Argument, "after_delete")
+def _argument_deleted(mapper, connection, target):
+    _adjust_stance_count(connection, target, -1)
+
+
+@event.listens_for(Reasoning, "after_insert")
+def _reasoning_inserted(mapper, connection, target):
+    _adjust_reasoning_count(connection, target, 1)
+
+
+@event.listens_for(Reasoning, "after_delete")
+def _reasoning_deleted(mapper, connection, target):
+    _adjust_reasoning_count(connection, target, -1)
+
+
 @login_manager.user_loader
 def load_user(user_id: str):
-    return User.query.get(int(user_id))
+    from app.user_cache import user_cache
+
+    return user_cache.get(int(user_id))
@@ -0,0 +1,258 @@
+"""
+Rendered-fragment cache for anonymous page views.
+
+Fragments are keyed by the freshness token that `conditional_get` computed for the request
+(see `app/http_cache.py`) plus the request path, so an entry can never outlive the data it
+was rendered from. Writes additionally evict entries by tag ("index", "opinion:<id>") so
+space is reclaimed immediately and a shared backend drops them for every worker.
+
+Backends: "memory" is a per-process LRU, "sqlite" is a file shared by all gunicorn
+workers on the host, and "null" disables caching.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Iterable
+
+from flask import g, request
+
+
+class NullBackend:
+    def get(self, key: str) -> str | None:
+        return None
+
+    def set(self, key: str, value: str, tags: Iterable[str], ttl: int) -> None:
+        pass
+
+    def invalidate_tags(self, tags: Iterable[str]) -> None:
+        pass
+
+    def clear(self) -> None:
+        pass
+
+    def size(self) -> int:
+        return 0
+
+
+class MemoryBackend:
+    def __init__(self, maxsize: int = 512):
+        self.maxsize = maxsize
+        self._entries: OrderedDict[str, tuple[float, str, frozenset]] = OrderedDict()
+        self._tags: dict[str, set[str]] = {}
+        self._lock = threading.Lock()
+
+    def _drop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.time():
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, value: str, tags: Iterable[str], ttl: int) -> None:
+        tags = frozenset(tags)
+        with self._lock:
+            self._drop(key)
+            self._entries[key] = (time.time() + ttl, value, tags)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                self._drop(next(iter(self._entries)))
+
+    def invalidate_tags(self, tags: Iterable[str]) -> None:
+        with self._lock:
+            for tag in tags:
+                for key in list(self._tags.get(tag, ())):
+                    self._drop(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+
+    def size(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteBackend:
+    """Shared cache in a standalone SQLite file; connections are per thread and per process."""
+
+    SCHEMA = [
+        """
+        CREATE TABLE IF NOT EXISTS fragment (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL,
+            expires_at REAL NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS fragment_tag (
+            tag TEXT NOT NULL,
+            key TEXT NOT NULL REFERENCES fragment (key) ON DELETE CASCADE,
+            PRIMARY KEY (tag, key)
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS ix_fragment_tag_key ON fragment_tag (key)",
+        "CREATE INDEX IF NOT EXISTS ix_fragment_expires ON fragment (expires_at)",
+    ]
+
+    def __init__(self, path: str, maxsize: int = 5000):
+        self.path = path
+        self.maxsize = maxsize
+        self._local = threading.local()
+        self._writes = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            for statement in self.SCHEMA:
+                conn.execute(statement)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key: str) -> str | None:
+        row = self._connection().execute(
+            "SELECT value FROM fragment WHERE key = ? AND expires_at >= ?", (key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: str, tags: Iterable[str], ttl: int) -> None:
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "INSERT OR REPLACE INTO fragment (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, time.time() + ttl),
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO fragment_tag (tag, key) VALUES (?, ?)",
+                [(tag, key) for tag in tags],
+            )
+        self._writes += 1
+        if self._writes % 100 == 0:
+            self._prune(conn)
+
+    def _prune(self, conn: sqlite3.Connection) -> None:
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM fragment WHERE expires_at < ?", (time.time(),))
+            conn.execute(
+                "DELETE FROM fragment WHERE key IN ("
+                "SELECT key FROM fragment ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+                (self.maxsize,),
+            )
+
+    def invalidate_tags(self, tags: Iterable[str]) -> None:
+        tags = list(tags)
+        if not tags:
+            return
+        placeholders = ", ".join("?" for _ in tags)
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                f"DELETE FROM fragment WHERE key IN "
+                f"(SELECT key FROM fragment_tag WHERE tag IN ({placeholders}))",
+                tags,
+            )
+
+    def clear(self) -> None:
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM fragment")
+
+    def size(self) -> int:
+        return self._connection().execute("SELECT count(*) FROM fragment").fetchone()[0]
+
+
+class PageCache:
+    def __init__(self):
+        self.backend = NullBackend()
+        self.ttl = 300
+        self.hits: dict[str, int] = {}
+        self.misses: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app) -> None:
+        name = app.config["PAGE_CACHE_BACKEND"]
+        self.ttl = app.config["PAGE_CACHE_TTL"]
+        if name == "memory":
+            self.backend = MemoryBackend(app.config["PAGE_CACHE_SIZE"])
+        elif name == "sqlite":
+            path = app.config["PAGE_CACHE_PATH"] or os.path.join(app.instance_path, "page_cache.sqlite")
+            self.backend = SQLiteBackend(path, app.config["PAGE_CACHE_SIZE"])
+        elif name in ("null", "none", ""):
+            self.backend = NullBackend()
+        else:
+            raise ValueError(f"Unknown PAGE_CACHE_BACKEND {name!r}")
+
+    def _count(self, counter: dict[str, int], name: str) -> None:
+        with self._lock:
+            counter[name] = counter.get(name, 0) + 1
+
+    def fragment(self, name: str, tags: Iterable[str], render: Callable[[], str]) -> str:
+        """
+        Return the cached fragment for this request, rendering and storing it on a miss.
+        Requests without a freshness token (signed-in users, flashes) always render.
+        """
+        token = g.get("freshness_token")
+        if token is None:
+            return render()
+        raw = f"{name}|{token}|{request.full_path}"
+        key = f"{name}:{hashlib.blake2b(raw.encode(), digest_size=16).hexdigest()}"
+        html = self.backend.get(key)
+        if html is not None:
+            self._count(self.hits, name)
+            return html
+        self._count(self.misses, name)
+        html = render()
+        self.backend.set(key, html, tags, self.ttl)
+        return html
+
+    def invalidate(self, *tags: str) -> None:
+        self.backend.invalidate_tags(tags)
+
+    def stats(self) -> dict:
+        with self._lock:
+            names = sorted(set(self.hits) | set(self.misses))
+            fragments = {}
+            for name in names:
+                hits, misses = self.hits.get(name, 0), self.misses.get(name, 0)
+                fragments[name] = {
+                    "hits": hits,
+                    "misses": misses,
+                    "hit_ratio": round(hits / (hits + misses), 4) if hits + misses else None,
+                }
+        return {
+            "backend": type(self.backend).__name__,
+            "entries": self.backend.size(),
+            "pid": os.getpid(),
+            "fragments": fragments,
+        }
+
+
+page_cache = PageCache()
@@ -0,0 +1,63 @@
+"""
+Keyset pagination over `(created_at, id)`, newest first. Cursors are opaque strings that
+name the last row of the previous page, so each page is an index range scan without OFFSET.
+"""
+import base64
+import binascii
+from dataclasses import dataclass
+from datetime import datetime
+
+from flask import abort
+
+from app import db
+
+
+@dataclass
+class Page:
+    items: list
+    next_cursor: str | None
+    cursor: str | None = None
+
+
+def pack_cursor(*parts) -> str:
+    raw = "|".join(str(part) for part in parts).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def unpack_cursor(cursor: str, *types):
+    """Split a cursor into its parts, converting each with `types`; malformed ones are a 400."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        parts = base64.urlsafe_b64decode(padded).decode().split("|")
+        if len(parts) != len(types):
+            raise ValueError(cursor)
+        return tuple(convert(part) for convert, part in zip(types, parts))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        abort(400)
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    return pack_cursor(created_at.isoformat(), row_id)
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """Decode a cursor from a query string; malformed cursors are a 400, not a 500."""
+    return unpack_cursor(cursor, datetime.fromisoformat, int)
+
+
+def keyset_paginate(query, model, before: str | None, per_page: int) -> Page:
+    if before:
+        created_at, row_id = decode_cursor(before)
+        query = query.filter(
+            db.or_(
+                model.created_at < created_at,
+                db.and_(model.created_at == created_at, model.id < row_id),
+            )
+        )
+    rows = query.order_by(model.created_at.desc(), model.id.desc()).limit(per_page + 1).all()
+    items = rows[:per_page]
+    next_cursor = None
+    if len(rows) > per_page:
+        last = items[-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+    return Page(items=items, next_cursor=next_cursor, cursor=before)
@@ -0,0 +1,225 @@
+"""
+Page-level data loading for the read views. Each function loads everything its template
+needs in a fixed number of SQL statements, so template access never triggers lazy loads.
+"""
+import re
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+from sqlalchemy import event, func
+from sqlalchemy.orm import joinedload
+
+from flask import abort
+
+from app import db
+from app.models import (
+    OPINIONS_DELETED,
+    Argument,
+    CacheGeneration,
+    Opinion,
+    Reasoning,
+    Stance,
+    prime_rendered_html,
+)
+from app.pagination import encode_cursor, keyset_paginate
+from app.ranking import DEFAULT_SORT, SORTS, ranked_page
+from app.snapshots import load_snapshot
+
+# Upper bound on SQL statements per read endpoint for an anonymous request.
+QUERY_BUDGETS = {
+    "main.index": 2,
+    "main.view_opinion": 2,
+    "main.view_argument": 3,
+    "api.list_opinions": 2,
+    "api.get_opinion": 3,
+    "api.get_argument": 3,
+}
+
+
+# Freshness tokens for conditional GET: each is one statement of indexed lookups that
+# changes whenever anything rendered on the corresponding page changes.
+def index_freshness() -> tuple[str, object]:
+    # Separate subqueries: SQLite answers a lone max() from the index end, but scans the
+    # table for several aggregates in one SELECT.
+    latest, newest_id, deletions = db.session.execute(
+        db.select(
+            db.select(func.max(Opinion.updated_at)).scalar_subquery(),
+            db.select(func.max(Opinion.id)).scalar_subquery(),
+            db.select(CacheGeneration.value)
+            .where(CacheGeneration.name == OPINIONS_DELETED)
+            .scalar_subquery(),
+        )
+    ).one()
+    return f"index:{latest}:{newest_id}:{deletions}", latest
+
+
+def opinion_freshness(opinion_id: int) -> tuple[str, object]:
+    row = db.session.execute(
+        db.select(Opinion.version, Opinion.updated_at).where(Opinion.id == opinion_id)
+    ).first()
+    if row is None:
+        abort(404)
+    return f"opinion:{opinion_id}:{row.version}", row.updated_at
+
+
+def argument_freshness(argument_id: int) -> tuple[str, object]:
+    row = db.session.execute(
+        db.select(Opinion.version, Opinion.updated_at)
+        .join(Argument, Argument.opinion_id == Opinion.id)
+        .where(Argument.id == argument_id)
+    ).first()
+    if row is None:
+        abort(404)
+    return f"argument:{argument_id}:{row.version}", row.updated_at
+
+
+def index_page(before: str | None = None, per_page: int = 50, sort: str = DEFAULT_SORT) -> dict:
+    if sort not in SORTS:
+        abort(400)
+    page = ranked_page(sort, before, per_page)
+    prime_rendered_html(page.items)
+    return {"opinions": page.items, "page": page, "sort": sort}
+
+
+def opinion_header(opinion_id: int) -> dict:
+    opinion = Opinion.query.options(joinedload(Opinion.author)).get_or_404(opinion_id)
+    prime_rendered_html([opinion])
+    return {"opinion": opinion}
+
+
+def opinion_arguments(opinion_id: int) -> dict:
+    # One range scan over ix_argument_opinion_stance_created returns both stances.
+    arguments = (
+        Argument.query.filter_by(opinion_id=opinion_id)
+        .order_by(Argument.stance, Argument.created_at, Argument.id)
+        .all()
+    )
+    prime_rendered_html(arguments)
+    return {
+        "arguments_for": [arg for arg in arguments if arg.stance == Stance.FOR],
+        "arguments_against": [arg for arg in arguments if arg.stance == Stance.AGAINST],
+    }
+
+
+def opinion_page(opinion_id: int) -> dict:
+    return {**opinion_header(opinion_id), **opinion_arguments(opinion_id)}
+
+
+def argument_page(argument_id: int, before: str | None = None, per_page: int = 50) -> dict:
+    argument = Argument.query.options(joinedload(Argument.opinion)).get_or_404(argument_id)
+    page = keyset_paginate(
+        Reasoning.query.options(joinedload(Reasoning.author)).filter_by(argument_id=argument_id),
+        Reasoning,
+        before,
+        per_page,
+    )
+    prime_rendered_html([argument, *page.items])
+    return {"argument": argument, "reasoning": page.items, "page": page}
+
+
+class StatementCounter:
+    def __init__(self):
+        self.statements: list[str] = []
+        self.parameters: list = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("BEGIN"):
+            # Explicit transaction starts (see app/database.py) are not queries.
+            return
+        self.statements.append(statement)
+        self.parameters.append(parameters)
+
+
+@contextmanager
+def count_statements(engine=None):
+    """Record every SQL statement executed on the engine while the block runs."""
+    engine = engine or db.engine
+    counter = StatementCounter()
+    event.listen(engine, "before_cursor_execute", counter._record)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, "before_cursor_execute", counter._record)
+
+
+@contextmanager
+def assert_max_statements(limit: int, engine=None):
+    """Fail with the offending SQL if the block executes more than `limit` statements."""
+    with count_statements(engine) as counter:
+        yield counter
+    if counter.count > limit:
+        listing = "\n".join(counter.statements)
+        raise AssertionError(f"expected at most {limit} statements, got {counter.count}:\n{listing}")
+
+
+@dataclass
+class QueryPlan:
+    label: str
+    statement: str
+    plan: list[str]
+    full_scans: list[str] = field(default_factory=list)
+
+
+# "SCAN CONSTANT ROW" is the FROM-less outer SELECT around scalar subqueries, not a table.
+_SQLITE_FULL_SCAN = re.compile(r"^SCAN (?!CONSTANT ROW)(?!.*\bUSING\b)")
+
+
+def _explain(connection, statement: str, parameters) -> tuple[list[str], list[str]]:
+    dialect = connection.dialect.name
+    if dialect == "sqlite":
+        rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+        plan = [row[-1] for row in rows]
+        return plan, [line for line in plan if _SQLITE_FULL_SCAN.match(line)]
+    if dialect == "postgresql":
+        # Disabling sequential scans makes the planner report one only when no index fits.
+        connection.exec_driver_sql("SET LOCAL enable_seqscan = off")
+        rows = connection.exec_driver_sql(f"EXPLAIN {statement}", parameters)
+        plan = [row[0] for row in rows]
+        return plan, [line for line in plan if "Seq Scan" in line]
+    raise NotImplementedError(f"No EXPLAIN support for the {dialect} dialect")
+
+
+def explain_hot_queries() -> list[QueryPlan]:
+    """
+    Run the read-page loaders against the current data, capture the SQL they issue and
+    EXPLAIN each statement, flagging plans that fall back to full table scans.
+    """
+    opinion = Opinion.query.order_by(Opinion.id).first()
+    argument = Argument.query.order_by(Argument.id).first()
+    if opinion is None or argument is None:
+        raise LookupError("Need at least one opinion and argument to plan the hot queries.")
+    cursor = encode_cursor(opinion.created_at, opinion.id)
+    loaders = {
+        "index freshness": index_freshness,
+        "opinion freshness": lambda: opinion_freshness(opinion.id),
+        "argument freshness": lambda: argument_freshness(argument.id),
+        "index": lambda: index_page(),
+        "index (older page)": lambda: index_page(before=cursor),
+        "index (hot)": lambda: index_page(sort="hot", per_page=1),
+        "index (hot, older page)": lambda: index_page(
+            sort="hot", before=index_page(sort="hot", per_page=1)["page"].next_cursor
+        ),
+        "index (contested)": lambda: index_page(sort="contested"),
+        "opinion detail": lambda: opinion_page(opinion.id),
+        "opinion snapshot": lambda: load_snapshot(opinion.id),
+        "argument detail": lambda: argument_page(argument.id),
+        "argument detail (older page)": lambda: argument_page(
+            argument.id, before=encode_cursor(argument.created_at, argument.id)
+        ),
+    }
+
+    plans = []
+    for label, loader in loaders.items():
+        db.session.expunge_all()
+        with count_statements() as counter:
+            loader()
+        for statement, parameters in zip(counter.statements, counter.parameters):
+            with db.engine.connect() as connection:
+                plan, full_scans = _explain(connection, statement, parameters)
+                connection.rollback()
+            plans.append(QueryPlan(label, statement, plan, full_scans))
+    return plans
@@ -0,0 +1,229 @@
+"""
+Front-page orderings: `new` (creation time), `hot` and `contested`.
+
+`Opinion.hot_score` is time-decayed activity. Creating the opinion, each argument and each
+reasoning contributes its weight (`HOT_OPINION_WEIGHT`, `HOT_ARGUMENT_WEIGHT`,
+`HOT_REASONING_WEIGHT`) halved every `HOT_HALF_LIFE_HOURS`. Scores are stored relative to
+the `RankingEpoch`: an event at time t adds `weight * 2 ** ((t - epoch) / half_life)`, so
+newer activity adds more and every row decays at the same rate without being rewritten. The
+mapper events below add (or on delete subtract) the contribution in the writing
+transaction, and `flask rank-decay`, run periodically, multiplies every score by the decay
+since the epoch and moves the epoch to now, which keeps the numbers small without
+changing the order. If the job is not scheduled, the first write more than
+`_MAX_EXPONENT` half-lives past the epoch does the same rebase in its own transaction, so
+the contributions never overflow a float. `Opinion.contested_score` is maintained with the
+stance counters (see app.models). Both columns are indexed, so each ordering is an index
+range scan.
+"""
+from collections import defaultdict
+from datetime import datetime
+from typing import Iterable
+
+from flask import current_app
+from sqlalchemy import bindparam, event, select
+from sqlalchemy.orm import joinedload
+
+from app import db
+from app.models import Argument, Opinion, RankingEpoch, Reasoning
+from app.pagination import Page, keyset_paginate, pack_cursor, unpack_cursor
+
+SORTS = ("new", "hot", "contested")
+DEFAULT_SORT = "new"
+
+# Decayed scores below this become 0 and are no longer rewritten by the decay job.
+_MIN_SCORE = 1e-6
+# Writers rebase the scores once a contribution would exceed weight * 2 ** this.
+_MAX_EXPONENT = 40
+
+
+def _half_life_seconds() -> float:
+    return current_app.config["HOT_HALF_LIFE_HOURS"] * 3600
+
+
+def _weights() -> dict[type, float]:
+    config = current_app.config
+    return {
+        Opinion: config["HOT_OPINION_WEIGHT"],
+        Argument: config["HOT_ARGUMENT_WEIGHT"],
+        Reasoning: config["HOT_REASONING_WEIGHT"],
+    }
+
+
+def _exponent(when: datetime, epoch: datetime) -> float:
+    return (when - epoch).total_seconds() / _half_life_seconds()
+
+
+def contribution(weight: float, when: datetime, epoch: datetime) -> float:
+    return weight * 2 ** _exponent(when, epoch)
+
+
+def current_epoch(connection, create: bool = True) -> datetime:
+    """The epoch scores are relative to; writers create the row if the table is empty."""
+    table = RankingEpoch.__table__
+    epoch = connection.execute(select(table.c.decayed_at).where(table.c.id == 1)).scalar()
+    if epoch is None:
+        epoch = datetime.utcnow()
+        if create:
+            connection.execute(table.insert().values(id=1, decayed_at=epoch))
+    return epoch
+
+
+def _rebase(connection, epoch: datetime, now: datetime) -> float:
+    """Multiply every score by the decay from `epoch` to `now` and make `now` the epoch."""
+    factor = 2 ** -_exponent(now, epoch)
+    table = Opinion.__table__
+    decayed = table.c.hot_score * factor
+    connection.execute(
+        table.update()
+        .where(table.c.hot_score > 0)
+        .values(hot_score=db.case((decayed < _MIN_SCORE, 0.0), else_=decayed))
+    )
+    epoch_table = RankingEpoch.__table__
+    connection.execute(epoch_table.update().where(epoch_table.c.id == 1).values(decayed_at=now))
+    return factor
+
+
+def _writing_epoch(connection, when: datetime) -> datetime:
+    """The epoch for a contribution at `when`, rebased first if it has fallen too far behind."""
+    epoch = current_epoch(connection)
+    if _exponent(when, epoch) > _MAX_EXPONENT:
+        _rebase(connection, epoch, when)
+        epoch = when
+    return epoch
+
+
+def _add_score(connection, opinion_id, amount: float) -> None:
+    table = Opinion.__table__
+    connection.execute(
+        table.update().where(table.c.id == opinion_id).values(hot_score=table.c.hot_score + amount)
+    )
+
+
+def _owning_opinion(argument_id: int):
+    return (
+        select(Argument.__table__.c.opinion_id)
+        .where(Argument.__table__.c.id == argument_id)
+        .scalar_subquery()
+    )
+
+
+@event.listens_for(Opinion, "before_insert")
+def _opinion_created(mapper, connection, target):
+    if target.created_at is None:
+        target.created_at = datetime.utcnow()
+    weight = _weights()[Opinion]
+    epoch = _writing_epoch(connection, target.created_at)
+    target.hot_score = contribution(weight, target.created_at, epoch)
+
+
+def _activity(connection, target, opinion_id, sign: int) -> None:
+    created_at = target.created_at or datetime.utcnow()
+    amount = contribution(_weights()[type(target)], created_at, _writing_epoch(connection, created_at))
+    _add_score(connection, opinion_id, sign * amount)
+
+
+@event.listens_for(Argument, "after_insert")
+def _argument_inserted(mapper, connection, target):
+    _activity(connection, target, target.opinion_id, 1)
+
+
+@event.listens_for(Argument, "after_delete")
+def _argument_deleted(mapper, connection, target):
+    _activity(connection, target, target.opinion_id, -1)
+
+
+@event.listens_for(Reasoning, "after_insert")
+def _reasoning_inserted(mapper, connection, target):
+    _activity(connection, target, _owning_opinion(target.argument_id), 1)
+
+
+@event.listens_for(Reasoning, "after_delete")
+def _reasoning_deleted(mapper, connection, target):
+    _activity(connection, target, _owning_opinion(target.argument_id), -1)
+
+
+def decay_hot_scores(now: datetime | None = None) -> float:
+    """Rebase every hot score onto `now`; returns the factor the scores were multiplied by."""
+    now = now or datetime.utcnow()
+    connection = db.session.connection()
+    factor = _rebase(connection, current_epoch(connection), now)
+    db.session.commit()
+    return factor
+
+
+def recompute_hot_scores(opinion_ids: Iterable[int] | None = None, batch_size: int = 500) -> int:
+    """
+    Rebuild hot scores from the stored timestamps, for the given opinions or all of them;
+    for Core writes that bypass the mapper events and after changing the weights.
+    """
+    connection = db.session.connection()
+    epoch = _writing_epoch(connection, datetime.utcnow())
+    weights = _weights()
+    if opinion_ids is None:
+        opinion_ids = db.session.execute(select(Opinion.id).order_by(Opinion.id)).scalars().all()
+    ids = list(opinion_ids)
+    update = (
+        Opinion.__table__.update()
+        .where(Opinion.__table__.c.id == bindparam("row_id"))
+        .values(hot_score=bindparam("score"))
+    )
+    for start in range(0, len(ids), batch_size):
+        batch = ids[start:start + batch_size]
+        scores: dict[int, float] = defaultdict(float)
+        events = [
+            (Opinion, db.select(Opinion.id, Opinion.created_at).where(Opinion.id.in_(batch))),
+            (Argument, db.select(Argument.opinion_id, Argument.created_at).where(Argument.opinion_id.in_(batch))),
+            (
+                Reasoning,
+                db.select(Argument.opinion_id, Reasoning.created_at)
+                .join(Argument, Argument.id == Reasoning.argument_id)
+                .where(Argument.opinion_id.in_(batch)),
+            ),
+        ]
+        for model, stmt in events:
+            for opinion_id, created_at in db.session.execute(stmt):
+                if created_at is not None:
+                    scores[opinion_id] += contribution(weights[model], created_at, epoch)
+        connection.execute(update, [{"row_id": row_id, "score": scores[row_id]} for row_id in batch])
+    return len(ids)
+
+
+def _score_page(column, after: tuple[float, int] | None, per_page: int) -> tuple[list, object]:
+    query = Opinion.query.options(joinedload(Opinion.author))
+    if after:
+        value, row_id = after
+        query = query.filter(db.or_(column < value, db.and_(column == value, Opinion.id < row_id)))
+    rows = query.order_by(column.desc(), Opinion.id.desc()).limit(per_page + 1).all()
+    items = rows[:per_page]
+    return items, (items[-1] if len(rows) > per_page else None)
+
+
+def hot_page(before: str | None, per_page: int) -> Page:
+    epoch = current_epoch(db.session.connection(), create=False)
+    after = None
+    if before:
+        score, row_id, cursor_epoch = unpack_cursor(before, float, int, datetime.fromisoformat)
+        # Scores were rescaled if `flask rank-decay` ran since the cursor was issued.
+        score *= 2 ** -_exponent(epoch, cursor_epoch)
+        after = (score, row_id)
+    items, last = _score_page(Opinion.hot_score, after, per_page)
+    next_cursor = pack_cursor(repr(last.hot_score), last.id, epoch.isoformat()) if last else None
+    return Page(items=items, next_cursor=next_cursor, cursor=before)
+
+
+def contested_page(before: str | None, per_page: int) -> Page:
+    after = unpack_cursor(before, int, int) if before else None
+    items, last = _score_page(Opinion.contested_score, after, per_page)
+    next_cursor = pack_cursor(last.contested_score, last.id) if last else None
+    return Page(items=items, next_cursor=next_cursor, cursor=before)
+
+
+def ranked_page(sort: str, before: str | None, per_page: int) -> Page:
+    """One page of opinions in the given front-page order, with a keyset cursor."""
+    if sort == "hot":
+        return hot_page(before, per_page)
+    if sort == "contested":
+        return contested_page(before, per_page)
+    return keyset_paginate(
+        Opinion.query.options(joinedload(Opinion.author)), Opinion, before, per_page
+    )
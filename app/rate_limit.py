@@ -0,0 +1,299 @@
+"""
+Token-bucket rate limits for the write and auth endpoints.
+
+`RATELIMITS` maps an endpoint to a limit such as "10/minute": a bucket holds up to 10
+tokens, refills at 10 per minute, and every POST to the endpoint takes one. Each request
+draws from one bucket per client IP, one per signed-in user and, for anonymous forms that
+carry an `email` field (login, register, resend), one per address, so stuffing one account
+from many addresses is throttled as well. A request takes a token from every bucket or from
+none: an empty bucket answers 429 with `Retry-After` from a `before_request` hook, before
+the form is validated or a password hashed, and the rejected request costs nothing.
+
+The per-address bucket is a challenge rather than a lock: a browser that has already signed
+in to (or registered) the address skips it, so posting someone's email from many IPs cannot
+lock the owner out of login or resend; they are still limited by their own IP bucket.
+
+Backends: "sqlite" keeps the buckets in a standalone SQLite file shared by all gunicorn
+workers on the host (the buckets of one request are read and updated in one IMMEDIATE
+transaction, so concurrent takes never over-admit), "memory" is per process, and "null"
+disables limiting.
+"""
+import hashlib
+import math
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+
+from flask import current_app, request, session
+from flask_login import current_user
+from werkzeug.exceptions import TooManyRequests
+
+_SAFE_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+_PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+# Session key listing digests of the addresses this browser has signed in to.
+_KNOWN_ACCOUNTS = "_ratelimit_accounts"
+_MAX_KNOWN_ACCOUNTS = 5
+
+
+@dataclass(frozen=True)
+class Limit:
+    capacity: int
+    period: float
+
+    @property
+    def rate(self) -> float:
+        """Tokens refilled per second."""
+        return self.capacity / self.period
+
+    @classmethod
+    def parse(cls, spec: str) -> "Limit":
+        """Parse "<count>/<second|minute|hour|day>"."""
+        count, _, unit = spec.strip().partition("/")
+        unit = unit.strip().lower().rstrip("s")
+        if not count.strip().isdigit() or int(count) < 1 or unit not in _PERIODS:
+            raise ValueError(f"Invalid rate limit {spec!r}; expected e.g. '10/minute'")
+        return cls(int(count), _PERIODS[unit])
+
+    def refill(self, tokens: float, updated_at: float, now: float) -> float:
+        return min(self.capacity, tokens + max(0.0, now - updated_at) * self.rate)
+
+    def wait(self, tokens: float) -> float:
+        """Seconds until a bucket holding `tokens` has one to give."""
+        return (1 - tokens) / self.rate
+
+
+class NullBackend:
+    def take(self, keys: list[str], limit: Limit, now: float) -> tuple[bool, float]:
+        return True, 0.0
+
+    def reset(self, key: str) -> None:
+        pass
+
+
+class MemoryBackend:
+    def __init__(self):
+        self._buckets: dict[str, tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def take(self, keys: list[str], limit: Limit, now: float) -> tuple[bool, float]:
+        """One token from each bucket, or none when any is empty."""
+        with self._lock:
+            tokens = {
+                key: limit.refill(*self._buckets.get(key, (limit.capacity, now)), now) for key in keys
+            }
+            empty = [left for left in tokens.values() if left < 1]
+            if empty:
+                return False, max(limit.wait(left) for left in empty)
+            for key, left in tokens.items():
+                self._buckets[key] = (left - 1, now)
+        return True, 0.0
+
+    def reset(self, key: str) -> None:
+        with self._lock:
+            self._buckets.pop(key, None)
+
+
+class SQLiteBackend:
+    """Buckets in a standalone SQLite file; connections are per thread and per process."""
+
+    SCHEMA = [
+        """
+        CREATE TABLE IF NOT EXISTS bucket (
+            key TEXT PRIMARY KEY,
+            tokens REAL NOT NULL,
+            allowed INTEGER NOT NULL,
+            updated_at REAL NOT NULL,
+            expires_at REAL NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS ix_bucket_expires ON bucket (expires_at)",
+    ]
+
+    # Rows are only written when every bucket of the request had a token, so `allowed` is
+    # always 1; the column stays for files created before takes became all-or-nothing.
+    SPEND = """
+        INSERT INTO bucket (key, tokens, allowed, updated_at, expires_at)
+        VALUES (:key, :tokens, 1, :now, :now + :period)
+        ON CONFLICT (key) DO UPDATE SET
+            tokens = excluded.tokens,
+            allowed = 1,
+            updated_at = excluded.updated_at,
+            expires_at = excluded.expires_at
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._takes = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            for statement in self.SCHEMA:
+                conn.execute(statement)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def take(self, keys: list[str], limit: Limit, now: float) -> tuple[bool, float]:
+        """One token from each bucket, or none when any is empty."""
+        conn = self._connection()
+        # IMMEDIATE takes the write lock before the reads, so no other take can spend the
+        # tokens between the check and the update.
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            tokens = {}
+            for key in keys:
+                row = conn.execute("SELECT tokens, updated_at FROM bucket WHERE key = ?", (key,)).fetchone()
+                tokens[key] = limit.refill(*row, now) if row else limit.capacity
+            empty = [left for left in tokens.values() if left < 1]
+            if not empty:
+                conn.executemany(self.SPEND, [
+                    {"key": key, "tokens": left - 1, "now": now, "period": limit.period}
+                    for key, left in tokens.items()
+                ])
+            self._takes += 1
+            if self._takes % 500 == 0:
+                # A bucket past expires_at has refilled completely, so dropping it changes nothing.
+                conn.execute("DELETE FROM bucket WHERE expires_at < ?", (now,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        if empty:
+            return False, max(limit.wait(left) for left in empty)
+        return True, 0.0
+
+    def reset(self, key: str) -> None:
+        self._connection().execute("DELETE FROM bucket WHERE key = ?", (key,))
+
+
+class RateLimiter:
+    def __init__(self):
+        self.backend = NullBackend()
+        self.limits: dict[str, Limit] = {}
+        self.allowed: dict[str, int] = {}
+        self.denied: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app) -> None:
+        name = app.config["RATELIMIT_BACKEND"]
+        if name == "sqlite":
+            path = app.config["RATELIMIT_STORAGE_PATH"] or os.path.join(app.instance_path, "ratelimit.sqlite")
+            self.backend = SQLiteBackend(path)
+        elif name == "memory":
+            self.backend = MemoryBackend()
+        elif name in ("null", "none", ""):
+            self.backend = NullBackend()
+        else:
+            raise ValueError(f"Unknown RATELIMIT_BACKEND {name!r}")
+        self.limits = {
+            endpoint: Limit.parse(spec) for endpoint, spec in app.config["RATELIMITS"].items() if spec
+        }
+        if (
+            app.config["RATELIMIT_ENABLED"]
+            and self.limits
+            and not isinstance(self.backend, NullBackend)
+            and app.config["PROXY_FIX_X_FOR"] is None
+        ):
+            # Behind a proxy every request comes from the proxy's address, so the per-IP
+            # buckets would be shared by all clients.
+            app.logger.warning(
+                "Rate limiting keys on client IPs but PROXY_FIX_X_FOR is not set; set it to the "
+                "number of reverse proxies in front of the app, or to 0 if clients connect directly."
+            )
+        app.before_request(self._check)
+
+    def _keys(self, endpoint: str) -> list[str]:
+        keys = [f"{endpoint}:ip:{request.remote_addr}"]
+        if current_user.is_authenticated:
+            keys.append(f"{endpoint}:user:{current_user.id}")
+        else:
+            email = request.form.get("email", "").strip().lower()
+            if email and _account_digest(email) not in session.get(_KNOWN_ACCOUNTS, ()):
+                keys.append(f"{endpoint}:account:{email}")
+        return keys
+
+    def _count(self, counter: dict[str, int], endpoint: str) -> None:
+        with self._lock:
+            counter[endpoint] = counter.get(endpoint, 0) + 1
+
+    def _check(self):
+        if request.method in _SAFE_METHODS or not current_app.config["RATELIMIT_ENABLED"]:
+            return None
+        limit = self.limits.get(request.endpoint)
+        if limit is None:
+            return None
+        allowed, retry_after = self.backend.take(self._keys(request.endpoint), limit, time.time())
+        if not allowed:
+            self._count(self.denied, request.endpoint)
+            raise TooManyRequests(retry_after=max(1, math.ceil(retry_after)))
+        self._count(self.allowed, request.endpoint)
+        return None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "backend": type(self.backend).__name__,
+                "limits": {endpoint: f"{limit.capacity}/{limit.period:g}s" for endpoint, limit in self.limits.items()},
+                "allowed": dict(self.allowed),
+                "denied": dict(self.denied),
+            }
+
+
+rate_limiter = RateLimiter()
+
+
+def _account_digest(email: str) -> str:
+    return hashlib.blake2b(email.strip().lower().encode(), digest_size=8).hexdigest()
+
+
+def remember_account(email: str) -> None:
+    """Exempt this browser from the address's bucket once it has proven it owns it."""
+    digest = _account_digest(email)
+    known = [item for item in session.get(_KNOWN_ACCOUNTS, []) if item != digest]
+    session[_KNOWN_ACCOUNTS] = [digest, *known][:_MAX_KNOWN_ACCOUNTS]
+
+
+def _hammer(backend, key: str, limit: Limit, attempts: int, start, results) -> None:
+    start.wait()
+    results.put(sum(backend.take([key], limit, time.time())[0] for _ in range(attempts)))
+
+
+def check_shared_limit(processes: int, attempts: int, capacity: int) -> tuple[int, float]:
+    """
+    Have `processes` forked workers race for one bucket of `capacity` tokens (refilling at
+    one per day) with `attempts` takes each. Returns how many takes were admitted, which is
+    exactly `capacity` when the backend is shared and atomic, and the elapsed seconds.
+    """
+    backend = rate_limiter.backend
+    if isinstance(backend, MemoryBackend):
+        raise ValueError("The memory backend is per process; there is nothing shared to check.")
+    key = f"ratelimit-check:{os.getpid()}:{time.time()}"
+    limit = Limit(capacity, 86400 * capacity)
+    context = multiprocessing.get_context("fork")
+    start = context.Event()
+    results = context.Queue()
+    workers = [
+        context.Process(target=_hammer, args=(backend, key, limit, attempts, start, results))
+        for _ in range(processes)
+    ]
+    for worker in workers:
+        worker.start()
+    began = time.perf_counter()
+    start.set()
+    admitted = sum(results.get() for _ in workers)
+    elapsed = time.perf_counter() - began
+    for worker in workers:
+        worker.join()
+    backend.reset(key)
+    return admitted, elapsed
@@ -0,0 +1,151 @@
+"""
+Read/write routing between the primary database and an optional read replica.
+
+With `DATABASE_REPLICA_URL` set, the replica is configured as the "replica" bind and
+`RoutingSession` sends the reads of views marked `@replica_reads` there: GET and HEAD only,
+never a flush, and never the user's identity or the cache generation counters (see
+`on_primary`). Everything else, including every POST, login and admin action, stays on
+the primary.
+
+Read-your-writes: after a successful unsafe request the session cookie records a deadline
+`REPLICA_STICKY_SECONDS` ahead, and until then that visitor reads from the primary, so a
+redirect after posting shows the new row even if the replica has not caught up.
+
+If connecting to the replica fails, the worker logs it, reads from the primary and does not
+try the replica again for `REPLICA_RETRY_SECONDS`. Failures after a connection is open are
+not retried.
+
+For local testing the replica can be a second SQLite file opened read-only
+(`sqlite:///file:/path/replica.db?mode=ro&uri=true`); `flask replica-sync` copies the
+primary onto it with SQLite's online backup.
+"""
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import g, has_request_context, request, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import DBAPIError
+
+REPLICA_BIND = "replica"
+STICKY_SESSION_KEY = "_primary_until"
+
+_SAFE_METHODS = frozenset({"GET", "HEAD"})
+
+
+class ReadReplica:
+    def __init__(self, sticky_seconds: float = 10.0, retry_seconds: float = 30.0):
+        self.sticky_seconds = sticky_seconds
+        self.retry_seconds = retry_seconds
+        self._down_until = 0.0
+        self._lock = threading.Lock()
+        self._logger = None
+
+    def init_app(self, app) -> None:
+        self.sticky_seconds = app.config["REPLICA_STICKY_SECONDS"]
+        self.retry_seconds = app.config["REPLICA_RETRY_SECONDS"]
+        self._down_until = 0.0
+        self._logger = app.logger
+        if app.config.get("SQLALCHEMY_BINDS", {}).get(REPLICA_BIND):
+            app.after_request(self._stick_after_write)
+
+    def available(self) -> bool:
+        return time.monotonic() >= self._down_until
+
+    def mark_down(self, error: Exception) -> None:
+        with self._lock:
+            self._down_until = time.monotonic() + self.retry_seconds
+        if self._logger is not None:
+            self._logger.warning(
+                "Read replica unavailable, using the primary for %ss: %s", self.retry_seconds, error
+            )
+
+    def _stick_after_write(self, response):
+        if request.method not in _SAFE_METHODS and response.status_code < 400:
+            session[STICKY_SESSION_KEY] = time.time() + self.sticky_seconds
+        return response
+
+    def engine_for(self, db_session: "RoutingSession"):
+        """The replica engine with a connection open in this session, or None to use the primary."""
+        engine = db_session._db.engines.get(REPLICA_BIND)
+        if engine is None or not self.available():
+            return None
+        try:
+            # Opens the replica connection on first use; later calls return it as is.
+            db_session.connection(bind_arguments={"bind": engine})
+        except DBAPIError as error:
+            self.mark_down(error)
+            return None
+        return engine
+
+
+replica = ReadReplica()
+
+
+def _sticky() -> bool:
+    return session.get(STICKY_SESSION_KEY, 0) > time.time()
+
+
+def replica_reads(view):
+    """Let a read-only view's queries go to the replica (GET and HEAD only)."""
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.replica_reads = request.method in _SAFE_METHODS and not _sticky()
+        return view(*args, **kwargs)
+
+    return wrapper
+
+
+@contextmanager
+def on_primary():
+    """Route the queries inside the block to the primary, also within a replica view."""
+    previous = has_request_context() and g.get("replica_reads", False)
+    if previous:
+        g.replica_reads = False
+    try:
+        yield
+    finally:
+        if previous:
+            g.replica_reads = True
+
+
+class RoutingSession(Session):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (
+            bind is None
+            and not self._flushing
+            and has_request_context()
+            and g.get("replica_reads", False)
+        ):
+            engine = replica.engine_for(self)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _sqlite_path(url) -> str:
+    url = make_url(url)
+    if url.get_backend_name() != "sqlite" or url.database in (None, "", ":memory:"):
+        raise ValueError(f"{url.render_as_string(hide_password=True)} is not an SQLite file")
+    path = url.database
+    if url.query.get("uri") and path.startswith("file:"):
+        path = path[len("file:"):]
+    return path
+
+
+def sync_sqlite_replica(primary_url, replica_url) -> None:
+    """Copy the primary SQLite database onto the replica file with the online backup API."""
+    source = sqlite3.connect(_sqlite_path(primary_url))
+    target = sqlite3.connect(_sqlite_path(replica_url))
+    try:
+        source.backup(target)
+        # The copy inherits the primary's WAL flag; read-only connections need a rollback
+        # journal, which they can read without creating -wal/-shm files.
+        target.execute("PRAGMA journal_mode=DELETE")
+    finally:
+        target.close()
+        source.close()
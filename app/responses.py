@@ -0,0 +1,160 @@
+"""
+Streamed page rendering and gzip/deflate response compression.
+
+With `STREAM_TEMPLATES` on, `render_page` streams the template instead of building the
+whole document first; Jinja's tiny output events are coalesced into `STREAM_CHUNK_SIZE`
+byte chunks so each write to the socket carries a useful amount of HTML.
+
+`compressor` compresses text responses after each request when the client accepts gzip
+or deflate. Buffered bodies are compressed only above `COMPRESS_MIN_SIZE` and only if that
+makes them smaller; streamed bodies are compressed on the fly with a sync flush every
+`STREAM_CHUNK_SIZE` input bytes, so the browser can start parsing before the page is done.
+Responses that are already encoded, served from files, or marked `no-transform` are left
+alone.
+"""
+import zlib
+from typing import Iterable, Iterator
+
+from flask import (
+    Response,
+    current_app,
+    get_flashed_messages,
+    render_template,
+    request,
+    stream_template,
+)
+
+DEFAULT_MIMETYPES = (
+    "text/html",
+    "text/css",
+    "text/plain",
+    "text/xml",
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "image/svg+xml",
+)
+
+# wbits per content-coding: 31 writes a gzip container, 15 the zlib stream HTTP calls "deflate".
+_WBITS = {"gzip": 31, "deflate": 15}
+
+
+def coalesce(chunks: Iterable[str], size: int) -> Iterator[str]:
+    buffer: list[str] = []
+    buffered = 0
+    try:
+        for chunk in chunks:
+            buffer.append(chunk)
+            buffered += len(chunk)
+            if buffered >= size:
+                yield "".join(buffer)
+                buffer, buffered = [], 0
+        if buffer:
+            yield "".join(buffer)
+    finally:
+        if hasattr(chunks, "close"):
+            chunks.close()
+
+
+def render_page(template_name: str, **context):
+    """`render_template`, or a streamed response when `STREAM_TEMPLATES` is enabled."""
+    config = current_app.config
+    if not config["STREAM_TEMPLATES"]:
+        return render_template(template_name, **context)
+    # The session cookie is written before the body streams, so consume flashes now; the
+    # template's own get_flashed_messages() call then reads them from the request cache.
+    get_flashed_messages()
+    return Response(
+        coalesce(stream_template(template_name, **context), config["STREAM_CHUNK_SIZE"]),
+        mimetype="text/html",
+    )
+
+
+class ResponseCompressor:
+    def __init__(self):
+        self.enabled = True
+        self.level = 6
+        self.min_size = 1024
+        self.flush_size = 8192
+        self.mimetypes = frozenset(DEFAULT_MIMETYPES)
+
+    def init_app(self, app) -> None:
+        config = app.config
+        self.enabled = config["COMPRESS_ENABLED"]
+        self.level = config["COMPRESS_LEVEL"]
+        self.min_size = config["COMPRESS_MIN_SIZE"]
+        self.flush_size = config["STREAM_CHUNK_SIZE"]
+        self.mimetypes = frozenset(config["COMPRESS_MIMETYPES"] or DEFAULT_MIMETYPES)
+        if self.enabled:
+            app.after_request(self.compress)
+
+    def _choose_encoding(self) -> str | None:
+        accepted = request.accept_encodings
+        for encoding in ("gzip", "deflate"):
+            if accepted[encoding]:
+                return encoding
+        return None
+
+    def _eligible(self, response: Response) -> bool:
+        return (
+            request.method != "HEAD"
+            and response.status_code == 200
+            and response.mimetype in self.mimetypes
+            and "Content-Encoding" not in response.headers
+            and not response.direct_passthrough
+            and not response.cache_control.no_transform
+        )
+
+    def compress(self, response: Response) -> Response:
+        if not self._eligible(response):
+            return response
+        if not response.is_streamed and (response.content_length or 0) < self.min_size:
+            return response
+        response.vary.add("Accept-Encoding")
+        encoding = self._choose_encoding()
+        if encoding is None:
+            return response
+
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, _WBITS[encoding])
+        if response.is_streamed:
+            response.response = self._stream(response, compressor)
+            response.headers.pop("Content-Length", None)
+        else:
+            data = response.get_data()
+            compressed = compressor.compress(data) + compressor.flush()
+            if len(compressed) >= len(data):
+                return response
+            response.set_data(compressed)
+        response.content_encoding = encoding
+        # The encoded body is a different representation; only a weak validator still holds.
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+
+    def _stream(self, response: Response, compressor) -> Iterator[bytes]:
+        original = response.response
+
+        def generate():
+            pending = 0
+            try:
+                for chunk in original:
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode()
+                    output = compressor.compress(chunk)
+                    pending += len(chunk)
+                    if pending >= self.flush_size:
+                        output += compressor.flush(zlib.Z_SYNC_FLUSH)
+                        pending = 0
+                    if output:
+                        yield output
+                yield compressor.flush()
+            finally:
+                # Closing the wrapped iterable ends stream_with_context's request context.
+                if hasattr(original, "close"):
+                    original.close()
+
+        return generate()
+
+
+compressor = ResponseCompressor()
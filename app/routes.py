@@ -1,10 +1,51 @@
-from flask import Blueprint, abort, flash, redirect, render_template, url_for, request
+import hmac
+
+from flask import (
+    Blueprint,
+    abort,
+    current_app,
+    flash,
+    g,
+    jsonify,
+    Response,
+    redirect,
+    render_template,
+    url_for,
+    request,
+)
 from flask_login import current_user, login_required, logout_user
 
 from app import db
 from app.forms import ArgumentForm, OpinionForm, ReasoningForm, ManageUserForm
 from app.models import Argument, Opinion, Reasoning, Stance, User
-from app.utils import render_markdown
+from app.pagination import keyset_paginate
+from app.http_cache import conditional_get
+from app.live import (
+    argument_channel,
+    broadcaster,
+    live_url,
+    opinion_channel,
+    publish_argument,
+    publish_reasoning,
+    stream_response,
+)
+from app.metrics import metrics
+from app.page_cache import page_cache
+from app.ranking import DEFAULT_SORT, SORTS
+from app.rate_limit import rate_limiter
+from app.replica import replica_reads
+from app.responses import render_page
+from app.queries import (
+    argument_freshness,
+    argument_page,
+    index_freshness,
+    index_page,
+    opinion_freshness,
+)
+from app.search import search
+from app.snapshots import load_snapshot
+from app.user_cache import invalidate_user
+from app.utils import markdown_renderer, render_markdown
 
 main_bp = Blueprint("main", __name__)
 
@@ -33,13 +74,21 @@ def admin_required():
 
 
 @main_bp.route("/")
+@replica_reads
+@conditional_get(index_freshness)
 def index():
-    opinions = (
-        Opinion.query.order_by(Opinion.created_at.desc())
-        .limit(50)
-        .all()
-    )
-    return render_template("index.html", opinions=opinions)
+    sort = request.args.get("sort", DEFAULT_SORT)
+
+    def render_grid():
+        context = index_page(
+            before=request.args.get("before"),
+            per_page=current_app.config["OPINIONS_PER_PAGE"],
+            sort=sort,
+        )
+        return render_template("_opinion_grid.html", **context)
+
+    grid_html = page_cache.fragment("index-grid", ["index"], render_grid)
+    return render_template("index.html", grid_html=grid_html, sort=sort, sorts=SORTS)
 
 
 @main_bp.route("/opinions/new", methods=["GET", "POST"])
@@ -50,39 +99,60 @@ def new_opinion():
         opinion = Opinion(
             title=form.title.data,
             content=form.content.data,
-            author=current_user,
+            user_id=current_user.id,
         )
         argument = Argument(
             content=form.first_argument_content.data,
             stance=Stance(form.first_argument_stance.data),
-            author=current_user,
+            user_id=current_user.id,
             opinion=opinion,
         )
         reasoning = Reasoning(
             content=form.first_reasoning_content.data,
-            author=current_user,
+            user_id=current_user.id,
             argument=argument,
         )
+        for item in (opinion, argument, reasoning):
+            item.render_content()
         db.session.add_all([opinion, argument, reasoning])
         db.session.commit()
+        page_cache.invalidate("index")
         flash("Opinion and first argument posted.", "success")
         return redirect(url_for("main.view_opinion", opinion_id=opinion.id))
     return render_template("opinions/new.html", form=form)
 
 
 @main_bp.route("/opinions/<int:opinion_id>")
+@replica_reads
+@conditional_get(opinion_freshness)
 def view_opinion(opinion_id):
-    opinion = Opinion.query.get_or_404(opinion_id)
-    arguments_for = Argument.query.filter_by(opinion_id=opinion_id, stance=Stance.FOR).all()
-    arguments_against = Argument.query.filter_by(opinion_id=opinion_id, stance=Stance.AGAINST).all()
-    return render_template(
-        "opinions/detail.html",
-        opinion=opinion,
-        arguments_for=arguments_for,
-        arguments_against=arguments_against,
+    opinion = load_snapshot(opinion_id)
+    columns = {"arguments_for": opinion.arguments_for, "arguments_against": opinion.arguments_against}
+    stream_url = live_url("main.opinion_live", opinion_id=opinion_id)
+    if current_app.config["STREAM_TEMPLATES"] and g.get("freshness_token") is None:
+        # Nothing will be cached for this reader, so stream the columns with the page.
+        return render_page(
+            "opinions/detail.html", opinion=opinion, columns_html=None, live_url=stream_url, **columns
+        )
+
+    def render_columns():
+        return render_template("opinions/_columns.html", opinion=opinion, **columns)
+
+    columns_html = page_cache.fragment(
+        "opinion-columns", [f"opinion:{opinion_id}"], render_columns
+    )
+    return render_page(
+        "opinions/detail.html", opinion=opinion, columns_html=columns_html, live_url=stream_url
     )
 
 
+@main_bp.route("/opinions/<int:opinion_id>/live")
+def opinion_live(opinion_id):
+    if db.session.get(Opinion, opinion_id) is None:
+        abort(404)
+    return stream_response(opinion_channel(opinion_id))
+
+
 @main_bp.route("/opinions/<int:opinion_id>/arguments/new", methods=["GET", "POST"])
 @login_required
 def new_argument(opinion_id):
@@ -96,20 +166,39 @@ def new_argument(opinion_id):
             content=form.content.data,
             stance=Stance(form.stance.data),
             opinion=opinion,
-            author=current_user,
+            user_id=current_user.id,
         )
+        argument.render_content()
         db.session.add(argument)
+        db.session.flush()
+        publish_argument(argument)
         db.session.commit()
+        page_cache.invalidate("index", f"opinion:{opinion_id}")
         flash("Argument added.", "success")
         return redirect(url_for("main.view_opinion", opinion_id=opinion_id))
     return render_template("arguments/new.html", form=form, opinion=opinion)
 
 
 @main_bp.route("/arguments/<int:argument_id>")
+@replica_reads
+@conditional_get(argument_freshness)
 def view_argument(argument_id):
-    argument = Argument.query.get_or_404(argument_id)
-    reasoning = Reasoning.query.filter_by(argument_id=argument_id).order_by(Reasoning.created_at.desc()).all()
-    return render_template("arguments/detail.html", argument=argument, reasoning=reasoning)
+    context = argument_page(
+        argument_id,
+        before=request.args.get("before"),
+        per_page=current_app.config["REASONING_PER_PAGE"],
+    )
+    # New reasoning goes on top, so only the first page follows the stream.
+    if context["page"].cursor is None:
+        context["live_url"] = live_url("main.argument_live", argument_id=argument_id)
+    return render_page("arguments/detail.html", **context)
+
+
+@main_bp.route("/arguments/<int:argument_id>/live")
+def argument_live(argument_id):
+    if db.session.get(Argument, argument_id) is None:
+        abort(404)
+    return stream_response(argument_channel(argument_id))
 
 
 @main_bp.route("/arguments/<int:argument_id>/reasoning/new", methods=["GET", "POST"])
@@ -118,14 +207,52 @@ def new_reasoning(argument_id):
     argument = Argument.query.get_or_404(argument_id)
     form = ReasoningForm()
     if form.validate_on_submit():
-        entry = Reasoning(content=form.content.data, argument=argument, author=current_user)
+        entry = Reasoning(content=form.content.data, argument=argument, user_id=current_user.id)
+        entry.render_content()
         db.session.add(entry)
+        db.session.flush()
+        publish_reasoning(entry)
         db.session.commit()
+        page_cache.invalidate(f"opinion:{argument.opinion_id}")
         flash("Reasoning added.", "success")
         return redirect(url_for("main.view_argument", argument_id=argument_id))
     return render_template("reasoning/new.html", form=form, argument=argument)
 
 
+@main_bp.route("/search")
+@replica_reads
+def search_view():
+    query = request.args.get("q", "")
+    page = request.args.get("page", 1, type=int)
+    return render_template("search.html", results=search(query, page=page))
+
+
+@main_bp.route("/admin/cache")
+@login_required
+def admin_cache_stats():
+    admin_required()
+    return jsonify(
+        page_cache=page_cache.stats(),
+        markdown=markdown_renderer.stats(),
+        rate_limits=rate_limiter.stats(),
+        live=broadcaster.stats(),
+    )
+
+
+@main_bp.route("/admin/metrics")
+def admin_metrics():
+    # Admins, or a scraper presenting METRICS_TOKEN as a bearer token.
+    token = current_app.config["METRICS_TOKEN"]
+    presented = request.headers.get("Authorization", "")
+    if not (token and hmac.compare_digest(presented.encode(), f"Bearer {token}".encode())):
+        if not current_user.is_authenticated:
+            return current_app.login_manager.unauthorized()
+        admin_required()
+    if not metrics.enabled:
+        abort(404)
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
 @main_bp.route("/admin/users", methods=["GET", "POST"])
 @login_required
 def admin_users():
@@ -156,8 +283,11 @@ def admin_users():
         else:
             flash("Unknown action.", "danger")
             return redirect(url_for("main.admin_users"))
+        invalidate_user(user.id)
         db.session.commit()
         return redirect(url_for("main.admin_users"))
 
-    users = User.query.order_by(User.created_at.desc()).all()
-    return render_template("admin/users.html", users=users, form=form)
+    page = keyset_paginate(
+        User.query, User, request.args.get("before"), current_app.config["ADMIN_USERS_PER_PAGE"]
+    )
+    return render_template("admin/users.html", users=page.items, page=page, form=form)
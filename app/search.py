@@ -0,0 +1,310 @@
+"""
+Full-text search over opinions, arguments and reasoning.
+
+On SQLite the `search_index` FTS5 table is kept in sync by triggers on the source tables;
+each row's rowid encodes its kind and source id so updates and deletes hit a single rowid.
+Other databases fall back to a LIKE scan, which is only suitable for small installs.
+"""
+import re
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+from flask import current_app
+from markupsafe import Markup, escape
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import OperationalError
+
+from app import db
+from app.models import Argument, Opinion, Reasoning
+
+FTS_TABLE = "search_index"
+
+_HL_START = "\x02"
+_HL_END = "\x03"
+
+# Control characters (NUL ends an FTS5 string early; \x02/\x03 are the highlight markers).
+_CONTROL = re.compile(r"[\x00-\x1f\x7f]")
+
+SQLITE_SCHEMA = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, body,
+        kind UNINDEXED, ref_id UNINDEXED, opinion_id UNINDEXED, argument_id UNINDEXED,
+        tokenize = 'porter unicode61'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS search_opinion_ai AFTER INSERT ON opinion BEGIN
+        INSERT INTO {FTS_TABLE} (rowid, title, body, kind, ref_id, opinion_id, argument_id)
+        VALUES (new.id * 4 + 1, new.title, new.content, 'opinion', new.id, new.id, NULL);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS search_opinion_au AFTER UPDATE OF title, content ON opinion BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id * 4 + 1;
+        INSERT INTO {FTS_TABLE} (rowid, title, body, kind, ref_id, opinion_id, argument_id)
+        VALUES (new.id * 4 + 1, new.title, new.content, 'opinion', new.id, new.id, NULL);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS search_opinion_ad AFTER DELETE ON opinion BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id * 4 + 1;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS search_argument_ai AFTER INSERT ON argument BEGIN
+        INSERT INTO {FTS_TABLE} (rowid, title, body, kind, ref_id, opinion_id, argument_id)
+        VALUES (new.id * 4 + 2, '', new.content, 'argument', new.id, new.opinion_id, new.id);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS search_argument_au AFTER UPDATE OF content ON argument BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id * 4 + 2;
+        INSERT INTO {FTS_TABLE} (rowid, title, body, kind, ref_id, opinion_id, argument_id)
+        VALUES (new.id * 4 + 2, '', new.content, 'argument', new.id, new.opinion_id, new.id);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS search_argument_ad AFTER DELETE ON argument BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id * 4 + 2;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS search_reasoning_ai AFTER INSERT ON reasoning BEGIN
+        INSERT INTO {FTS_TABLE} (rowid, title, body, kind, ref_id, opinion_id, argument_id)
+        VALUES (
+            new.id * 4 + 3, '', new.content, 'reasoning', new.id,
+            (SELECT opinion_id FROM argument WHERE argument.id = new.argument_id), new.argument_id
+        );
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS search_reasoning_au AFTER UPDATE OF content ON reasoning BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id * 4 + 3;
+        INSERT INTO {FTS_TABLE} (rowid, title, body, kind, ref_id, opinion_id, argument_id)
+        VALUES (
+            new.id * 4 + 3, '', new.content, 'reasoning', new.id,
+            (SELECT opinion_id FROM argument WHERE argument.id = new.argument_id), new.argument_id
+        );
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS search_reasoning_ad AFTER DELETE ON reasoning BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id * 4 + 3;
+    END
+    """,
+]
+
+TRIGGERS = [
+    f"search_{table}_{suffix}"
+    for table in ("opinion", "argument", "reasoning")
+    for suffix in ("ai", "au", "ad")
+]
+
+REBUILD_SQL = [
+    f"DELETE FROM {FTS_TABLE}",
+    f"""
+    INSERT INTO {FTS_TABLE} (rowid, title, body, kind, ref_id, opinion_id, argument_id)
+    SELECT id * 4 + 1, title, content, 'opinion', id, id, NULL FROM opinion
+    """,
+    f"""
+    INSERT INTO {FTS_TABLE} (rowid, title, body, kind, ref_id, opinion_id, argument_id)
+    SELECT id * 4 + 2, '', content, 'argument', id, opinion_id, id FROM argument
+    """,
+    f"""
+    INSERT INTO {FTS_TABLE} (rowid, title, body, kind, ref_id, opinion_id, argument_id)
+    SELECT reasoning.id * 4 + 3, '', reasoning.content, 'reasoning', reasoning.id,
+           argument.opinion_id, reasoning.argument_id
+    FROM reasoning JOIN argument ON argument.id = reasoning.argument_id
+    """,
+    f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')",
+]
+
+
+@dataclass
+class SearchResult:
+    kind: str
+    ref_id: int
+    opinion_id: int
+    argument_id: int | None
+    opinion_title: str
+    title_html: Markup
+    snippet_html: Markup
+
+
+@dataclass
+class SearchResults:
+    query: str
+    page: int
+    results: list[SearchResult]
+    has_next: bool
+    backend: str
+
+
+def fts_available() -> bool:
+    if db.engine.dialect.name != "sqlite":
+        return False
+    return inspect(db.engine).has_table(FTS_TABLE)
+
+
+def rebuild_index() -> int:
+    """(Re)create the FTS5 table and triggers, then repopulate it from the source tables."""
+    if db.engine.dialect.name != "sqlite":
+        raise RuntimeError("The full-text index requires SQLite with FTS5.")
+    with db.engine.begin() as connection:
+        for statement in SQLITE_SCHEMA + REBUILD_SQL:
+            connection.exec_driver_sql(statement)
+        return connection.exec_driver_sql(f"SELECT count(*) FROM {FTS_TABLE}").scalar()
+
+
+@contextmanager
+def bulk_load():
+    """
+    Drop the sync triggers while a bulk load runs and rebuild the whole index afterwards,
+    which is much cheaper than indexing row by row. No-op without the FTS5 index.
+    """
+    if not fts_available():
+        yield
+        return
+    with db.engine.begin() as connection:
+        for name in TRIGGERS:
+            connection.exec_driver_sql(f"DROP TRIGGER IF EXISTS {name}")
+    try:
+        yield
+    finally:
+        rebuild_index()
+
+
+def _match_expression(query: str) -> str:
+    # Quote every term so user input can never be parsed as FTS5 query syntax.
+    terms = ['"' + term.replace('"', '""') + '"' for term in query.split()]
+    return " ".join(terms)
+
+
+def _highlight(value: str) -> Markup:
+    html = str(escape(value)).replace(_HL_START, "<mark>").replace(_HL_END, "</mark>")
+    return Markup(html)
+
+
+def _opinion_titles(opinion_ids) -> dict[int, str]:
+    if not opinion_ids:
+        return {}
+    rows = db.session.query(Opinion.id, Opinion.title).filter(Opinion.id.in_(opinion_ids))
+    return dict(rows.all())
+
+
+def _search_fts(query: str, page: int, per_page: int) -> tuple[list[SearchResult], bool]:
+    try:
+        rows = db.session.execute(
+            text(
+                f"""
+                SELECT kind, ref_id, opinion_id, argument_id,
+                       highlight({FTS_TABLE}, 0, :hl_start, :hl_end) AS title_hl,
+                       snippet({FTS_TABLE}, 1, :hl_start, :hl_end, '…', 24) AS body_hl
+                FROM {FTS_TABLE}
+                WHERE {FTS_TABLE} MATCH :match
+                ORDER BY bm25({FTS_TABLE}, 5.0, 1.0)
+                LIMIT :limit OFFSET :offset
+                """
+            ),
+            {
+                "match": _match_expression(query),
+                "hl_start": _HL_START,
+                "hl_end": _HL_END,
+                "limit": per_page + 1,
+                "offset": (page - 1) * per_page,
+            },
+        ).all()
+    except OperationalError:
+        # Terms are quoted, so this should not happen; a bad query finds nothing, not a 500.
+        current_app.logger.warning("FTS5 rejected search query %r", query, exc_info=True)
+        db.session.rollback()
+        return [], False
+    titles = _opinion_titles({row.opinion_id for row in rows[:per_page]})
+    results = [
+        SearchResult(
+            kind=row.kind,
+            ref_id=row.ref_id,
+            opinion_id=row.opinion_id,
+            argument_id=row.argument_id,
+            opinion_title=titles.get(row.opinion_id, ""),
+            title_html=_highlight(row.title_hl or ""),
+            snippet_html=_highlight(row.body_hl or ""),
+        )
+        for row in rows[:per_page]
+    ]
+    return results, len(rows) > per_page
+
+
+def _plain_snippet(content: str, terms: list[str], width: int = 160) -> Markup:
+    lowered = content.lower()
+    start = min((lowered.find(term) for term in terms if term in lowered), default=0)
+    start = max(start - width // 4, 0)
+    html = str(escape(content[start : start + width]))
+    for term in terms:
+        pattern = re.compile(re.escape(str(escape(term))), re.IGNORECASE)
+        html = pattern.sub(lambda match: f"<mark>{match.group(0)}</mark>", html)
+    prefix = "…" if start else ""
+    suffix = "…" if start + width < len(content) else ""
+    return Markup(prefix + html + suffix)
+
+
+def _escape_like(term: str) -> str:
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _search_like(query: str, page: int, per_page: int) -> tuple[list[SearchResult], bool]:
+    terms = [term.lower() for term in query.split()]
+    limit = page * per_page + 1
+    candidates = []
+    sources = [
+        ("opinion", Opinion, [Opinion.title, Opinion.content]),
+        ("argument", Argument, [Argument.content]),
+        ("reasoning", Reasoning, [Reasoning.content]),
+    ]
+    for kind, model, columns in sources:
+        filters = [
+            db.or_(*(column.ilike(f"%{_escape_like(term)}%", escape="\\") for column in columns))
+            for term in terms
+        ]
+        rows = model.query.filter(*filters).order_by(model.created_at.desc()).limit(limit).all()
+        candidates.extend((row.created_at, kind, row) for row in rows)
+    candidates.sort(key=lambda item: item[0], reverse=True)
+    window = candidates[(page - 1) * per_page : page * per_page + 1]
+
+    results = []
+    for _, kind, row in window[:per_page]:
+        if kind == "opinion":
+            opinion_id, argument_id, title = row.id, None, row.title
+        elif kind == "argument":
+            opinion_id, argument_id, title = row.opinion_id, row.id, ""
+        else:
+            opinion_id, argument_id, title = row.argument.opinion_id, row.argument_id, ""
+        results.append(
+            SearchResult(
+                kind=kind,
+                ref_id=row.id,
+                opinion_id=opinion_id,
+                argument_id=argument_id,
+                opinion_title="",
+                title_html=_plain_snippet(title, terms) if title else Markup(""),
+                snippet_html=_plain_snippet(row.content, terms),
+            )
+        )
+    titles = _opinion_titles({result.opinion_id for result in results})
+    for result in results:
+        result.opinion_title = titles.get(result.opinion_id, "")
+    return results, len(window) > per_page
+
+
+def search(query: str, page: int = 1, per_page: int | None = None) -> SearchResults:
+    query = _CONTROL.sub(" ", query).strip()
+    page = max(page, 1)
+    per_page = per_page or current_app.config["SEARCH_RESULTS_PER_PAGE"]
+    if not query.split():
+        return SearchResults(query, page, [], False, "none")
+    if fts_available():
+        results, has_next = _search_fts(query, page, per_page)
+        return SearchResults(query, page, results, has_next, "fts5")
+    results, has_next = _search_like(query, page, per_page)
+    return SearchResults(query, page, results, has_next, "like")
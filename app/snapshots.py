@@ -0,0 +1,414 @@
+"""
+Materialized opinion pages.
+
+`opinion_snapshot` holds one compact JSON document per opinion with everything the detail
+page shows: the opinion's title, rendered HTML, author name and counters, and its
+arguments split by stance with their rendered HTML, author names and reasoning counts.
+`view_opinion` reads it with a single primary-key lookup instead of assembling the tree.
+
+The document is kept current by the mapper events below, in the same transaction as the
+write: adding or removing an argument or reasoning patches the stored document rather than
+rebuilding it. Every such write bumps `Opinion.version` first, so a snapshot is patched
+only when it is exactly one version behind; if it is missing, further behind or rendered
+with an older `RENDERER_VERSION` it is rebuilt from the live tables instead. Readers treat
+a snapshot whose version differs from the opinion's as stale and fall back to the live
+tables, so Core writes that bypass the events (bulk import, counter repairs) never serve
+outdated pages. `flask check-snapshots` compares every snapshot with the live tables.
+"""
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Iterable
+
+from flask import abort
+from sqlalchemy import event, select
+
+from app import db
+from app.models import Argument, Opinion, OpinionSnapshot, Reasoning, Stance, User
+from app.utils import RENDERER_VERSION, markdown_renderer
+
+
+@dataclass
+class ArgumentEntry:
+    id: int
+    stance: Stance
+    author_name: str
+    created_at: datetime | None
+    rendered_html: str
+    reasoning_count: int
+
+
+@dataclass
+class OpinionDocument:
+    """The detail page's view of an opinion, as decoded from its snapshot."""
+
+    id: int
+    title: str
+    author_name: str
+    created_at: datetime | None
+    rendered_html: str
+    for_count: int
+    against_count: int
+    reasoning_count: int
+    arguments_for: list[ArgumentEntry]
+    arguments_against: list[ArgumentEntry]
+
+
+@dataclass
+class SnapshotDrift:
+    opinion_id: int
+    problem: str
+
+
+def _timestamp(value: datetime | None) -> str | None:
+    return value.isoformat() if value is not None else None
+
+
+def _parse_timestamp(value: str | None) -> datetime | None:
+    return datetime.fromisoformat(value) if value is not None else None
+
+
+def _argument_entry(argument_id: int, author: str, created_at, html: str, reasoning_count: int) -> dict:
+    return {
+        "id": argument_id,
+        "author": author,
+        "created_at": _timestamp(created_at),
+        "content_html": html,
+        "reasoning_count": reasoning_count,
+    }
+
+
+def build_documents(connection, opinion_ids: Iterable[int]) -> dict[int, tuple[int, dict]]:
+    """Assemble documents from the live tables; returns `{opinion_id: (version, document)}`."""
+    ids = list(opinion_ids)
+    if not ids:
+        return {}
+    opinion, argument, user = Opinion.__table__, Argument.__table__, User.__table__
+    opinion_rows = connection.execute(
+        select(
+            opinion.c.id,
+            opinion.c.title,
+            opinion.c.content,
+            opinion.c.content_html,
+            opinion.c.created_at,
+            opinion.c.for_count,
+            opinion.c.against_count,
+            opinion.c.version,
+            user.c.username.label("author"),
+        )
+        .join(user, user.c.id == opinion.c.user_id)
+        .where(opinion.c.id.in_(ids))
+    ).all()
+    argument_rows = connection.execute(
+        select(
+            argument.c.id,
+            argument.c.opinion_id,
+            argument.c.stance,
+            argument.c.content,
+            argument.c.content_html,
+            argument.c.created_at,
+            argument.c.reasoning_count,
+            user.c.username.label("author"),
+        )
+        .join(user, user.c.id == argument.c.user_id)
+        .where(argument.c.opinion_id.in_(ids))
+        .order_by(argument.c.opinion_id, argument.c.stance, argument.c.created_at, argument.c.id)
+    ).all()
+
+    # Rows that predate stored rendering are rendered in one batch.
+    pending = [("opinion", row) for row in opinion_rows if row.content_html is None]
+    pending += [("argument", row) for row in argument_rows if row.content_html is None]
+    htmls = markdown_renderer.render_many(row.content for _, row in pending)
+    rendered = {(kind, row.id): html for (kind, row), html in zip(pending, htmls)}
+
+    def html(kind: str, row) -> str:
+        return row.content_html if row.content_html is not None else rendered[(kind, row.id)]
+
+    documents: dict[int, tuple[int, dict]] = {}
+    for row in opinion_rows:
+        documents[row.id] = (row.version, {
+            "opinion": {
+                "id": row.id,
+                "title": row.title,
+                "author": row.author,
+                "created_at": _timestamp(row.created_at),
+                "content_html": html("opinion", row),
+                "for_count": row.for_count,
+                "against_count": row.against_count,
+                "reasoning_count": 0,
+            },
+            "arguments": {Stance.FOR.value: [], Stance.AGAINST.value: []},
+        })
+    for row in argument_rows:
+        document = documents[row.opinion_id][1]
+        document["arguments"][row.stance.value].append(_argument_entry(
+            row.id, row.author, row.created_at, html("argument", row), row.reasoning_count
+        ))
+        document["opinion"]["reasoning_count"] += row.reasoning_count
+    return documents
+
+
+def _encode(document: dict) -> str:
+    return json.dumps(document, ensure_ascii=False, separators=(",", ":"))
+
+
+def decode(document: dict) -> OpinionDocument:
+    opinion = document["opinion"]
+
+    def entries(stance: Stance) -> list[ArgumentEntry]:
+        return [
+            ArgumentEntry(
+                id=item["id"],
+                stance=stance,
+                author_name=item["author"],
+                created_at=_parse_timestamp(item["created_at"]),
+                rendered_html=item["content_html"],
+                reasoning_count=item["reasoning_count"],
+            )
+            for item in document["arguments"][stance.value]
+        ]
+
+    return OpinionDocument(
+        id=opinion["id"],
+        title=opinion["title"],
+        author_name=opinion["author"],
+        created_at=_parse_timestamp(opinion["created_at"]),
+        rendered_html=opinion["content_html"],
+        for_count=opinion["for_count"],
+        against_count=opinion["against_count"],
+        reasoning_count=opinion["reasoning_count"],
+        arguments_for=entries(Stance.FOR),
+        arguments_against=entries(Stance.AGAINST),
+    )
+
+
+def _snapshot_select(opinion_id: int):
+    # Both sides are primary-key lookups.
+    snapshot, opinion = OpinionSnapshot.__table__, Opinion.__table__
+    return (
+        select(
+            opinion.c.version,
+            snapshot.c.version.label("snapshot_version"),
+            snapshot.c.render_version,
+            snapshot.c.document,
+        )
+        .select_from(opinion.outerjoin(snapshot, snapshot.c.opinion_id == opinion.c.id))
+        .where(opinion.c.id == opinion_id)
+    )
+
+
+def load_snapshot(opinion_id: int) -> OpinionDocument:
+    """The opinion's snapshot, or the same document built from the live tables if it is stale."""
+    row = db.session.execute(_snapshot_select(opinion_id)).first()
+    if row is None:
+        abort(404)
+    if row.snapshot_version == row.version and row.render_version == RENDERER_VERSION:
+        return decode(json.loads(row.document))
+    documents = build_documents(db.session.connection(), [opinion_id])
+    return decode(documents[opinion_id][1])
+
+
+def _write(connection, opinion_id: int, version: int, document: dict, exists: bool) -> None:
+    table = OpinionSnapshot.__table__
+    values = {"version": version, "render_version": RENDERER_VERSION, "document": _encode(document)}
+    if exists:
+        connection.execute(table.update().where(table.c.opinion_id == opinion_id).values(values))
+    else:
+        connection.execute(table.insert().values(opinion_id=opinion_id, **values))
+
+
+def refresh_snapshots(opinion_ids: Iterable[int], connection=None) -> int:
+    """Rebuild the snapshots of the given opinions from the live tables."""
+    connection = connection or db.session.connection()
+    table = OpinionSnapshot.__table__
+    documents = build_documents(connection, opinion_ids)
+    if not documents:
+        return 0
+    connection.execute(table.delete().where(table.c.opinion_id.in_(list(documents))))
+    connection.execute(
+        table.insert(),
+        [
+            {
+                "opinion_id": opinion_id,
+                "version": version,
+                "render_version": RENDERER_VERSION,
+                "document": _encode(document),
+            }
+            for opinion_id, (version, document) in documents.items()
+        ],
+    )
+    return len(documents)
+
+
+def _patch(connection, opinion_id: int, change: Callable[[dict], None] | None) -> None:
+    """
+    Apply `change` to the stored document after a write that bumped the opinion's version,
+    or rebuild the document when there is nothing current to patch. The version bump
+    already holds the opinion's row lock, so concurrent writers patch one after another.
+    """
+    row = connection.execute(_snapshot_select(opinion_id)).first()
+    if row is None:
+        return
+    exists = row.document is not None
+    if (
+        change is None
+        or not exists
+        or row.snapshot_version != row.version - 1
+        or row.render_version != RENDERER_VERSION
+    ):
+        version, document = build_documents(connection, [opinion_id])[opinion_id]
+    else:
+        version, document = row.version, json.loads(row.document)
+        change(document)
+    _write(connection, opinion_id, version, document, exists)
+
+
+def _find_argument(document: dict, argument_id: int) -> dict | None:
+    for entries in document["arguments"].values():
+        for entry in entries:
+            if entry["id"] == argument_id:
+                return entry
+    return None
+
+
+def _owning_opinion(connection, argument_id: int) -> int | None:
+    table = Argument.__table__
+    return connection.execute(select(table.c.opinion_id).where(table.c.id == argument_id)).scalar()
+
+
+@event.listens_for(Opinion, "after_insert")
+def _opinion_inserted(mapper, connection, target):
+    _patch(connection, target.id, None)
+
+
+@event.listens_for(Opinion, "after_update")
+def _opinion_updated(mapper, connection, target):
+    state = db.inspect(target)
+    if not (state.attrs.title.history.has_changes() or state.attrs.content.history.has_changes()):
+        return
+
+    def change(document):
+        document["opinion"]["title"] = target.title
+        document["opinion"]["content_html"] = target.rendered_html
+
+    _patch(connection, target.id, change)
+
+
+@event.listens_for(Opinion, "before_delete")
+def _opinion_deleted(mapper, connection, target):
+    table = OpinionSnapshot.__table__
+    connection.execute(table.delete().where(table.c.opinion_id == target.id))
+
+
+# Registered after the counter listeners in app.models, so the opinion's version and
+# counters are already updated when these run.
+@event.listens_for(Argument, "after_insert")
+def _argument_inserted(mapper, connection, target):
+    user = User.__table__
+    author = connection.execute(select(user.c.username).where(user.c.id == target.user_id)).scalar()
+
+    def change(document):
+        entries = document["arguments"][target.stance.value]
+        entries.append(_argument_entry(
+            target.id, author, target.created_at, target.rendered_html, target.reasoning_count or 0
+        ))
+        entries.sort(key=lambda entry: (entry["created_at"] or "", entry["id"]))
+        document["opinion"][f"{target.stance.value}_count"] += 1
+        document["opinion"]["reasoning_count"] += target.reasoning_count or 0
+
+    _patch(connection, target.opinion_id, change)
+
+
+@event.listens_for(Argument, "after_delete")
+def _argument_deleted(mapper, connection, target):
+    def change(document):
+        entry = _find_argument(document, target.id)
+        document["arguments"][target.stance.value] = [
+            item for item in document["arguments"][target.stance.value] if item["id"] != target.id
+        ]
+        document["opinion"][f"{target.stance.value}_count"] -= 1
+        if entry is not None:
+            document["opinion"]["reasoning_count"] -= entry["reasoning_count"]
+
+    _patch(connection, target.opinion_id, change)
+
+
+def _reasoning_changed(connection, target, delta: int) -> None:
+    opinion_id = _owning_opinion(connection, target.argument_id)
+    if opinion_id is None:
+        return
+
+    def change(document):
+        entry = _find_argument(document, target.argument_id)
+        if entry is not None:
+            entry["reasoning_count"] += delta
+        document["opinion"]["reasoning_count"] += delta
+
+    _patch(connection, opinion_id, change)
+
+
+@event.listens_for(Reasoning, "after_insert")
+def _reasoning_inserted(mapper, connection, target):
+    _reasoning_changed(connection, target, 1)
+
+
+@event.listens_for(Reasoning, "after_delete")
+def _reasoning_deleted(mapper, connection, target):
+    _reasoning_changed(connection, target, -1)
+
+
+def stale_snapshot_ids() -> list[int]:
+    """Opinions whose snapshot is missing, behind the opinion or rendered by an older renderer."""
+    snapshot = OpinionSnapshot.__table__
+    return db.session.execute(
+        select(Opinion.id)
+        .outerjoin(snapshot, snapshot.c.opinion_id == Opinion.id)
+        .where(
+            db.or_(
+                snapshot.c.opinion_id.is_(None),
+                snapshot.c.version != Opinion.version,
+                snapshot.c.render_version != RENDERER_VERSION,
+            )
+        )
+        .order_by(Opinion.id)
+    ).scalars().all()
+
+
+def find_snapshot_drift(batch_size: int = 500) -> list[SnapshotDrift]:
+    """Compare every stored snapshot with a document built from the live tables."""
+    drift: list[SnapshotDrift] = []
+    connection = db.session.connection()
+    table = OpinionSnapshot.__table__
+    last_id = 0
+    while True:
+        ids = db.session.execute(
+            select(Opinion.id).where(Opinion.id > last_id).order_by(Opinion.id).limit(batch_size)
+        ).scalars().all()
+        if not ids:
+            break
+        last_id = ids[-1]
+        live = build_documents(connection, ids)
+        stored = {
+            row.opinion_id: row
+            for row in connection.execute(select(table).where(table.c.opinion_id.in_(ids)))
+        }
+        for opinion_id in ids:
+            row = stored.get(opinion_id)
+            version, document = live[opinion_id]
+            if row is None:
+                drift.append(SnapshotDrift(opinion_id, "missing"))
+            elif row.render_version != RENDERER_VERSION:
+                drift.append(SnapshotDrift(opinion_id, f"rendered with version {row.render_version}"))
+            elif row.version != version:
+                drift.append(SnapshotDrift(opinion_id, f"at version {row.version}, opinion is at {version}"))
+            elif json.loads(row.document) != document:
+                drift.append(SnapshotDrift(opinion_id, "content differs from the live tables"))
+    return drift
+
+
+def refresh_in_batches(opinion_ids: list[int], batch_size: int = 500) -> None:
+    """Rebuild many snapshots, committing after each batch."""
+    ids = list(opinion_ids)
+    for start in range(0, len(ids), batch_size):
+        refresh_snapshots(ids[start:start + batch_size])
+        db.session.commit()
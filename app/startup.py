@@ -0,0 +1,121 @@
+"""
+Startup cost: factory phase timings, `flask startup-profile` and preload warm-up.
+
+`create_app` records how long each of its phases took in `app.extensions["startup_timings"]`.
+`profile_startup` builds the app in a fresh interpreter under `python -X importtime`, so the
+report shows cold import costs per package next to the factory phases, plus which of the
+lazily loaded libraries (Alembic, Flask-Mail, markdown2, bleach) were imported anyway.
+
+Under gunicorn with `preload_app` (see `gunicorn.conf.py`) the master calls `warm_up` once
+before forking, so workers inherit the imported libraries, the Markdown converter and the
+compiled templates instead of each building their own.
+"""
+import json
+import subprocess
+import sys
+import time
+from dataclasses import dataclass
+
+from flask import Flask
+
+# Libraries that create_app defers; a profile listing one of them as loaded means a
+# top-level import crept back in.
+LAZY_MODULES = ("flask_migrate", "alembic", "flask_mail", "markdown2", "bleach")
+
+_PROFILE_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app()
+created = time.perf_counter()
+print(json.dumps({
+    "import_s": imported - start,
+    "factory_s": created - imported,
+    "phases": app.extensions["startup_timings"],
+    "modules": sorted(sys.modules),
+}))
+"""
+
+
+class StartupTimer:
+    def __init__(self):
+        self.phases: dict[str, float] = {}
+        self._last = time.perf_counter()
+
+    def mark(self, phase: str) -> None:
+        now = time.perf_counter()
+        self.phases[phase] = now - self._last
+        self._last = now
+
+
+@dataclass
+class ImportTiming:
+    module: str
+    self_us: int
+    cumulative_us: int
+
+
+@dataclass
+class StartupProfile:
+    import_s: float
+    factory_s: float
+    phases: dict[str, float]
+    imports: list[ImportTiming]
+    modules: list[str]
+
+    def by_package(self) -> list[tuple[str, int]]:
+        """Self time per top-level package in microseconds, largest first."""
+        totals: dict[str, int] = {}
+        for timing in self.imports:
+            package = timing.module.split(".")[0]
+            totals[package] = totals.get(package, 0) + timing.self_us
+        return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+
+    def lazy_loaded(self) -> list[str]:
+        loaded = set(self.modules)
+        return [name for name in LAZY_MODULES if name in loaded]
+
+
+def parse_importtime(output: str) -> list[ImportTiming]:
+    timings = []
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        if not self_us.strip().isdigit():
+            continue  # the column header
+        timings.append(ImportTiming(module.strip(), int(self_us), int(cumulative_us)))
+    return timings
+
+
+def profile_startup(project_dir: str) -> StartupProfile:
+    """Import the app package and run create_app in a fresh interpreter and time both."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _PROFILE_SCRIPT],
+        cwd=project_dir,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        lines = result.stderr.strip().splitlines()
+        raise RuntimeError(lines[-1] if lines else f"exit status {result.returncode}")
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    return StartupProfile(
+        import_s=report["import_s"],
+        factory_s=report["factory_s"],
+        phases=report["phases"],
+        imports=parse_importtime(result.stderr),
+        modules=report["modules"],
+    )
+
+
+def warm_up(app: Flask) -> None:
+    """Do the lazily deferred work up front, for a master process that forks workers."""
+    import flask_mail  # noqa: F401 - imported for the workers, which send confirmation mail
+
+    from app.utils import markdown_renderer
+
+    markdown_renderer.warm_up()
+    for name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(name)
@@ -0,0 +1,30 @@
+// Follows a page's event stream (see app/live.py) and inserts new arguments and reasoning.
+(function () {
+    var root = document.querySelector("[data-live-url]");
+    if (!root || !window.EventSource) {
+        return;
+    }
+
+    function insert(column, id, html, atTop) {
+        if (!column || document.getElementById(id)) {
+            return;  // Not on this page, or already rendered with it.
+        }
+        var placeholder = column.querySelector(":scope > .muted");
+        if (placeholder) {
+            placeholder.remove();
+        }
+        column.insertAdjacentHTML(atTop ? "afterbegin" : "beforeend", html);
+    }
+
+    var source = new EventSource(root.getAttribute("data-live-url"));
+    source.addEventListener("argument", function (event) {
+        var data = JSON.parse(event.data);
+        var column = document.querySelector('[data-live-column="' + data.side + '"]');
+        insert(column, "argument-" + data.id, data.html, false);
+    });
+    source.addEventListener("reasoning", function (event) {
+        var data = JSON.parse(event.data);
+        var column = document.querySelector('[data-live-column="reasoning"]');
+        insert(column, "reasoning-" + data.id, data.html, true);
+    });
+})();
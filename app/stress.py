@@ -0,0 +1,176 @@
+"""
+Concurrency stress run for `flask db-stress`.
+
+Writer and reader processes hit the configured database the way gunicorn workers would:
+each builds its own app with `create_app()`. Writers add reasoning to a dedicated "[stress]"
+opinion inside a POST request context (so they take the same transaction path as real
+posts); readers fetch that opinion's page through the test client. Each process reports its
+latencies and how many operations failed with "database is locked" / "busy".
+"""
+import multiprocessing
+import secrets
+import time
+from dataclasses import dataclass, field
+
+from sqlalchemy.exc import OperationalError
+
+from app import db
+from app.benchmark import percentile
+from app.models import Argument, Opinion, Reasoning, Stance, User
+from app.utils import markdown_renderer
+
+STRESS_USERNAME = "stress-bot"
+STRESS_TITLE = "[stress] concurrency test"
+
+
+@dataclass
+class RoleReport:
+    role: str
+    ops: int = 0
+    lock_errors: int = 0
+    other_errors: int = 0
+    latencies: list[float] = field(default_factory=list)
+
+    def merge(self, other: "RoleReport") -> None:
+        self.ops += other.ops
+        self.lock_errors += other.lock_errors
+        self.other_errors += other.other_errors
+        self.latencies.extend(other.latencies)
+
+    def percentile(self, fraction: float) -> float:
+        return percentile(self.latencies, fraction)
+
+
+def prepare_target() -> tuple[int, int]:
+    """Create (or reuse) the stress user, opinion and argument; returns their ids."""
+    user = User.query.filter_by(username=STRESS_USERNAME).first()
+    if user is None:
+        user = User(email="stress-bot@localhost.invalid", username=STRESS_USERNAME, confirmed=True)
+        user.set_password(secrets.token_urlsafe(32))
+        db.session.add(user)
+        db.session.flush()
+    opinion = Opinion.query.filter_by(title=STRESS_TITLE, user_id=user.id).first()
+    if opinion is None:
+        opinion = Opinion(title=STRESS_TITLE, content="Load generated by `flask db-stress`.", user_id=user.id)
+        opinion.render_content()
+        db.session.add(opinion)
+        db.session.flush()
+    argument = Argument.query.filter_by(opinion_id=opinion.id).first()
+    if argument is None:
+        argument = Argument(content="Stress argument.", stance=Stance.FOR, opinion_id=opinion.id, user_id=user.id)
+        argument.render_content()
+        db.session.add(argument)
+    db.session.commit()
+    return opinion.id, argument.id
+
+
+def cleanup_target() -> int:
+    """Delete everything `prepare_target` and the writers created; returns reasoning removed."""
+    user = User.query.filter_by(username=STRESS_USERNAME).first()
+    if user is None:
+        return 0
+    removed = Reasoning.query.filter_by(user_id=user.id).count()
+    for opinion in Opinion.query.filter_by(user_id=user.id).all():
+        db.session.delete(opinion)
+    db.session.flush()
+    db.session.delete(user)
+    db.session.commit()
+    return removed
+
+
+def _is_lock_error(exc: OperationalError) -> bool:
+    message = str(exc.orig).lower()
+    return "locked" in message or "busy" in message
+
+
+def _writer(app, opinion_id: int, argument_id: int, deadline: float, report: RoleReport) -> None:
+    from app.page_cache import page_cache
+
+    user_id = User.query.filter_by(username=STRESS_USERNAME).one().id
+    db.session.remove()
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        with app.test_request_context("/stress", method="POST"):
+            try:
+                reasoning = Reasoning(
+                    content=f"Stress reasoning {secrets.token_hex(4)}",
+                    argument_id=argument_id,
+                    user_id=user_id,
+                )
+                reasoning.render_content()
+                db.session.add(reasoning)
+                db.session.commit()
+                page_cache.invalidate(f"opinion:{opinion_id}", "index")
+            except OperationalError as exc:
+                db.session.rollback()
+                if _is_lock_error(exc):
+                    report.lock_errors += 1
+                else:
+                    report.other_errors += 1
+                continue
+            finally:
+                db.session.remove()
+        report.ops += 1
+        report.latencies.append(time.perf_counter() - started)
+
+
+def _reader(app, opinion_id: int, deadline: float, report: RoleReport) -> None:
+    client = app.test_client()
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            response = client.get(f"/opinions/{opinion_id}")
+        except OperationalError as exc:
+            if _is_lock_error(exc):
+                report.lock_errors += 1
+            else:
+                report.other_errors += 1
+            continue
+        if response.status_code != 200:
+            report.other_errors += 1
+            continue
+        report.ops += 1
+        report.latencies.append(time.perf_counter() - started)
+
+
+def _worker(role: str, opinion_id: int, argument_id: int, duration: float, results) -> None:
+    from app import create_app
+
+    app = create_app()
+    # Like a gunicorn worker (see gunicorn.conf.py), start the Markdown pool before timing.
+    markdown_renderer.start()
+    report = RoleReport(role)
+    deadline = time.perf_counter() + duration
+    with app.app_context():
+        if role == "writer":
+            _writer(app, opinion_id, argument_id, deadline, report)
+        else:
+            _reader(app, opinion_id, deadline, report)
+    results.put(report)
+    # multiprocessing joins the Markdown pool's processes when this child exits.
+    markdown_renderer.shutdown()
+
+
+def run_stress(writers: int, readers: int, duration: float) -> dict[str, RoleReport]:
+    """Run the workers in separate processes and merge their reports by role."""
+    opinion_id, argument_id = prepare_target()
+    # Children build their own engines; never share pooled connections across fork.
+    db.session.remove()
+    db.engine.dispose()
+
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    roles = ["writer"] * writers + ["reader"] * readers
+    processes = [
+        context.Process(target=_worker, args=(role, opinion_id, argument_id, duration, results))
+        for role in roles
+    ]
+    for process in processes:
+        process.start()
+    reports = {role: RoleReport(role) for role in ("writer", "reader")}
+    for _ in processes:
+        report = results.get()
+        reports[report.role].merge(report)
+    for process in processes:
+        process.join()
+    return reports
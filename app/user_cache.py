@@ -0,0 +1,123 @@
+"""
+Per-process cache of the identity fields every request needs for the signed-in user.
+
+Entries expire after `USER_CACHE_TTL` seconds. Admin actions bump the "users" row in
+`cache_generation`; each worker re-reads that counter at most every
+`USER_CACHE_GENERATION_INTERVAL` seconds and drops its cache when it has moved, so a
+block or demotion takes effect everywhere within that interval.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from app import db
+from app.models import CacheGeneration, User
+from app.replica import on_primary
+
+GENERATION_NAME = "users"
+
+
+class CachedUser:
+    """Lightweight stand-in for `User` as `current_user`; not attached to any session."""
+
+    __slots__ = ("id", "username", "is_admin", "is_blocked", "confirmed")
+
+    is_authenticated = True
+    is_active = True
+    is_anonymous = False
+
+    def __init__(self, id: int, username: str, is_admin: bool, is_blocked: bool, confirmed: bool):
+        self.id = id
+        self.username = username
+        self.is_admin = bool(is_admin)
+        self.is_blocked = bool(is_blocked)
+        self.confirmed = bool(confirmed)
+
+    def get_id(self) -> str:
+        return str(self.id)
+
+    def __repr__(self) -> str:
+        return f"<CachedUser {self.username}>"
+
+
+class UserIdentityCache:
+    def __init__(self, ttl: float = 60.0, generation_interval: float = 2.0, maxsize: int = 10000):
+        self.ttl = ttl
+        self.generation_interval = generation_interval
+        self.maxsize = maxsize
+        self._entries: OrderedDict[int, tuple[float, CachedUser]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation: int | None = None
+        self._generation_checked_at = 0.0
+        self._pid = os.getpid()
+
+    def init_app(self, app) -> None:
+        self.ttl = app.config["USER_CACHE_TTL"]
+        self.generation_interval = app.config["USER_CACHE_GENERATION_INTERVAL"]
+        self.maxsize = app.config["USER_CACHE_SIZE"]
+        self.clear()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._generation = None
+            self._generation_checked_at = 0.0
+
+    def invalidate(self, user_id: int) -> None:
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def _sync_generation(self, now: float) -> None:
+        if os.getpid() != self._pid:
+            # Forked from a preloaded master: nothing inherited can be trusted.
+            self._pid = os.getpid()
+            self.clear()
+        if self._generation is not None and now - self._generation_checked_at < self.generation_interval:
+            return
+        with on_primary():
+            generation = CacheGeneration.current(GENERATION_NAME)
+        with self._lock:
+            if generation != self._generation:
+                self._entries.clear()
+                self._generation = generation
+            self._generation_checked_at = now
+
+    def _load(self, user_id: int) -> CachedUser | None:
+        with on_primary():
+            row = db.session.execute(
+                db.select(User.id, User.username, User.is_admin, User.is_blocked, User.confirmed).where(
+                    User.id == user_id
+                )
+            ).first()
+        return CachedUser(*row) if row else None
+
+    def get(self, user_id: int) -> CachedUser | None:
+        if self.ttl <= 0:
+            return self._load(user_id)
+
+        now = time.monotonic()
+        self._sync_generation(now)
+        with self._lock:
+            cached = self._entries.get(user_id)
+            if cached and now - cached[0] < self.ttl:
+                self._entries.move_to_end(user_id)
+                return cached[1]
+
+        user = self._load(user_id)
+        if user is not None:
+            with self._lock:
+                self._entries[user_id] = (now, user)
+                self._entries.move_to_end(user_id)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return user
+
+
+user_cache = UserIdentityCache()
+
+
+def invalidate_user(user_id: int) -> None:
+    """Mark a user's identity fields as changed; call before committing the change."""
+    CacheGeneration.bump(GENERATION_NAME)
+    user_cache.invalidate(user_id)
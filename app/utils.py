@@ -1,35 +1,426 @@
-import markdown2
-import bleach
+import hashlib
+import multiprocessing
+import os
+import re
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import CancelledError, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from html import escape
+from typing import Iterable, NamedTuple
+
+from app.metrics import record_render
+
+# Bump whenever the Markdown extras or the sanitizer allow-list change so that
+# `flask render-content` knows which stored HTML is stale.
+RENDERER_VERSION = 1
+
+MARKDOWN_EXTRAS = ["fenced-code-blocks", "tables"]
+
+# bleach's default allow-list plus block and table tags, spelled out so that importing this
+# module does not import bleach.
+ALLOWED_TAGS = frozenset({
+    "a",
+    "abbr",
+    "acronym",
+    "b",
+    "i",
+    "p",
+    "pre",
+    "code",
+    "blockquote",
+    "hr",
+    "br",
+    "h1",
+    "h2",
+    "h3",
+    "h4",
+    "h5",
+    "h6",
+    "ul",
+    "ol",
+    "li",
+    "strong",
+    "em",
+    "table",
+    "thead",
+    "tbody",
+    "tr",
+    "th",
+    "td",
+})
+
+# Input shapes markdown2 handles in worse than linear time (or by recursing past Python's
+# limit); content beyond any of these is shown as plain text without being converted.
+MAX_NESTING = 20
+MAX_BRACKETS = 500
+MAX_EMPHASIS_MARKERS = 1000
+MAX_TABLE_ROWS = 200
+
+
+class Rendered(NamedTuple):
+    html: str
+    # False when the plain-text fallback stood in because of load (a timeout or a broken
+    # pool) rather than the input itself; such results are not cached, and write paths
+    # leave the row stale so `flask render-content` converts it again later.
+    final: bool = True
+
+
+def complexity_issue(text: str, max_chars: int) -> str | None:
+    """Name the limit an input exceeds, or None if it is safe to hand to markdown2."""
+    if len(text) > max_chars:
+        return "length"
+    if text.count("[") > MAX_BRACKETS:
+        return "brackets"
+    if text.count("*") + text.count("_") > MAX_EMPHASIS_MARKERS:
+        return "emphasis"
+    table_rows = 0
+    for line in text.splitlines():
+        prefix = line[: len(line) - len(line.lstrip(" \t>"))]
+        depth = prefix.count(">") + (prefix.count(" ") + 4 * prefix.count("\t")) // 4
+        if depth > MAX_NESTING:
+            return "nesting"
+        if "|" in line:
+            table_rows += 1
+            if table_rows > MAX_TABLE_ROWS:
+                return "table"
+    return None
+
+
+def plain_text_html(text: str) -> str:
+    """Escaped paragraphs: what readers see for content that is not converted."""
+    paragraphs = [part.strip() for part in re.split(r"\n\s*\n", text) if part.strip()]
+    return "".join(f"<p>{escape(part).replace(chr(10), '<br>')}</p>" for part in paragraphs)
+
+
+_worker_converter = None
+
+
+def _convert_in_worker(text: str) -> str:
+    # Runs in a pool process, which builds its own converter on first use.
+    global _worker_converter
+    if _worker_converter is None:
+        import bleach
+        import markdown2
+
+        _worker_converter = (
+            markdown2.Markdown(extras=MARKDOWN_EXTRAS),
+            bleach.Cleaner(tags=ALLOWED_TAGS, strip=True),
+        )
+    markdown, cleaner = _worker_converter
+    return cleaner.clean(markdown.convert(text))
+
+
+class MarkdownRenderer:
+    """
+    Markdown to safe HTML renderer that builds the markdown2 and bleach objects once and
+    memoizes results in a bounded LRU keyed by a hash of the source text.
+
+    Both libraries are imported on the first conversion (or by `warm_up`), so processes
+    that never render Markdown do not pay for them.
+
+    Conversions run in a small process pool (`MARKDOWN_POOL_SIZE` processes per worker,
+    0 converts in the calling thread with no budget), and each batch gets one deadline of
+    `MARKDOWN_RENDER_TIMEOUT` seconds, waiting included. An input that fails
+    `complexity_issue`, raises, or is unfinished at the deadline is shown as escaped plain
+    text instead. An overrun sends later conversions to a fresh pool: the old one finishes
+    what its processes are running and exits, and conversions still queued in it are
+    resubmitted by their callers, so only the overrunning batch falls back. Conversions
+    slower than `MARKDOWN_SLOW_SECONDS` and every fallback are logged and counted in
+    `stats()`.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        pool_size: int = 0,
+        timeout: float = 2.0,
+        slow_seconds: float = 0.25,
+        max_chars: int = 20000,
+    ):
+        self.maxsize = maxsize
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.slow_seconds = slow_seconds
+        self.max_chars = max_chars
+        self.hits = 0
+        self.misses = 0
+        self._cache: OrderedDict[bytes, str] = OrderedDict()
+        self._lock = threading.Lock()
+        self._markdown = None
+        self._cleaner = None
+        self._pool: ProcessPoolExecutor | None = None
+        self._pool_pid = os.getpid()
+        self._inherited_pools: list[ProcessPoolExecutor] = []
+        # Guards the pool and the metrics; _lock is held for whole inline conversions.
+        self._pool_lock = threading.Lock()
+        self._logger = None
+        self._reset_metrics()
+
+    def init_app(self, app) -> None:
+        self.maxsize = app.config.get("MARKDOWN_CACHE_SIZE", self.maxsize)
+        self.pool_size = app.config.get("MARKDOWN_POOL_SIZE", self.pool_size)
+        self.timeout = app.config.get("MARKDOWN_RENDER_TIMEOUT", self.timeout)
+        self.slow_seconds = app.config.get("MARKDOWN_SLOW_SECONDS", self.slow_seconds)
+        self.max_chars = app.config.get("MARKDOWN_MAX_CHARS", self.max_chars)
+        self._logger = app.logger
+        self.clear()
+
+    def _reset_metrics(self) -> None:
+        self.conversions = 0
+        self.slow = 0
+        self.fallbacks: Counter[str] = Counter()
+        self.recent_slow: deque[dict] = deque(maxlen=20)
+
+    @staticmethod
+    def _key(text: str) -> bytes:
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+    def _build(self) -> None:
+        # Callers hold self._lock.
+        if self._markdown is None:
+            import bleach
+            import markdown2
+
+            self._markdown = markdown2.Markdown(extras=MARKDOWN_EXTRAS)
+            self._cleaner = bleach.Cleaner(tags=ALLOWED_TAGS, strip=True)
+
+    def warm_up(self) -> None:
+        """Import and build the converter now, e.g. in a preloading server's master process."""
+        with self._lock:
+            self._build()
+
+    def _convert_inline(self, text: str) -> str:
+        # markdown2.Markdown keeps per-document state, so conversions are serialized.
+        with self._lock:
+            self._build()
+            html = self._markdown.convert(text)
+            return self._cleaner.clean(html)
+
+    def _executor(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is not None and self._pool_pid != os.getpid():
+                # Inherited from a forking parent; its processes belong to the parent. Keep
+                # the object referenced: collecting it would signal the parent's manager
+                # thread, whose locks may have been copied mid-use and never be released.
+                self._inherited_pools.append(self._pool)
+                self._pool = None
+            if self._pool is None:
+                # Spawned, not forked: the calling worker already runs other threads (gthread,
+                # the live broadcaster) whose locks a fork could copy mid-use. The processes
+                # only ever run _convert_in_worker.
+                context = multiprocessing.get_context("spawn")
+                pool = ProcessPoolExecutor(max_workers=self.pool_size, mp_context=context)
+                # Start the processes and build their converters before any render is timed.
+                for future in [pool.submit(_convert_in_worker, "") for _ in range(self.pool_size)]:
+                    future.result()
+                self._pool = pool
+                self._pool_pid = os.getpid()
+            return self._pool
+
+    def start(self) -> None:
+        """Start this process's pool now rather than on the first render."""
+        if self.pool_size > 0:
+            self._executor()
+
+    def shutdown(self) -> None:
+        """Stop this process's pool; forked helper processes call it before they exit."""
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+            if pool is not None and self._pool_pid != os.getpid():
+                self._inherited_pools.append(pool)  # the parent's; see _executor
+                return
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def _replace_pool(self, pool: ProcessPoolExecutor) -> None:
+        """Send later conversions to a new pool; `pool` overran a deadline or broke."""
+        with self._pool_lock:
+            if self._pool is not pool:
+                return  # another thread got here first
+            self._pool = None
+        # A running conversion cannot be interrupted; its process finishes it and exits.
+        # Conversions still queued are cancelled, and their callers resubmit them.
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def _record(self, text: str, seconds: float, reason: str | None) -> None:
+        slow = seconds >= self.slow_seconds
+        with self._pool_lock:
+            self.conversions += 1
+            if reason:
+                self.fallbacks[reason] += 1
+            if slow:
+                self.slow += 1
+            if slow or reason:
+                self.recent_slow.append({
+                    "key": self._key(text).hex()[:12],
+                    "chars": len(text),
+                    "seconds": round(seconds, 3),
+                    "fallback": reason,
+                })
+        if (slow or reason) and self._logger is not None:
+            self._logger.warning(
+                "Slow Markdown input (%d chars, %.3fs, fallback=%s)", len(text), seconds, reason
+            )
+
+    def _convert_all(self, texts: list[str], retry: bool = True) -> list[Rendered]:
+        """Convert distinct texts, in parallel when the pool is enabled."""
+        results: list[Rendered | None] = [None] * len(texts)
+        pending = []
+        for index, text in enumerate(texts):
+            issue = complexity_issue(text, self.max_chars)
+            if issue:
+                self._record(text, 0.0, issue)
+                results[index] = Rendered(plain_text_html(text))
+            else:
+                pending.append(index)
+
+        if self.pool_size <= 0:
+            for index in pending:
+                started = time.perf_counter()
+                try:
+                    results[index] = Rendered(self._convert_inline(texts[index]))
+                    reason = None
+                except Exception:
+                    results[index] = Rendered(plain_text_html(texts[index]))
+                    reason = "error"
+                self._record(texts[index], time.perf_counter() - started, reason)
+            return results
+
+        pool = self._executor()
+        started = time.perf_counter()
+        finished: dict[Future, float] = {}
+        futures: dict[Future, int] = {}
+        collateral: list[int] = []
+        for index in pending:
+            try:
+                future = pool.submit(_convert_in_worker, texts[index])
+            except (BrokenProcessPool, RuntimeError):
+                # Another thread just replaced this pool.
+                collateral.append(index)
+                continue
+            future.add_done_callback(lambda done: finished.setdefault(done, time.perf_counter()))
+            futures[future] = index
+        _, overdue = wait(futures, timeout=self.timeout)
+        if overdue:
+            self._replace_pool(pool)
+        for future, index in futures.items():
+            text = texts[index]
+            if future in overdue:
+                future.cancel()
+                html, reason = None, "timeout"
+            else:
+                try:
+                    html, reason = future.result(), None
+                except (BrokenProcessPool, CancelledError):
+                    # Queued behind another batch's overrun, or a pool process died.
+                    self._replace_pool(pool)
+                    collateral.append(index)
+                    continue
+                except Exception:
+                    html, reason = None, "error"
+            self._record(text, finished.get(future, time.perf_counter()) - started, reason)
+            if html is None:
+                results[index] = Rendered(plain_text_html(text), final=reason == "error")
+            else:
+                results[index] = Rendered(html)
+        if collateral and retry:
+            again = self._convert_all([texts[index] for index in collateral], retry=False)
+            for index, result in zip(collateral, again):
+                results[index] = result
+        else:
+            for index in collateral:
+                self._record(texts[index], time.perf_counter() - started, "pool")
+                results[index] = Rendered(plain_text_html(texts[index]), final=False)
+        return results
+
+    def _lookup(self, key: bytes) -> str | None:
+        with self._lock:
+            html = self._cache.get(key)
+            if html is None:
+                self.misses += 1
+                return None
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return html
+
+    def _store(self, key: bytes, html: str) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._cache[key] = html
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+
+    def render_results(self, texts: Iterable[str]) -> list[Rendered]:
+        """Render a page worth of texts, converting each distinct uncached text once."""
+        started = time.perf_counter()
+        try:
+            return self._render_results(list(texts))
+        finally:
+            record_render(time.perf_counter() - started)
+
+    def _render_results(self, texts: list[str]) -> list[Rendered]:
+        keys = [self._key(text) for text in texts]
+        rendered: dict[bytes, Rendered] = {}
+        missing: dict[bytes, str] = {}
+        for key, text in zip(keys, texts):
+            if key in rendered or key in missing:
+                continue
+            html = self._lookup(key)
+            if html is None:
+                missing[key] = text
+            else:
+                rendered[key] = Rendered(html)
+        for key, result in zip(missing, self._convert_all(list(missing.values()))):
+            if result.final:
+                self._store(key, result.html)
+            rendered[key] = result
+        return [rendered[key] for key in keys]
+
+    def render_result(self, text: str) -> Rendered:
+        return self.render_results([text])[0]
+
+    def render(self, text: str) -> str:
+        return self.render_result(text).html
+
+    def render_many(self, texts: Iterable[str]) -> list[str]:
+        return [result.html for result in self.render_results(texts)]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+            self.hits = 0
+            self.misses = 0
+        with self._pool_lock:
+            self._reset_metrics()
+
+    def stats(self) -> dict:
+        with self._lock:
+            cache = {
+                "size": len(self._cache),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+        with self._pool_lock:
+            return {
+                **cache,
+                "pool_size": self.pool_size,
+                "conversions": self.conversions,
+                "slow": self.slow,
+                "fallbacks": dict(self.fallbacks),
+                "recent_slow": list(self.recent_slow),
+            }
+
+
+markdown_renderer = MarkdownRenderer()
 
 
 def render_markdown(text: str) -> str:
     """
     Render Markdown content to safe HTML, allowing basic formatting while stripping scripts.
     """
-    allowed_tags = list(bleach.sanitizer.ALLOWED_TAGS) + [
-        "p",
-        "pre",
-        "code",
-        "blockquote",
-        "hr",
-        "br",
-        "h1",
-        "h2",
-        "h3",
-        "h4",
-        "h5",
-        "h6",
-        "ul",
-        "ol",
-        "li",
-        "strong",
-        "em",
-        "table",
-        "thead",
-        "tbody",
-        "tr",
-        "th",
-        "td",
-    ]
-    html = markdown2.markdown(text, extras=["fenced-code-blocks", "tables"])
-    return bleach.clean(html, tags=allowed_tags, strip=True)
+    return markdown_renderer.render(text)
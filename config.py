@@ -1,6 +1,26 @@
 import os
 
 
+def _engine_options(database_uri: str) -> dict:
+    """Pool settings for SQLAlchemy; in-memory SQLite uses a static pool and takes none."""
+    if database_uri in ("sqlite://", "sqlite:///:memory:"):
+        return {}
+    options = {
+        "pool_size": int(os.environ.get("DB_POOL_SIZE", 5)),
+        "max_overflow": int(os.environ.get("DB_MAX_OVERFLOW", 10)),
+        "pool_timeout": float(os.environ.get("DB_POOL_TIMEOUT", 30)),
+        "pool_recycle": int(os.environ.get("DB_POOL_RECYCLE", 1800)),
+        "pool_pre_ping": os.environ.get("DB_POOL_PRE_PING", "true").lower() == "true",
+    }
+    if database_uri.startswith("sqlite"):
+        # Local file connections are cheap and never go stale.
+        options["pool_pre_ping"] = False
+        options["connect_args"] = {
+            "timeout": int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", 5000)) / 1000,
+        }
+    return options
+
+
 class Config:
     _raw_prefix = os.environ.get("APP_URL_PREFIX", "").strip()
     if _raw_prefix and not _raw_prefix.startswith("/"):
@@ -11,6 +31,21 @@ class Config:
         "DATABASE_URL", f"sqlite:///{os.path.join(os.getcwd(), 'app.db')}"
     )
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = _engine_options(SQLALCHEMY_DATABASE_URI)
+    DATABASE_REPLICA_URL = os.environ.get("DATABASE_REPLICA_URL") or None
+    SQLALCHEMY_BINDS = (
+        {"replica": {"url": DATABASE_REPLICA_URL, **_engine_options(DATABASE_REPLICA_URL)}}
+        if DATABASE_REPLICA_URL
+        else {}
+    )
+    REPLICA_STICKY_SECONDS = float(os.environ.get("REPLICA_STICKY_SECONDS", 10))
+    REPLICA_RETRY_SECONDS = float(os.environ.get("REPLICA_RETRY_SECONDS", 30))
+    SQLITE_JOURNAL_MODE = os.environ.get("SQLITE_JOURNAL_MODE", "WAL")
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", 5000))
+    SQLITE_SYNCHRONOUS = os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_FOREIGN_KEYS = os.environ.get("SQLITE_FOREIGN_KEYS", "true").lower() == "true"
+    SQLITE_MMAP_SIZE = int(os.environ.get("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+    SQLITE_CACHE_SIZE_KB = int(os.environ.get("SQLITE_CACHE_SIZE_KB", 20000))
     MAIL_SERVER = os.environ.get("MAIL_SERVER", "localhost")
     MAIL_PORT = int(os.environ.get("MAIL_PORT", 25))
     MAIL_USE_TLS = os.environ.get("MAIL_USE_TLS", "false").lower() == "true"
@@ -18,6 +53,73 @@ class Config:
     MAIL_PASSWORD = os.environ.get("MAIL_PASSWORD")
     MAIL_DEFAULT_SENDER = os.environ.get("MAIL_DEFAULT_SENDER", "noreply@example.com")
     SECURITY_EMAIL_SENDER = MAIL_DEFAULT_SENDER
+    MAIL_OUTBOX_BATCH_SIZE = int(os.environ.get("MAIL_OUTBOX_BATCH_SIZE", 50))
+    MAIL_OUTBOX_MAX_ATTEMPTS = int(os.environ.get("MAIL_OUTBOX_MAX_ATTEMPTS", 8))
+    MAIL_OUTBOX_BACKOFF_SECONDS = int(os.environ.get("MAIL_OUTBOX_BACKOFF_SECONDS", 30))
+    MAIL_OUTBOX_MAX_BACKOFF_SECONDS = int(os.environ.get("MAIL_OUTBOX_MAX_BACKOFF_SECONDS", 3600))
+    MAIL_OUTBOX_LEASE_SECONDS = int(os.environ.get("MAIL_OUTBOX_LEASE_SECONDS", 300))
     APP_NAME = os.environ.get("APP_NAME", "Debate Hub")
     APP_URL_PREFIX = _raw_prefix.rstrip("/")
     WTF_CSRF_TIME_LIMIT = None
+    USER_CACHE_TTL = float(os.environ.get("USER_CACHE_TTL", 60))
+    USER_CACHE_GENERATION_INTERVAL = float(os.environ.get("USER_CACHE_GENERATION_INTERVAL", 2))
+    USER_CACHE_SIZE = int(os.environ.get("USER_CACHE_SIZE", 10000))
+    HTTP_CACHE_MAX_AGE = int(os.environ.get("HTTP_CACHE_MAX_AGE", 0))
+    PAGE_CACHE_BACKEND = os.environ.get("PAGE_CACHE_BACKEND", "memory").lower()
+    PAGE_CACHE_PATH = os.environ.get("PAGE_CACHE_PATH")
+    PAGE_CACHE_SIZE = int(os.environ.get("PAGE_CACHE_SIZE", 512))
+    PAGE_CACHE_TTL = int(os.environ.get("PAGE_CACHE_TTL", 300))
+    OPINIONS_PER_PAGE = int(os.environ.get("OPINIONS_PER_PAGE", 50))
+    HOT_HALF_LIFE_HOURS = float(os.environ.get("HOT_HALF_LIFE_HOURS", 24))
+    HOT_OPINION_WEIGHT = float(os.environ.get("HOT_OPINION_WEIGHT", 1))
+    HOT_ARGUMENT_WEIGHT = float(os.environ.get("HOT_ARGUMENT_WEIGHT", 2))
+    HOT_REASONING_WEIGHT = float(os.environ.get("HOT_REASONING_WEIGHT", 1))
+    REASONING_PER_PAGE = int(os.environ.get("REASONING_PER_PAGE", 50))
+    ADMIN_USERS_PER_PAGE = int(os.environ.get("ADMIN_USERS_PER_PAGE", 100))
+    SEARCH_RESULTS_PER_PAGE = int(os.environ.get("SEARCH_RESULTS_PER_PAGE", 20))
+    EXPORT_BATCH_SIZE = int(os.environ.get("EXPORT_BATCH_SIZE", 500))
+    EXPORT_SETTLE_SECONDS = int(os.environ.get("EXPORT_SETTLE_SECONDS", 5))
+    # Bearer token for /api/export.ndjson clients other than signed-in admins.
+    EXPORT_TOKEN = os.environ.get("EXPORT_TOKEN")
+    ASSET_MANIFEST = os.environ.get("ASSET_MANIFEST")
+    ASSET_MAX_AGE = int(os.environ.get("ASSET_MAX_AGE", 365 * 24 * 3600))
+    COMPRESS_ENABLED = os.environ.get("COMPRESS_ENABLED", "true").lower() == "true"
+    COMPRESS_LEVEL = int(os.environ.get("COMPRESS_LEVEL", 6))
+    COMPRESS_MIN_SIZE = int(os.environ.get("COMPRESS_MIN_SIZE", 1024))
+    COMPRESS_MIMETYPES = [
+        value.strip() for value in os.environ.get("COMPRESS_MIMETYPES", "").split(",") if value.strip()
+    ]
+    STREAM_TEMPLATES = os.environ.get("STREAM_TEMPLATES", "false").lower() == "true"
+    STREAM_CHUNK_SIZE = int(os.environ.get("STREAM_CHUNK_SIZE", 8192))
+    # Number of reverse proxies (e.g. nginx) whose X-Forwarded-For is trusted for client IPs;
+    # 0 when clients connect directly. Left unset, rate limiting warns at startup.
+    PROXY_FIX_X_FOR = int(os.environ["PROXY_FIX_X_FOR"]) if os.environ.get("PROXY_FIX_X_FOR") else None
+    RATELIMIT_ENABLED = os.environ.get("RATELIMIT_ENABLED", "true").lower() == "true"
+    RATELIMIT_BACKEND = os.environ.get("RATELIMIT_BACKEND", "sqlite").lower()
+    RATELIMIT_STORAGE_PATH = os.environ.get("RATELIMIT_STORAGE_PATH")
+    # Per-endpoint token buckets, "<count>/<second|minute|hour|day>"; empty disables one.
+    RATELIMITS = {
+        "auth.login": os.environ.get("RATELIMIT_LOGIN", "10/minute"),
+        "auth.register": os.environ.get("RATELIMIT_REGISTER", "5/hour"),
+        "auth.resend_confirmation": os.environ.get("RATELIMIT_RESEND_CONFIRMATION", "3/hour"),
+        "main.new_opinion": os.environ.get("RATELIMIT_NEW_OPINION", "5/minute"),
+        "main.new_argument": os.environ.get("RATELIMIT_NEW_ARGUMENT", "20/minute"),
+        "main.new_reasoning": os.environ.get("RATELIMIT_NEW_REASONING", "30/minute"),
+    }
+    METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "true").lower() == "true"
+    METRICS_DIR = os.environ.get("METRICS_DIR")
+    METRICS_FLUSH_SECONDS = float(os.environ.get("METRICS_FLUSH_SECONDS", 1))
+    METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
+    SERVER_TIMING = os.environ.get("SERVER_TIMING", "true").lower() == "true"
+    # Server-Sent Events on opinion and argument pages (see app/live.py).
+    LIVE_ENABLED = os.environ.get("LIVE_ENABLED", "true").lower() == "true"
+    LIVE_POLL_SECONDS = float(os.environ.get("LIVE_POLL_SECONDS", 1))
+    LIVE_HEARTBEAT_SECONDS = float(os.environ.get("LIVE_HEARTBEAT_SECONDS", 15))
+    LIVE_STREAM_SECONDS = float(os.environ.get("LIVE_STREAM_SECONDS", 300))
+    LIVE_MAX_SUBSCRIBERS = int(os.environ.get("LIVE_MAX_SUBSCRIBERS", 32))
+    LIVE_RETENTION_HOURS = float(os.environ.get("LIVE_RETENTION_HOURS", 24))
+    MARKDOWN_CACHE_SIZE = int(os.environ.get("MARKDOWN_CACHE_SIZE", 2048))
+    MARKDOWN_POOL_SIZE = int(os.environ.get("MARKDOWN_POOL_SIZE", 2))
+    MARKDOWN_RENDER_TIMEOUT = float(os.environ.get("MARKDOWN_RENDER_TIMEOUT", 2))
+    MARKDOWN_SLOW_SECONDS = float(os.environ.get("MARKDOWN_SLOW_SECONDS", 0.25))
+    MARKDOWN_MAX_CHARS = int(os.environ.get("MARKDOWN_MAX_CHARS", 20000))
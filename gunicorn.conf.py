@@ -0,0 +1,56 @@
+"""
+Gunicorn settings, picked up automatically when gunicorn starts in the project directory
+(or pass `-c gunicorn.conf.py`). Bind address and worker count stay on the command line.
+
+With `preload_app` the master imports `wsgi`, builds the app and warms it up once, and the
+workers fork from it afterwards. Database pools are reset in each child (`app/database.py`)
+and the per-worker caches notice the new pid, so nothing opened in the master is shared.
+Set `GUNICORN_PRELOAD=false` to go back to every worker importing the app itself, e.g. to
+pick up code on `kill -HUP` without a full restart. Metric files from the previous run are
+removed when the server starts.
+
+Workers are threaded (`gthread`): every open live-update stream (`app/live.py`) holds a
+thread for up to `LIVE_STREAM_SECONDS`, so each worker gets `LIVE_MAX_SUBSCRIBERS` threads
+for streams plus `GUNICORN_THREADS` (default 4) for ordinary requests. A stream that waits
+does not block the worker's heartbeat, so the `timeout` does not kill it.
+"""
+import os
+import shutil
+
+from dotenv import load_dotenv
+
+# The app reads .env when it is imported; the thread count below is needed before that.
+load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env"))
+
+preload_app = os.environ.get("GUNICORN_PRELOAD", "true").lower() == "true"
+
+worker_class = "gthread"
+_live_enabled = os.environ.get("LIVE_ENABLED", "true").lower() == "true"
+_live_threads = int(os.environ.get("LIVE_MAX_SUBSCRIBERS", 32)) if _live_enabled else 0
+threads = _live_threads + int(os.environ.get("GUNICORN_THREADS", 4))
+
+
+def on_starting(server):
+    # Per-process metric files of the previous run (see app/metrics.py) would otherwise be
+    # summed with the new workers'. Runs before the app is loaded, so the default
+    # `instance/metrics` location is spelled out rather than taken from the app.
+    project_dir = os.path.dirname(os.path.abspath(__file__))
+    directory = os.environ.get("METRICS_DIR") or os.path.join(project_dir, "instance", "metrics")
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+def post_worker_init(worker):
+    # The Markdown pool's processes are spawned fresh, which takes about a second; do it
+    # before the worker accepts requests rather than in the first request that renders.
+    from app.utils import markdown_renderer
+
+    markdown_renderer.start()
+
+
+def when_ready(server):
+    # Runs in the master before the first worker is forked.
+    if server.cfg.preload_app:
+        from wsgi import app
+        from app.startup import warm_up
+
+        warm_up(app)
@@ -0,0 +1,49 @@
+"""add opinion ranking scores
+
+Revision ID: 0a6e9d4c8b17
+Revises: f1c3d8e5a272
+Create Date: 2026-10-18 19:26:51.004183
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0a6e9d4c8b17'
+down_revision = 'f1c3d8e5a272'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    ranking_epoch = op.create_table('ranking_epoch',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('decayed_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.bulk_insert(ranking_epoch, [{'id': 1, 'decayed_at': datetime.utcnow()}])
+
+    with op.batch_alter_table('opinion', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('hot_score', sa.Float(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('contested_score', sa.Integer(), server_default='0', nullable=False))
+        batch_op.create_index(batch_op.f('ix_opinion_hot_score'), ['hot_score'], unique=False)
+        batch_op.create_index(batch_op.f('ix_opinion_contested_score'), ['contested_score'], unique=False)
+
+    # Hot scores need the app's weights; existing rows get them from `flask rank-decay --recompute`.
+    op.execute(
+        "UPDATE opinion SET contested_score = "
+        "CASE WHEN for_count < against_count THEN 2 * for_count ELSE 2 * against_count END"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('opinion', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_opinion_contested_score'))
+        batch_op.drop_index(batch_op.f('ix_opinion_hot_score'))
+        batch_op.drop_column('contested_score')
+        batch_op.drop_column('hot_score')
+
+    op.drop_table('ranking_epoch')
@@ -0,0 +1,39 @@
+"""add live event log
+
+Revision ID: 3c9f1e7a5d24
+Revises: 0a6e9d4c8b17
+Create Date: 2026-10-18 21:02:37.518204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c9f1e7a5d24'
+down_revision = '0a6e9d4c8b17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('live_event',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('channel', sa.String(length=64), nullable=False),
+    sa.Column('kind', sa.String(length=32), nullable=False),
+    sa.Column('data', sa.Text(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sqlite_autoincrement=True
+    )
+    with op.batch_alter_table('live_event', schema=None) as batch_op:
+        batch_op.create_index('ix_live_event_channel_id', ['channel', 'id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_live_event_created_at'), ['created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('live_event', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_live_event_created_at'))
+        batch_op.drop_index('ix_live_event_channel_id')
+
+    op.drop_table('live_event')
@@ -0,0 +1,31 @@
+"""add rendered content html
+
+Revision ID: 3f9a1c2b7d10
+Revises: c6c6a4d91cef
+Create Date: 2026-10-18 09:12:40.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9a1c2b7d10'
+down_revision = 'c6c6a4d91cef'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing rows start with NULL HTML; run `flask render-content` to backfill.
+    for table in ('opinion', 'argument', 'reasoning'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('content_html', sa.Text(), nullable=True))
+            batch_op.add_column(sa.Column('render_version', sa.Integer(), nullable=True))
+
+
+def downgrade():
+    for table in ('reasoning', 'argument', 'opinion'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_column('render_version')
+            batch_op.drop_column('content_html')
@@ -0,0 +1,46 @@
+"""add denormalized counters
+
+Revision ID: 8b2e4f6a9c31
+Revises: 3f9a1c2b7d10
+Create Date: 2026-10-18 10:05:12.402117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b2e4f6a9c31'
+down_revision = '3f9a1c2b7d10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('opinion', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('for_count', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('against_count', sa.Integer(), server_default='0', nullable=False))
+
+    with op.batch_alter_table('argument', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('reasoning_count', sa.Integer(), server_default='0', nullable=False))
+
+    op.execute(
+        "UPDATE opinion SET "
+        "for_count = (SELECT COUNT(*) FROM argument "
+        "WHERE argument.opinion_id = opinion.id AND argument.stance = 'FOR'), "
+        "against_count = (SELECT COUNT(*) FROM argument "
+        "WHERE argument.opinion_id = opinion.id AND argument.stance = 'AGAINST')"
+    )
+    op.execute(
+        "UPDATE argument SET "
+        "reasoning_count = (SELECT COUNT(*) FROM reasoning WHERE reasoning.argument_id = argument.id)"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('argument', schema=None) as batch_op:
+        batch_op.drop_column('reasoning_count')
+
+    with op.batch_alter_table('opinion', schema=None) as batch_op:
+        batch_op.drop_column('against_count')
+        batch_op.drop_column('for_count')
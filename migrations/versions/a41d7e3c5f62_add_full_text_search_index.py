@@ -0,0 +1,86 @@
+"""add full-text search index
+
+Revision ID: a41d7e3c5f62
+Revises: 5d7c0e9b2a48
+Create Date: 2026-10-18 12:02:51.730492
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a41d7e3c5f62'
+down_revision = '5d7c0e9b2a48'
+branch_labels = None
+depends_on = None
+
+TRIGGERS = [
+    'search_opinion_ai', 'search_opinion_au', 'search_opinion_ad',
+    'search_argument_ai', 'search_argument_au', 'search_argument_ad',
+    'search_reasoning_ai', 'search_reasoning_au', 'search_reasoning_ad',
+]
+
+COLUMNS = '(rowid, title, body, kind, ref_id, opinion_id, argument_id)'
+REASONING_OPINION = '(SELECT opinion_id FROM argument WHERE argument.id = new.argument_id)'
+
+
+def upgrade():
+    # FTS5 is SQLite-only; other databases use the LIKE fallback in app/search.py.
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    op.execute(
+        "CREATE VIRTUAL TABLE search_index USING fts5("
+        "title, body, kind UNINDEXED, ref_id UNINDEXED, opinion_id UNINDEXED, "
+        "argument_id UNINDEXED, tokenize = 'porter unicode61')"
+    )
+
+    opinion_row = "VALUES (new.id * 4 + 1, new.title, new.content, 'opinion', new.id, new.id, NULL)"
+    argument_row = "VALUES (new.id * 4 + 2, '', new.content, 'argument', new.id, new.opinion_id, new.id)"
+    reasoning_row = (
+        "VALUES (new.id * 4 + 3, '', new.content, 'reasoning', new.id, "
+        f"{REASONING_OPINION}, new.argument_id)"
+    )
+    for table, code, columns, row in (
+        ('opinion', 1, 'title, content', opinion_row),
+        ('argument', 2, 'content', argument_row),
+        ('reasoning', 3, 'content', reasoning_row),
+    ):
+        op.execute(
+            f"CREATE TRIGGER search_{table}_ai AFTER INSERT ON {table} BEGIN "
+            f"INSERT INTO search_index {COLUMNS} {row}; END"
+        )
+        op.execute(
+            f"CREATE TRIGGER search_{table}_au AFTER UPDATE OF {columns} ON {table} BEGIN "
+            f"DELETE FROM search_index WHERE rowid = old.id * 4 + {code}; "
+            f"INSERT INTO search_index {COLUMNS} {row}; END"
+        )
+        op.execute(
+            f"CREATE TRIGGER search_{table}_ad AFTER DELETE ON {table} BEGIN "
+            f"DELETE FROM search_index WHERE rowid = old.id * 4 + {code}; END"
+        )
+
+    op.execute(
+        f"INSERT INTO search_index {COLUMNS} "
+        "SELECT id * 4 + 1, title, content, 'opinion', id, id, NULL FROM opinion"
+    )
+    op.execute(
+        f"INSERT INTO search_index {COLUMNS} "
+        "SELECT id * 4 + 2, '', content, 'argument', id, opinion_id, id FROM argument"
+    )
+    op.execute(
+        f"INSERT INTO search_index {COLUMNS} "
+        "SELECT reasoning.id * 4 + 3, '', reasoning.content, 'reasoning', reasoning.id, "
+        "argument.opinion_id, reasoning.argument_id "
+        "FROM reasoning JOIN argument ON argument.id = reasoning.argument_id"
+    )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    for trigger in TRIGGERS:
+        op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    op.execute("DROP TABLE IF EXISTS search_index")
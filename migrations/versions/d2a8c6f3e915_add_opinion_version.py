@@ -0,0 +1,47 @@
+"""add opinion version and updated_at
+
+Revision ID: d2a8c6f3e915
+Revises: c93f5a1e7b24
+Create Date: 2026-10-18 14:48:55.260173
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2a8c6f3e915'
+down_revision = 'c93f5a1e7b24'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('opinion', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_opinion_updated_at'), ['updated_at'], unique=False)
+
+    # Latest activity anywhere in the opinion's subtree.
+    op.execute(
+        "UPDATE opinion SET updated_at = MAX("
+        "COALESCE(created_at, 0), "
+        "COALESCE((SELECT MAX(created_at) FROM argument WHERE argument.opinion_id = opinion.id), 0), "
+        "COALESCE((SELECT MAX(reasoning.created_at) FROM reasoning "
+        "JOIN argument ON argument.id = reasoning.argument_id "
+        "WHERE argument.opinion_id = opinion.id), 0))"
+        if op.get_bind().dialect.name == 'sqlite' else
+        "UPDATE opinion SET updated_at = GREATEST("
+        "created_at, "
+        "(SELECT MAX(created_at) FROM argument WHERE argument.opinion_id = opinion.id), "
+        "(SELECT MAX(reasoning.created_at) FROM reasoning "
+        "JOIN argument ON argument.id = reasoning.argument_id "
+        "WHERE argument.opinion_id = opinion.id))"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('opinion', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_opinion_updated_at'))
+        batch_op.drop_column('updated_at')
+        batch_op.drop_column('version')
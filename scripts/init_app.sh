@@ -33,4 +33,10 @@ export FLASK_APP=wsgi.py
 echo "[init] Applying database migrations..."
 flask db upgrade
 
+echo "[init] Backfilling stored HTML and opinion snapshots..."
+flask render-content
+
+echo "[init] Building fingerprinted static assets..."
+flask assets-build
+
 echo "[init] Initialization complete."
@@ -9,6 +9,15 @@ cd "$REPO_DIR"
 echo "[reload] Updating code from git..."
 git pull --rebase --stat
 
+VENV_DIR="${VENV_DIR:-.venv}"
+if [ -d "$VENV_DIR" ]; then
+  # shellcheck source=/dev/null
+  source "$VENV_DIR/bin/activate"
+fi
+
+echo "[reload] Building fingerprinted static assets..."
+FLASK_APP=wsgi.py flask assets-build
+
 echo "[reload] Restarting gunicorn service (ses.service)..."
 sudo systemctl restart ses.service
 
@@ -0,0 +1,59 @@
+import pytest
+
+from config import Config
+
+
+@pytest.fixture
+def make_app(tmp_path):
+    """Build an app on a fresh SQLite file; keyword arguments override config settings."""
+    from app import create_app, db
+
+    def make(**settings):
+        class TestConfig(Config):
+            TESTING = True
+            WTF_CSRF_ENABLED = False
+            MAIL_SUPPRESS_SEND = True
+            SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'app.db'}"
+            RATELIMIT_ENABLED = False
+            RATELIMIT_STORAGE_PATH = str(tmp_path / "ratelimit.sqlite")
+            PAGE_CACHE_PATH = str(tmp_path / "page_cache.sqlite")
+            METRICS_DIR = str(tmp_path / "metrics")
+            # Convert in the request thread; tests/test_markdown.py covers the pool.
+            MARKDOWN_POOL_SIZE = 0
+
+        for name, value in settings.items():
+            setattr(TestConfig, name, value)
+        app = create_app(TestConfig)
+        with app.app_context():
+            # Only the primary: a configured read replica is a copy (`flask replica-sync`).
+            db.create_all(bind_key=None)
+        return app
+
+    return make
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def author(app):
+    """A test client signed in as a confirmed admin, "author"."""
+    from app import db
+    from app.models import User
+
+    with app.app_context():
+        user = User(email="author@example.com", username="author", confirmed=True, is_admin=True)
+        user.set_password("secret1")
+        db.session.add(user)
+        db.session.commit()
+    client = app.test_client()
+    response = client.post("/login", data={"email": "author@example.com", "password": "secret1"})
+    assert response.status_code == 302
+    return client
@@ -0,0 +1,44 @@
+import gzip
+import json
+import shutil
+from pathlib import Path
+
+import pytest
+
+from app import assets
+from app.commands import assets_build_command
+
+
+@pytest.fixture
+def static_app(app, tmp_path):
+    static = tmp_path / "static"
+    shutil.copytree(app.static_folder, static)
+    app.static_folder = str(static)
+    return app
+
+
+def _hashed(app, name: str) -> Path:
+    static = Path(app.static_folder)
+    manifest = json.loads((static / assets.DIST_DIR / assets.MANIFEST_NAME).read_text())
+    return static / manifest[name]
+
+
+def test_build_writes_hashed_and_gzipped_copies(static_app):
+    result = static_app.test_cli_runner().invoke(assets_build_command)
+    assert result.exit_code == 0, result.output
+
+    hashed = _hashed(static_app, "style.css")
+    assert hashed.name.startswith("style.") and hashed.suffix == ".css"
+    original = (Path(static_app.static_folder) / "style.css").read_bytes()
+    assert gzip.decompress(Path(f"{hashed}.gz").read_bytes()) == original
+
+
+def test_build_reports_missing_brotli(static_app, monkeypatch):
+    monkeypatch.setattr(assets, "brotli", None)
+    result = static_app.test_cli_runner().invoke(assets_build_command)
+    assert result.exit_code == 0, result.output
+    assert "wrote .gz copies only, no .br" in result.output
+
+    hashed = _hashed(static_app, "style.css")
+    assert Path(f"{hashed}.gz").exists()
+    assert not Path(f"{hashed}.br").exists()
@@ -0,0 +1,68 @@
+import pytest
+
+from app import db
+from app.commands import check_counters_command
+from app.counters import find_counter_drift
+from app.models import Argument, Opinion, Reasoning
+
+
+@pytest.fixture
+def debate(author):
+    response = author.post("/opinions/new", data={
+        "title": "Counted",
+        "content": "body",
+        "first_argument_stance": "for",
+        "first_argument_content": "first",
+        "first_reasoning_content": "because",
+    })
+    assert response.status_code == 302
+    for stance in ("against", "against", "for"):
+        data = {"stance": stance, "content": stance}
+        assert author.post("/opinions/1/arguments/new", data=data).status_code == 302
+    for _ in range(2):
+        assert author.post("/arguments/2/reasoning/new", data={"content": "more"}).status_code == 302
+    return author
+
+
+def _counts(opinion_id: int = 1) -> tuple[int, int, int]:
+    opinion = db.session.get(Opinion, opinion_id)
+    return opinion.for_count, opinion.against_count, opinion.contested_score
+
+
+def test_posting_maintains_the_counters(app, debate):
+    with app.app_context():
+        assert _counts() == (2, 2, 4)
+        assert [arg.reasoning_count for arg in Argument.query.order_by(Argument.id)] == [1, 2, 0, 0]
+        assert find_counter_drift() == []
+
+
+def test_deleting_maintains_the_counters(app, debate):
+    with app.app_context():
+        db.session.delete(db.session.get(Reasoning, 2))
+        db.session.delete(db.session.get(Argument, 3))
+        db.session.commit()
+        assert _counts() == (2, 1, 2)
+        assert db.session.get(Argument, 2).reasoning_count == 1
+        assert find_counter_drift() == []
+
+
+def test_check_counters_reports_and_repairs_drift(app, debate):
+    with app.app_context():
+        db.session.execute(db.update(Opinion).values(for_count=9))
+        db.session.execute(db.update(Argument).where(Argument.id == 2).values(reasoning_count=0))
+        db.session.commit()
+
+    runner = app.test_cli_runner()
+    result = runner.invoke(check_counters_command)
+    assert result.exit_code != 0
+    assert "opinion 1: for_count stored=9 actual=2" in result.output
+    assert "argument 2: reasoning_count stored=0 actual=2" in result.output
+
+    result = runner.invoke(check_counters_command, ["--repair"])
+    assert result.exit_code == 0, result.output
+    with app.app_context():
+        assert _counts() == (2, 2, 4)
+        assert db.session.get(Argument, 2).reasoning_count == 2
+    result = runner.invoke(check_counters_command)
+    assert result.exit_code == 0
+    assert "All counters are consistent." in result.output
@@ -0,0 +1,59 @@
+import sqlite3
+
+import pytest
+from sqlalchemy.engine import make_url
+
+from app import db
+from app.database import write_scope
+from app.models import User
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app()
+
+
+def _lock_is_free(app) -> bool:
+    """Whether another connection can take the write lock right now."""
+    conn = sqlite3.connect(make_url(app.config["SQLALCHEMY_DATABASE_URI"]).database, timeout=0, isolation_level=None)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+    except sqlite3.OperationalError:
+        return False
+    finally:
+        conn.close()
+    return True
+
+
+@pytest.mark.parametrize("method, locked", [("GET", False), ("HEAD", False), ("POST", True), ("DELETE", True)])
+def test_request_method_decides_the_lock_mode(app, method, locked):
+    with app.test_request_context("/", method=method):
+        db.session.execute(db.select(User.id)).all()
+        assert _lock_is_free(app) is not locked
+        db.session.rollback()
+        assert _lock_is_free(app)
+
+
+def test_read_then_write_is_one_transaction(app):
+    with app.test_request_context("/register", method="POST"):
+        assert User.query.filter_by(email="new@example.com").first() is None
+        # Another writer cannot slip in between the uniqueness check and the insert.
+        assert not _lock_is_free(app)
+        db.session.add(User(email="new@example.com", username="new", password_hash="x"))
+        db.session.commit()
+    with app.app_context():
+        assert User.query.filter_by(email="new@example.com").count() == 1
+
+
+def test_write_scope_locks_outside_requests(app):
+    with app.app_context():
+        db.session.execute(db.select(User.id)).all()
+        assert _lock_is_free(app)
+        db.session.commit()
+        with write_scope():
+            db.session.execute(db.select(User.id)).all()
+            assert not _lock_is_free(app)
+            db.session.commit()
+        db.session.execute(db.select(User.id)).all()
+        assert _lock_is_free(app)
+        db.session.rollback()
@@ -0,0 +1,74 @@
+import pytest
+
+from app import db
+from app.models import Opinion
+from app.queries import explain_hot_queries
+
+
+def _post_opinion(client, title: str) -> None:
+    response = client.post("/opinions/new", data={
+        "title": title,
+        "content": f"{title} *body*",
+        "first_argument_stance": "for",
+        "first_argument_content": "first argument",
+        "first_reasoning_content": "first reasoning",
+    })
+    assert response.status_code == 302
+
+
+@pytest.fixture
+def debate(author):
+    _post_opinion(author, "One")
+    _post_opinion(author, "Two")
+    return author
+
+
+@pytest.mark.parametrize("path", ["/", "/opinions/1", "/arguments/1"])
+def test_anonymous_pages_revalidate_with_304(debate, client, path):
+    response = client.get(path)
+    assert response.status_code == 200
+    assert response.headers["ETag"].startswith('W/"')
+    assert response.cache_control.public
+    assert "Cookie" in response.vary
+
+    again = client.get(path, headers={"If-None-Match": response.headers["ETag"]})
+    assert again.status_code == 304
+    assert again.data == b""
+
+
+@pytest.mark.parametrize("path", ["/", "/opinions/1", "/arguments/1"])
+def test_signed_in_pages_are_private(debate, path):
+    response = debate.get(path)
+    assert response.status_code == 200
+    assert "ETag" not in response.headers
+    assert response.cache_control.private
+    assert response.cache_control.no_cache
+
+
+def test_new_argument_changes_the_validators(debate, client):
+    before = {path: client.get(path).headers["ETag"] for path in ("/", "/opinions/1", "/opinions/2")}
+    response = debate.post("/opinions/1/arguments/new", data={"stance": "against", "content": "no"})
+    assert response.status_code == 302
+
+    assert client.get("/", headers={"If-None-Match": before["/"]}).status_code == 200
+    assert client.get("/opinions/1", headers={"If-None-Match": before["/opinions/1"]}).status_code == 200
+    assert client.get("/opinions/2", headers={"If-None-Match": before["/opinions/2"]}).status_code == 304
+
+
+def test_deleting_an_opinion_changes_the_index_etag(app, debate, client):
+    etag = client.get("/").headers["ETag"]
+    with app.app_context():
+        # The oldest opinion: neither the newest id nor the latest update changes.
+        db.session.delete(db.session.get(Opinion, 1))
+        db.session.commit()
+    response = client.get("/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert b"One" not in response.data
+
+
+def test_index_freshness_reads_no_table_or_index_scan(app, debate):
+    with app.app_context():
+        plans = [plan for plan in explain_hot_queries() if plan.label == "index freshness"]
+    assert plans
+    for plan in plans:
+        assert not [line for line in plan.plan if line.startswith("SCAN") and "CONSTANT ROW" not in line], plan.plan
@@ -0,0 +1,106 @@
+import json
+
+import pytest
+
+from app import db
+from app.commands import import_debates_command
+from app.models import Argument, ImportRef, Opinion, Reasoning
+from app.utils import Rendered, markdown_renderer, plain_text_html
+
+FIRST_RUN = [
+    {"type": "opinion", "id": 10, "author": "author", "title": "Imported", "content": "*body*"},
+    {"type": "argument", "id": 20, "opinion_id": 10, "author": "author", "stance": "for", "content": "yes"},
+]
+# An interrupted run restarted over the whole file, plus records whose parents went in earlier.
+SECOND_RUN = FIRST_RUN + [
+    {"type": "argument", "id": 21, "opinion_id": 10, "author": "Author@Example.com", "stance": "against", "content": "no"},
+    {"type": "reasoning", "id": 30, "argument_id": 20, "author": "author", "content": "because"},
+    {"type": "reasoning", "id": 31, "argument_id": 21, "author": "author", "content": "why not"},
+]
+
+
+@pytest.fixture
+def write_records(tmp_path):
+    def write(name: str, records: list[dict]) -> str:
+        path = tmp_path / name
+        path.write_text("".join(json.dumps(record) + "\n" for record in records))
+        return str(path)
+
+    return write
+
+
+def _import(app, path: str, *args: str):
+    return app.test_cli_runner().invoke(import_debates_command, [path, "--keep-search-triggers", *args])
+
+
+@pytest.mark.usefixtures("author")
+@pytest.mark.parametrize("batch_size", ["1", "1000"])
+def test_rerun_skips_imported_rows_and_resolves_earlier_parents(app, write_records, batch_size):
+    result = _import(app, write_records("first.jsonl", FIRST_RUN), "--batch-size", batch_size)
+    assert result.exit_code == 0, result.output
+    assert "inserted: opinion=1, argument=1; skipped=0 failed=0" in result.output
+
+    result = _import(app, write_records("second.jsonl", SECOND_RUN), "--batch-size", batch_size)
+    assert result.exit_code == 0, result.output
+    assert "inserted: argument=1, reasoning=2; skipped=2 failed=0" in result.output
+
+    with app.app_context():
+        opinion = db.session.execute(db.select(Opinion)).scalar_one()
+        assert (opinion.for_count, opinion.against_count) == (1, 1)
+        assert opinion.content_html.strip() == "<p><em>body</em></p>"
+        refs = dict(db.session.execute(db.select(ImportRef.source_id, ImportRef.target_id)).all())
+        reasoning = {row.id: row.argument_id for row in Reasoning.query}
+        assert reasoning == {refs["30"]: refs["20"], refs["31"]: refs["21"]}
+        assert [arg.reasoning_count for arg in Argument.query.order_by(Argument.id)] == [1, 1]
+
+
+@pytest.mark.usefixtures("author")
+def test_sources_are_tracked_separately(app, write_records):
+    path = write_records("debates.jsonl", FIRST_RUN)
+    assert _import(app, path).exit_code == 0
+    result = _import(app, path, "--source", "other")
+    assert result.exit_code == 0, result.output
+    with app.app_context():
+        assert db.session.scalar(db.select(db.func.count()).select_from(Opinion)) == 2
+
+
+@pytest.mark.usefixtures("author")
+def test_unknown_parents_and_authors_fail_without_stopping(app, write_records):
+    records = FIRST_RUN + [
+        {"type": "reasoning", "id": 32, "argument_id": 99, "author": "author", "content": "orphan"},
+        {"type": "argument", "id": 22, "opinion_id": 10, "author": "nobody", "stance": "for", "content": "who"},
+    ]
+    result = _import(app, write_records("broken.jsonl", records))
+    assert result.exit_code != 0
+    assert "unknown argument '99'" in result.output
+    assert "unknown author 'nobody'" in result.output
+    assert "inserted: opinion=1, argument=1; skipped=0 failed=2" in result.output
+
+
+@pytest.mark.usefixtures("author")
+def test_dry_run_writes_nothing(app, write_records):
+    result = _import(app, write_records("debates.jsonl", SECOND_RUN), "--dry-run")
+    assert result.exit_code == 0, result.output
+    assert "inserted: opinion=1, argument=2, reasoning=2" in result.output
+    with app.app_context():
+        assert db.session.scalar(db.select(db.func.count()).select_from(ImportRef)) == 0
+
+
+@pytest.mark.usefixtures("author")
+def test_rows_left_with_fallback_html_are_reported(app, write_records, monkeypatch):
+    def overloaded(texts):
+        # Every conversion but the opinion's misses its deadline.
+        return [Rendered(plain_text_html(text), final=text == "*body*") for text in texts]
+
+    monkeypatch.setattr(markdown_renderer, "render_results", overloaded)
+    result = _import(app, write_records("debates.jsonl", SECOND_RUN))
+    assert result.exit_code == 0, result.output
+    assert "failed=0 stale=4" in result.output
+    assert "4 row(s) were stored with plain-text HTML" in result.output
+
+    monkeypatch.undo()
+    result = app.test_cli_runner().invoke(args=["render-content"])
+    assert result.exit_code == 0, result.output
+    with app.app_context():
+        assert Argument.query.filter(Argument.stale_filter()).count() == 0
+        assert Reasoning.query.filter(Reasoning.stale_filter()).count() == 0
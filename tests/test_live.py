@@ -0,0 +1,67 @@
+import pytest
+
+from app.live import broadcaster
+
+
+@pytest.fixture
+def app(make_app):
+    # Streams end right after the replay, so the response body can be read whole.
+    app = make_app(LIVE_ENABLED=True, LIVE_STREAM_SECONDS=0, LIVE_POLL_SECONDS=0.05)
+    yield app
+    assert broadcaster.stats()["subscribers"] == 0
+
+
+@pytest.fixture
+def debate(author):
+    response = author.post("/opinions/new", data={
+        "title": "Live",
+        "content": "body",
+        "first_argument_stance": "for",
+        "first_argument_content": "first",
+        "first_reasoning_content": "because",
+    })
+    assert response.status_code == 302
+    for content in ("second", "third", "fourth"):
+        data = {"stance": "against", "content": content}
+        assert author.post("/opinions/1/arguments/new", data=data).status_code == 302
+    assert author.post("/arguments/1/reasoning/new", data={"content": "elsewhere"}).status_code == 302
+    return author
+
+
+def _events(client, path: str, **headers) -> list[tuple[int, str]]:
+    response = client.get(path, headers=headers)
+    assert response.status_code == 200
+    assert response.mimetype == "text/event-stream"
+    events = []
+    for block in response.get_data(as_text=True).split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines() if not line.startswith(":"))
+        if "id" in fields:
+            events.append((int(fields["id"]), fields["event"]))
+    return events
+
+
+def test_reconnect_replays_only_what_was_missed(debate, client):
+    everything = _events(client, "/opinions/1/live?since=2000-01-01T00:00:00")
+    assert [kind for _, kind in everything] == ["argument"] * 3
+    ids = [event_id for event_id, _ in everything]
+    assert ids == sorted(ids)
+
+    assert _events(client, "/opinions/1/live", **{"Last-Event-ID": str(ids[0])}) == everything[1:]
+    assert _events(client, "/opinions/1/live", **{"Last-Event-ID": str(ids[-1])}) == []
+    # The id wins over ?since=, which only applies to the first connect.
+    path = "/opinions/1/live?since=2000-01-01T00:00:00"
+    assert _events(client, path, **{"Last-Event-ID": str(ids[1])}) == everything[2:]
+
+
+def test_channels_are_separate(debate, client):
+    assert [kind for _, kind in _events(client, "/arguments/1/live?since=2000-01-01T00:00:00")] == ["reasoning"]
+    assert _events(client, "/opinions/1/live?since=2999-01-01T00:00:00") == []
+
+
+def test_fresh_connection_without_position_replays_nothing(debate, client):
+    assert _events(client, "/opinions/1/live") == []
+
+
+@pytest.mark.parametrize("headers,query", [({"Last-Event-ID": "abc"}, ""), ({}, "?since=yesterday")])
+def test_bad_positions_are_rejected(debate, client, headers, query):
+    assert client.get(f"/opinions/1/live{query}", headers=headers).status_code == 400
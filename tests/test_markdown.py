@@ -0,0 +1,49 @@
+import threading
+import time
+
+import pytest
+
+from app import utils
+from app.utils import MarkdownRenderer
+
+
+def _slow_convert(text: str) -> str:
+    # Imported by name in the spawned pool processes.
+    if text.startswith("sleep "):
+        time.sleep(float(text.split()[1]))
+    return f"<p>{text}</p>"
+
+
+@pytest.fixture
+def renderer(monkeypatch):
+    monkeypatch.setattr(utils, "_convert_in_worker", _slow_convert)
+    renderer = MarkdownRenderer(maxsize=0, pool_size=2, timeout=0.5)
+    renderer.render("start the pool")
+    yield renderer
+    renderer.shutdown()
+
+
+def test_batch_shares_one_deadline(renderer):
+    started = time.perf_counter()
+    results = renderer.render_results(["quick", "sleep 1.5", "sleep 1.6", "sleep 1.7"])
+    elapsed = time.perf_counter() - started
+
+    # Three timeouts in a row used to take three budgets.
+    assert elapsed < 1.0
+    assert results[0] == utils.Rendered("<p>quick</p>")
+    assert [result.final for result in results[1:]] == [False, False, False]
+    assert renderer.stats()["fallbacks"] == {"timeout": 3}
+
+
+def test_overrun_does_not_fail_other_requests(renderer):
+    slow = []
+    thread = threading.Thread(target=lambda: slow.append(renderer.render_result("sleep 1.5")))
+    thread.start()
+    time.sleep(0.1)
+    texts = [f"text {index}" for index in range(20)]
+    results = renderer.render_results(texts)
+    thread.join()
+
+    assert slow[0].final is False
+    assert [result.html for result in results] == [f"<p>{text}</p>" for text in texts]
+    assert all(result.final for result in results)
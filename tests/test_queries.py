@@ -0,0 +1,73 @@
+import pytest
+from flask import url_for
+
+from app import db
+from app.models import User
+from app.queries import QUERY_BUDGETS, count_statements
+
+OPINIONS = 3
+ARGUMENTS_PER_SIDE = 2
+REASONING_PER_ARGUMENT = 3
+
+
+@pytest.fixture
+def debate(app, author):
+    """Several opinions with arguments on both sides and reasoning by two authors."""
+    with app.app_context():
+        user = User(email="second@example.com", username="second", confirmed=True)
+        user.set_password("secret1")
+        db.session.add(user)
+        db.session.commit()
+    second = app.test_client()
+    assert second.post("/login", data={"email": "second@example.com", "password": "secret1"}).status_code == 302
+
+    argument_id = 0
+    for opinion_id in range(1, OPINIONS + 1):
+        response = author.post("/opinions/new", data={
+            "title": f"Opinion {opinion_id}",
+            "content": "Some **Markdown**",
+            "first_argument_stance": "for",
+            "first_argument_content": "opening",
+            "first_reasoning_content": "because",
+        })
+        assert response.status_code == 302
+        argument_id += 1
+        for index in range(2 * ARGUMENTS_PER_SIDE - 1):
+            poster = (author, second)[index % 2]
+            stance = ("against", "for")[index % 2]
+            data = {"stance": stance, "content": f"argument {index}"}
+            assert poster.post(f"/opinions/{opinion_id}/arguments/new", data=data).status_code == 302
+            argument_id += 1
+            for step in range(REASONING_PER_ARGUMENT):
+                poster = (author, second)[step % 2]
+                data = {"content": f"reasoning {step}"}
+                assert poster.post(f"/arguments/{argument_id}/reasoning/new", data=data).status_code == 302
+    return app
+
+
+def _targets() -> dict[str, str]:
+    return {
+        "main.index": url_for("main.index"),
+        "main.view_opinion": url_for("main.view_opinion", opinion_id=2),
+        "main.view_argument": url_for("main.view_argument", argument_id=2),
+        "api.list_opinions": url_for("api.list_opinions"),
+        "api.get_opinion": url_for("api.get_opinion", opinion_id=2),
+        "api.get_argument": url_for("api.get_argument", argument_id=2),
+    }
+
+
+def test_every_budget_is_exercised(app):
+    with app.test_request_context():
+        assert set(_targets()) == set(QUERY_BUDGETS)
+
+
+@pytest.mark.parametrize("endpoint", sorted(QUERY_BUDGETS))
+def test_read_pages_stay_within_their_statement_budget(debate, client, endpoint):
+    with debate.test_request_context():
+        path = _targets()[endpoint]
+    with debate.app_context():
+        with count_statements() as counter:
+            response = client.get(path)
+    assert response.status_code == 200
+    listing = "\n".join(counter.statements)
+    assert counter.count <= QUERY_BUDGETS[endpoint], f"{counter.count} statements:\n{listing}"
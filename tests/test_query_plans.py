@@ -0,0 +1,36 @@
+import pytest
+
+from app import db
+from app.commands import check_query_plans_command
+
+
+@pytest.fixture
+def debate(author):
+    for title in ("One", "Two"):
+        response = author.post("/opinions/new", data={
+            "title": title,
+            "content": "body",
+            "first_argument_stance": "for",
+            "first_argument_content": "first",
+            "first_reasoning_content": "because",
+        })
+        assert response.status_code == 302
+    assert author.post("/opinions/1/arguments/new", data={"stance": "against", "content": "no"}).status_code == 302
+    return author
+
+
+def test_hot_queries_use_indexes(app, debate):
+    result = app.test_cli_runner().invoke(check_query_plans_command)
+    assert result.exit_code == 0, result.output
+    assert "hot statements use indexes" in result.output
+
+
+def test_missing_index_is_reported_as_full_scan(app, debate):
+    with app.app_context():
+        db.session.execute(db.text("DROP INDEX ix_argument_opinion_stance_created"))
+        db.session.commit()
+
+    result = app.test_cli_runner().invoke(check_query_plans_command)
+    assert result.exit_code != 0
+    assert "FAIL [opinion detail]" in result.output
+    assert "SCAN argument" in result.output
@@ -0,0 +1,65 @@
+import math
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import db
+from app.models import Argument, Opinion, RankingEpoch, Stance, User
+from app.ranking import decay_hot_scores, ranked_page
+
+
+@pytest.fixture
+def app(make_app):
+    app = make_app(HOT_HALF_LIFE_HOURS=1.0)
+    with app.app_context():
+        user = User(email="author@example.com", username="author", confirmed=True)
+        user.set_password("secret1")
+        db.session.add(user)
+        db.session.commit()
+    return app
+
+
+def _set_epoch(when: datetime) -> None:
+    db.session.add(RankingEpoch(id=1, decayed_at=when))
+    db.session.commit()
+
+
+def _opinion(title: str, when: datetime) -> Opinion:
+    opinion = Opinion(title=title, content=title, user_id=1, created_at=when)
+    db.session.add(opinion)
+    db.session.commit()
+    return opinion
+
+
+def test_writes_far_past_the_epoch_rebase_instead_of_overflowing(app):
+    with app.app_context():
+        start = datetime.utcnow() - timedelta(hours=3000)
+        _set_epoch(start)
+        old = _opinion("old", start)
+        assert old.hot_score == pytest.approx(1.0)
+
+        # 3000 half-lives: 2 ** 3000 would raise OverflowError without the rebase.
+        now = datetime.utcnow()
+        fresh = _opinion("fresh", now)
+        db.session.add(Argument(content="yes", stance=Stance.FOR, opinion_id=fresh.id, user_id=1, created_at=now))
+        db.session.commit()
+
+        assert db.session.get(RankingEpoch, 1).decayed_at == now
+        db.session.refresh(old)
+        db.session.refresh(fresh)
+        assert math.isfinite(fresh.hot_score)
+        assert fresh.hot_score == pytest.approx(3.0)  # opinion weight 1 + argument weight 2
+        assert old.hot_score == 0.0
+        assert [item.title for item in ranked_page("hot", None, 10).items] == ["fresh", "old"]
+
+
+def test_rebase_keeps_the_order(app):
+    with app.app_context():
+        start = datetime.utcnow() - timedelta(hours=50)
+        _set_epoch(start)
+        _opinion("older", start)
+        _opinion("newer", start + timedelta(hours=5))
+        before = [item.title for item in ranked_page("hot", None, 10).items]
+        factor = decay_hot_scores(start + timedelta(hours=45))
+        assert factor == pytest.approx(2 ** -45)
+        assert [item.title for item in ranked_page("hot", None, 10).items] == before == ["newer", "older"]
@@ -0,0 +1,137 @@
+import multiprocessing
+
+import pytest
+
+from app.rate_limit import Limit, SQLiteBackend
+
+PROCESSES = 4
+ATTEMPTS = 5
+
+
+@pytest.fixture
+def app(make_app):
+    from app import db
+    from app.models import User
+
+    app = make_app(RATELIMIT_ENABLED=True, RATELIMIT_BACKEND="sqlite", RATELIMITS={"auth.login": "3/minute"})
+    with app.app_context():
+        user = User(email="owner@example.com", username="owner", confirmed=True)
+        user.set_password("secret1")
+        db.session.add(user)
+        db.session.commit()
+    return app
+
+
+def _race(target, args) -> list:
+    """Run `target(*args, start, results)` in forked processes; each puts one list of results."""
+    context = multiprocessing.get_context("fork")
+    start = context.Event()
+    results = context.Queue()
+    workers = [context.Process(target=target, args=(index, *args, start, results)) for index in range(PROCESSES)]
+    for worker in workers:
+        worker.start()
+    start.set()
+    outcomes = [outcome for _ in workers for outcome in results.get(timeout=60)]
+    for worker in workers:
+        worker.join(timeout=60)
+    return outcomes
+
+
+def _take(index, path, keys, limit, start, results) -> None:
+    backend = SQLiteBackend(path)
+    start.wait()
+    results.put([backend.take(keys, limit, 1000.0)[0] for _ in range(ATTEMPTS)])
+
+
+def _login(index, app, email, start, results) -> None:
+    client = app.test_client()
+    start.wait()
+    outcomes = []
+    for _ in range(ATTEMPTS):
+        response = client.post(
+            "/login",
+            data={"email": email, "password": "wrong"},
+            environ_base={"REMOTE_ADDR": f"10.0.0.{index + 1}"},
+        )
+        outcomes.append((response.status_code, response.headers.get("Retry-After")))
+    results.put(outcomes)
+
+
+def test_sqlite_backend_admits_capacity_across_processes(tmp_path):
+    path = str(tmp_path / "ratelimit.sqlite")
+    limit = Limit(7, 86400)
+    admitted = _race(_take, (path, ["shared"], limit))
+    assert sum(admitted) == 7
+
+
+def test_denied_take_spends_no_tokens(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "ratelimit.sqlite"))
+    limit = Limit(2, 86400)
+    assert backend.take(["account"], limit, 1000.0)[0]
+    assert backend.take(["account"], limit, 1000.0)[0]
+
+    allowed, retry_after = backend.take(["ip", "account"], limit, 1000.0)
+    assert not allowed
+    assert retry_after == pytest.approx(43200)
+    # The IP bucket is still full.
+    assert backend.take(["ip"], limit, 1000.0)[0]
+    assert backend.take(["ip"], limit, 1000.0)[0]
+    assert not backend.take(["ip"], limit, 1000.0)[0]
+
+
+def test_login_answers_429_with_retry_after(app):
+    client = app.test_client()
+    for _ in range(3):
+        assert client.post("/login", data={"email": "owner@example.com", "password": "wrong"}).status_code == 200
+    response = client.post("/login", data={"email": "owner@example.com", "password": "wrong"})
+    assert response.status_code == 429
+    assert 1 <= int(response.headers["Retry-After"]) <= 20
+
+
+def test_account_bucket_is_shared_across_processes(app):
+    outcomes = _race(_login, (app, "victim@example.com"))
+    statuses = [status for status, _ in outcomes]
+    # Each process has its own IP, so only the address bucket (3 tokens) stops them.
+    assert statuses.count(200) == 3
+    assert statuses.count(429) == PROCESSES * ATTEMPTS - 3
+    assert all(int(retry_after) >= 1 for status, retry_after in outcomes if status == 429)
+
+
+def test_account_bucket_does_not_lock_out_the_owner(app):
+    owner = app.test_client()
+    response = owner.post("/login", data={"email": "owner@example.com", "password": "secret1"})
+    assert response.status_code == 302
+    owner.get("/logout")
+
+    _race(_login, (app, "owner@example.com"))
+    anonymous = app.test_client()
+    response = anonymous.post(
+        "/login", data={"email": "owner@example.com", "password": "secret1"}, environ_base={"REMOTE_ADDR": "10.0.1.1"}
+    )
+    assert response.status_code == 429
+
+    # The browser that signed in before skips the address bucket.
+    response = owner.post("/login", data={"email": "owner@example.com", "password": "secret1"})
+    assert response.status_code == 302
+
+
+@pytest.mark.parametrize("proxies,warns", [(None, True), (0, False), (1, False)])
+def test_unset_proxy_count_warns_at_startup(make_app, caplog, proxies, warns):
+    make_app(RATELIMIT_ENABLED=True, RATELIMIT_BACKEND="memory", PROXY_FIX_X_FOR=proxies)
+    assert any("PROXY_FIX_X_FOR is not set" in record.getMessage() for record in caplog.records) is warns
+
+
+def test_forwarded_clients_get_their_own_bucket(make_app):
+    app = make_app(
+        RATELIMIT_ENABLED=True, RATELIMIT_BACKEND="memory", RATELIMITS={"auth.login": "1/minute"}, PROXY_FIX_X_FOR=1
+    )
+    client = app.test_client()
+    proxy = {"REMOTE_ADDR": "127.0.0.1"}
+
+    def login(forwarded_for: str) -> int:
+        headers = {"X-Forwarded-For": forwarded_for}
+        return client.post("/login", data={"email": ""}, headers=headers, environ_base=proxy).status_code
+
+    assert login("203.0.113.1") == 200
+    assert login("203.0.113.1") == 429
+    assert login("203.0.113.2") == 200
@@ -0,0 +1,82 @@
+import logging
+
+import pytest
+
+from app import db
+from app.commands import replica_sync_command
+from app.models import User
+
+
+def _replica_app(make_app, path):
+    return make_app(
+        SQLALCHEMY_BINDS={"replica": {"url": f"sqlite:///file:{path}?mode=ro&uri=true"}},
+        REPLICA_STICKY_SECONDS=60,
+    )
+
+
+def _titles(client) -> list[str]:
+    response = client.get("/api/opinions")
+    assert response.status_code == 200
+    return [item["title"] for item in response.get_json()["items"]]
+
+
+def _post_opinion(client, title: str) -> None:
+    response = client.post("/opinions/new", data={
+        "title": title,
+        "content": "body",
+        "first_argument_stance": "for",
+        "first_argument_content": "first",
+        "first_reasoning_content": "because",
+    })
+    assert response.status_code == 302
+
+
+@pytest.fixture
+def replica_app(make_app, tmp_path):
+    app = _replica_app(make_app, tmp_path / "replica.db")
+    with app.app_context():
+        user = User(email="author@example.com", username="author", confirmed=True)
+        user.set_password("secret1")
+        db.session.add(user)
+        db.session.commit()
+    return app
+
+
+@pytest.fixture
+def writer(replica_app):
+    client = replica_app.test_client()
+    assert client.post("/login", data={"email": "author@example.com", "password": "secret1"}).status_code == 302
+    _post_opinion(client, "Replicated")
+    result = replica_app.test_cli_runner().invoke(replica_sync_command)
+    assert result.exit_code == 0, result.output
+    return client
+
+
+def test_reads_go_to_the_replica_until_it_catches_up(replica_app, writer):
+    reader = replica_app.test_client()
+    assert _titles(reader) == ["Replicated"]
+
+    _post_opinion(writer, "Not yet copied")
+    assert _titles(reader) == ["Replicated"]
+
+    assert replica_app.test_cli_runner().invoke(replica_sync_command).exit_code == 0
+    assert _titles(reader) == ["Not yet copied", "Replicated"]
+
+
+def test_writer_reads_its_own_writes_from_the_primary(replica_app, writer):
+    _post_opinion(writer, "Fresh")
+    assert _titles(writer) == ["Fresh", "Replicated"]
+    assert b"Fresh" in writer.get("/").data
+    # Other visitors keep reading the replica, which has not caught up yet.
+    assert b"Fresh" not in replica_app.test_client().get("/").data
+
+
+def test_unreachable_replica_falls_back_to_the_primary(make_app, tmp_path, caplog):
+    app = _replica_app(make_app, tmp_path / "missing" / "replica.db")
+    client = app.test_client()
+    with caplog.at_level(logging.WARNING):
+        assert _titles(client) == []
+        assert _titles(client) == []
+    warnings = [record for record in caplog.records if "Read replica unavailable" in record.getMessage()]
+    # Marked down after the first failure, so the second request does not retry.
+    assert len(warnings) == 1
@@ -0,0 +1,79 @@
+import pytest
+
+from app.commands import search_rebuild_command
+from app.search import search
+
+
+def _post_opinion(client, title: str, content: str) -> None:
+    response = client.post("/opinions/new", data={
+        "title": title,
+        "content": content,
+        "first_argument_stance": "for",
+        "first_argument_content": "first argument",
+        "first_reasoning_content": "first reasoning",
+    })
+    assert response.status_code == 302
+
+
+@pytest.fixture
+def debate(author):
+    _post_opinion(author, "Discounts", "Sales at 50% off are a trap")
+    _post_opinion(author, "Naming", "snake_case beats camelCase")
+    _post_opinion(author, "Markup", "Never trust <script>alert(1)</script> in posts")
+    return author
+
+
+@pytest.fixture
+def fts(app, debate):
+    result = app.test_cli_runner().invoke(search_rebuild_command)
+    assert result.exit_code == 0, result.output
+    assert "Indexed 9 document(s)." in result.output
+    return debate
+
+
+def _titles(app, query: str) -> tuple[str, list[str]]:
+    with app.test_request_context():
+        results = search(query)
+    return results.backend, [result.opinion_title for result in results.results]
+
+
+def test_like_fallback_treats_wildcards_literally(app, debate):
+    assert _titles(app, "50%") == ("like", ["Discounts"])
+    assert _titles(app, "e_c") == ("like", ["Naming"])
+    # Unescaped, "_" matches any character and "%" anything at all.
+    assert _titles(app, "50_") == ("like", [])
+    assert _titles(app, "%") == ("like", ["Discounts"])
+
+
+def test_fts_index_follows_writes(app, fts):
+    assert _titles(app, "traps") == ("fts5", ["Discounts"])
+    response = fts.post("/opinions/2/arguments/new", data={"stance": "against", "content": "kebab wins"})
+    assert response.status_code == 302
+    assert _titles(app, "kebab") == ("fts5", ["Naming"])
+
+
+@pytest.mark.parametrize("query", ['"', "NEAR(", "title:x OR", "*", "AND", "-trap"])
+def test_fts_syntax_in_queries_is_literal(app, fts, query):
+    with app.test_request_context():
+        results = search(query)
+    assert results.backend == "fts5"
+
+
+@pytest.mark.parametrize("backend", ["like", "fts5"])
+def test_control_characters_are_stripped(app, debate, backend):
+    if backend == "fts5":
+        assert app.test_cli_runner().invoke(search_rebuild_command).exit_code == 0
+    # NUL would end the FTS5 string early; \x02/\x03 are the highlight markers.
+    assert _titles(app, "trap\x00 sales") == (backend, ["Discounts"])
+    assert _titles(app, "\x02\x03") == ("none", [])
+
+
+@pytest.mark.parametrize("backend", ["like", "fts5"])
+def test_results_page_escapes_content(app, debate, client, backend):
+    if backend == "fts5":
+        assert app.test_cli_runner().invoke(search_rebuild_command).exit_code == 0
+    response = client.get("/search", query_string={"q": "script"})
+    assert response.status_code == 200
+    assert b"<script>" not in response.data
+    assert b"&lt;" in response.data
+    assert b"<mark>" in response.data
@@ -0,0 +1,116 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from app import db, snapshots
+from app.commands import check_snapshots_command, render_content_command
+from app.models import Opinion, OpinionSnapshot
+from app.snapshots import build_documents, find_snapshot_drift, stale_snapshot_ids
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+
+@pytest.fixture
+def debate(author):
+    response = author.post("/opinions/new", data={
+        "title": "Snapshotted",
+        "content": "body",
+        "first_argument_stance": "for",
+        "first_argument_content": "first",
+        "first_reasoning_content": "because",
+    })
+    assert response.status_code == 302
+    return author
+
+
+def _stored(opinion_id: int = 1) -> tuple[int, dict]:
+    row = db.session.get(OpinionSnapshot, opinion_id)
+    db.session.expire_all()
+    return row.version, json.loads(row.document)
+
+
+def test_writes_patch_the_snapshot_without_rebuilding(app, debate, monkeypatch):
+    def rebuild(*args, **kwargs):
+        raise AssertionError("a current snapshot should be patched, not rebuilt")
+
+    monkeypatch.setattr(snapshots, "build_documents", rebuild)
+    assert debate.post("/opinions/1/arguments/new", data={"stance": "against", "content": "no"}).status_code == 302
+    assert debate.post("/arguments/2/reasoning/new", data={"content": "why"}).status_code == 302
+    monkeypatch.undo()
+
+    with app.app_context():
+        version, document = _stored()
+        assert version == db.session.get(Opinion, 1).version
+        assert document == build_documents(db.session.connection(), [1])[1][1]
+        assert (document["opinion"]["against_count"], document["opinion"]["reasoning_count"]) == (1, 2)
+        assert find_snapshot_drift() == []
+
+
+def test_stale_snapshot_falls_back_to_live_tables(app, debate, client):
+    with app.app_context():
+        # A raw edit that bypasses the mapper events, bumping the version as writers must.
+        db.session.execute(
+            db.update(Opinion).values(title="Edited behind the app's back", version=Opinion.version + 1)
+        )
+        db.session.commit()
+        assert stale_snapshot_ids() == [1]
+
+    assert b"Edited behind the app&#39;s back" in client.get("/opinions/1").data
+
+    # The snapshot is too far behind to patch, so the next write rebuilds it.
+    assert debate.post("/opinions/1/arguments/new", data={"stance": "against", "content": "no"}).status_code == 302
+    with app.app_context():
+        assert _stored()[1]["opinion"]["title"] == "Edited behind the app's back"
+        assert stale_snapshot_ids() == []
+
+
+def test_check_snapshots_repairs_drift(app, debate):
+    with app.app_context():
+        db.session.execute(db.update(OpinionSnapshot).values(document='{"opinion": {}}'))
+        db.session.commit()
+
+    runner = app.test_cli_runner()
+    result = runner.invoke(check_snapshots_command)
+    assert result.exit_code != 0
+    assert "content differs from the live tables" in result.output
+    assert runner.invoke(check_snapshots_command, ["--repair"]).exit_code == 0
+    assert runner.invoke(check_snapshots_command).exit_code == 0
+
+
+def test_render_content_backfills_snapshots_after_upgrade(make_app, tmp_path, monkeypatch):
+    """Upgrade a database that predates snapshots, then run the documented backfill."""
+    monkeypatch.chdir(REPO_ROOT)
+    app = make_app(SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'migrated.db'}")
+    with app.app_context():
+        db.drop_all(bind_key=None)
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=["db", "upgrade", "e4b7a2c9d160"])
+    assert result.exit_code == 0, result.output
+
+    with app.app_context():
+        for statement in (
+            "INSERT INTO user (id, email, username, password_hash, confirmed) "
+            "VALUES (1, 'old@example.com', 'old', 'x', 1)",
+            "INSERT INTO opinion (id, title, content, created_at, user_id, for_count, version) "
+            "VALUES (1, 'Before snapshots', '*old*', '2026-01-01 00:00:00', 1, 1, 1)",
+            "INSERT INTO argument (id, content, stance, created_at, user_id, opinion_id) "
+            "VALUES (1, 'yes', 'FOR', '2026-01-01 00:00:00', 1, 1)",
+        ):
+            db.session.execute(db.text(statement))
+        db.session.commit()
+
+    result = runner.invoke(args=["db", "upgrade"])
+    assert result.exit_code == 0, result.output
+    with app.app_context():
+        assert stale_snapshot_ids() == [1]
+    # Until the backfill runs, the page is built from the live tables.
+    assert b"<em>old</em>" in app.test_client().get("/opinions/1").data
+
+    result = runner.invoke(render_content_command)
+    assert result.exit_code == 0, result.output
+    assert "opinion_snapshot: rebuilt 1 snapshot(s)" in result.output
+    with app.app_context():
+        assert stale_snapshot_ids() == []
+        assert _stored()[1]["arguments"]["for"][0]["content_html"].strip() == "<p>yes</p>"
+    assert runner.invoke(check_snapshots_command).exit_code == 0